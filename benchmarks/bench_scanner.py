@@ -0,0 +1,92 @@
+"""
+Benchmark for LibraryScanner vs the old os.walk based get_downloaded_files
+
+Builds a synthetic library (100k empty .mp3 files by default) in a temp
+folder and times:
+    - the old os.walk scan
+    - a cold LibraryScanner scan (no cache yet)
+    - a warm scan (nothing changed)
+    - a warm scan after one playlist folder changed
+    - fetching the first page of 100 files
+
+Usage:
+    python benchmarks/bench_scanner.py [--files 100000] [--per-folder 200]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.scanner import LibraryScanner, AUDIO_EXTENSIONS
+
+
+def build_tree(root, total_files, per_folder):
+    """Create `total_files` empty audio files spread over playlist folders"""
+    created = 0
+    folder = 0
+    while created < total_files:
+        path = os.path.join(root, f"Playlist - Benchmark {folder:05d}")
+        os.makedirs(path)
+        for i in range(min(per_folder, total_files - created)):
+            with open(os.path.join(path, f"Artist {i} - Track {created}.mp3"), 'wb'):
+                pass
+            created += 1
+        folder += 1
+    return folder
+
+
+def old_walk(root):
+    """The scan get_downloaded_files used to do on every call"""
+    files = []
+    for dirpath, dirs, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.endswith(AUDIO_EXTENSIONS):
+                files.append(os.path.relpath(os.path.join(dirpath, filename), root))
+    return files
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed * 1000:10.1f} ms  ({result} files)")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LibraryScanner benchmark")
+    parser.add_argument("--files", type=int, default=100000, help="Number of files to create")
+    parser.add_argument("--per-folder", type=int, default=200, help="Files per playlist folder")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="scanner_bench_")
+    try:
+        print(f"Building {args.files} files in {root} ...")
+        folders = build_tree(root, args.files, args.per_folder)
+        print(f"{folders} folders created\n")
+
+        timed("os.walk (old)", lambda: len(old_walk(root)))
+
+        scanner = LibraryScanner(root)
+        timed("LibraryScanner cold", lambda: sum(1 for _ in scanner.iter_files()))
+
+        # New instance so the cache is really read back from disk
+        scanner = LibraryScanner(root)
+        timed("LibraryScanner warm", lambda: sum(1 for _ in scanner.iter_files()))
+
+        changed = os.path.join(root, "Playlist - Benchmark 00000", "New Artist - New Track.mp3")
+        with open(changed, 'wb'):
+            pass
+        timed("LibraryScanner 1 folder changed", lambda: sum(1 for _ in scanner.iter_files()))
+
+        timed("LibraryScanner first page", lambda: len(scanner.get_page(0, 100)['items']))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
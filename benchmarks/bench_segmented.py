@@ -0,0 +1,111 @@
+"""
+Benchmark for segmented_download against a single stream
+
+Starts a local HTTP server that serves a random file with byte range
+support and throttles every connection to a fixed rate (like YouTube does
+per connection), then times how long it takes until the whole file is on
+disk with 1 connection and with N connections.
+
+Usage:
+    python benchmarks/bench_segmented.py [--size 16M] [--rate 2M] [--connections 1,2,4,8] [--segment-size 1M]
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.bandwidth import parse_rate
+from lib.segmented import segmented_download
+
+
+def make_handler(payload, rate):
+    """Request handler serving `payload` at `rate` bytes/s per connection"""
+
+    class ThrottledHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            start, end = 0, len(payload) - 1
+            match = re.fullmatch(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+            if match:
+                start = int(match.group(1))
+                end = min(int(match.group(2)) if match.group(2) else end, end)
+                self.send_response(206)
+                self.send_header('Content-Range', f"bytes {start}-{end}/{len(payload)}")
+            else:
+                self.send_response(200)
+            self.send_header('Content-Length', str(end - start + 1))
+            self.send_header('Accept-Ranges', 'bytes')
+            self.end_headers()
+
+            # Send in 16 KiB blocks, sleeping to hold this connection to `rate`
+            block = 16 * 1024
+            began = time.monotonic()
+            sent = 0
+            for offset in range(start, end + 1, block):
+                data = payload[offset:min(offset + block, end + 1)]
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                sent += len(data)
+                delay = sent / rate - (time.monotonic() - began)
+                if delay > 0:
+                    time.sleep(delay)
+
+    return ThrottledHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Segmented download benchmark")
+    parser.add_argument("--size", default="16M", help="File size (default: 16M)")
+    parser.add_argument("--rate", default="2M", help="Per connection rate limit of the server (default: 2M)")
+    parser.add_argument("--connections", default="1,2,4,8", help="Connection counts to try (default: 1,2,4,8)")
+    parser.add_argument("--segment-size", default="1M", help="Bytes per range request (default: 1M)")
+    args = parser.parse_args()
+
+    size = parse_rate(args.size)
+    rate = parse_rate(args.rate)
+    segment_size = parse_rate(args.segment_size)
+    payload = os.urandom(size)
+    expected = hashlib.sha1(payload).hexdigest()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(payload, rate))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/track.webm"
+
+    folder = tempfile.mkdtemp(prefix="segmented_bench_")
+    try:
+        print(f"{size / 1024 ** 2:.1f} MiB file, server limited to {rate / 1024 ** 2:.1f} MiB/s per connection, "
+              f"{segment_size / 1024 ** 2:.1f} MiB segments\n")
+        baseline = None
+        for connections in [int(n) for n in args.connections.split(',')]:
+            dest = os.path.join(folder, f"track-{connections}.webm")
+            start = time.perf_counter()
+            segmented_download(url, dest, connections=connections, segment_size=segment_size)
+            elapsed = time.perf_counter() - start
+
+            with open(dest, 'rb') as f:
+                ok = hashlib.sha1(f.read()).hexdigest() == expected
+            baseline = baseline or elapsed
+            print(f"{connections:>2} connection(s)  {elapsed:7.2f} s  {size / elapsed / 1024 ** 2:6.2f} MiB/s  "
+                  f"x{baseline / elapsed:4.1f}  {'ok' if ok else 'CORRUPT'}")
+    finally:
+        server.shutdown()
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
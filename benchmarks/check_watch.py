@@ -0,0 +1,95 @@
+"""
+Check that watch mode settles on a playlist with an unavailable track
+
+Runs PlaylistWatcher offline against a fake Spotify embed page that
+honours If-None-Match. One of the tracks can never be downloaded
+(UnavailableError, like a removed video). The first check has to sync
+the playlist and keep the snapshot anyway; the second one has to be a
+single request answered with 304, downloading nothing.
+
+Usage:
+    python benchmarks/check_watch.py
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib import SpotifyDownloader
+from lib.errors import UnavailableError
+from lib.watch import PlaylistWatcher
+
+URL = "https://open.spotify.com/playlist/37i9dQZF1DXcBWIGoYBM5M"
+ETAG = '"v1"'
+TRACKS = [{'uri': f"spotify:track:id{i}", 'title': f"Song {i}", 'subtitle': f"Artist {i}"} for i in range(4)]
+MISSING = "Artist 2 - Song 2"
+
+
+class FakeResponse:
+    def __init__(self, status_code, text='', headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+
+class OfflineDownloader(SpotifyDownloader):
+    """Serves the embed page from memory and 'downloads' by writing a small file"""
+
+    def __init__(self, download_dir):
+        super().__init__(download_dir, console=False)
+        self.requests = []
+        self.downloads = []
+        self.session.get = self.fake_get
+
+    def fake_get(self, url, headers=None, **kwargs):
+        self.requests.append(url)
+        if (headers or {}).get('If-None-Match') == ETAG:
+            return FakeResponse(304)
+        page = ('<script id="__NEXT_DATA__" type="application/json">'
+                + json.dumps({'props': {'tracks': TRACKS}}) + '</script>')
+        return FakeResponse(200, page, {'ETag': ETAG})
+
+    def get_playlist_name(self, url):
+        return "Playlist - Check"
+
+    def _download_track(self, query, audio_format, quality, subfolder=None, job_id=None, token=None,
+                        budget=None, index=None, template=None, source=None):
+        self.downloads.append(query)
+        if query == MISSING:
+            raise UnavailableError("Video unavailable")
+        path = self.output_path(query, audio_format, subfolder, index, template)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(query)
+        return path
+
+
+def main():
+    folder = tempfile.mkdtemp(prefix="watch_check_")
+    try:
+        downloader = OfflineDownloader(folder)
+        watcher = PlaylistWatcher(downloader, [URL])
+
+        first = watcher.check(URL)
+        print(f"First check: {len(downloader.requests)} request(s), {len(downloader.downloads)} download(s), {first}")
+        if not first or first['successful'] != len(TRACKS) - 1 or first['failed'] != 1:
+            sys.exit("FAIL: the first check should sync every track but the unavailable one")
+        if watcher.state[URL].get('etag') != ETAG or watcher.state[URL].get('unavailable') != [MISSING]:
+            sys.exit("FAIL: the snapshot and validators weren't kept")
+
+        downloader.requests.clear()
+        downloader.downloads.clear()
+        second = PlaylistWatcher(downloader, [URL]).check(URL)
+        print(f"Second check: {len(downloader.requests)} request(s), {len(downloader.downloads)} download(s), {second}")
+        if second is not None or len(downloader.requests) != 1 or downloader.downloads:
+            sys.exit("FAIL: the second check should be a single 304 that downloads nothing")
+        print("ok")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Failover check for the distributed work queue
+
+Fills a temporary SQLiteWorkQueue with track items and starts several
+worker processes on it (QueueWorker, the same loop `cli.py --work` runs,
+with a simulated download instead of YouTube so it runs offline). Once
+one of the workers holds a lease, that process is killed outright; its
+lease has to expire and the item has to be picked up by another worker.
+Every item must end up 'done', none of them fetched by two live workers.
+
+Usage:
+    python benchmarks/check_work_queue.py [--workers 4] [--items 40] [--lease 2] [--delay 0.2]
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib import SpotifyDownloader
+from lib.distributed import SQLiteWorkQueue, QueueWorker
+
+
+class SimulatedDownloader(SpotifyDownloader):
+    """Downloader whose tracks take `delay` seconds and write a small file"""
+
+    def __init__(self, download_dir, delay):
+        super().__init__(download_dir, console=False)
+        self.delay = delay
+
+    def download_track_file(self, track, audio_format, quality, subfolder=None, **kwargs):
+        time.sleep(self.delay)
+        folder = os.path.join(self.download_dir, subfolder or '')
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{track}.{audio_format}")
+        with open(path, 'a', encoding='utf-8') as f:
+            # One line per download, so a track fetched twice shows up
+            f.write(f"{os.getpid()}\n")
+        return path
+
+
+def run_worker(queue_path, worker_id, lease, delay):
+    download_dir = os.path.join(os.path.dirname(queue_path), 'downloaded')
+    worker = QueueWorker(SimulatedDownloader(download_dir, delay), SQLiteWorkQueue(queue_path),
+                         worker_id=worker_id, lease_seconds=lease, poll_interval=0.1)
+    worker.run(exit_when_empty=True)
+
+
+def count_items(queue_path, where, *params):
+    """Items of the queue matching a WHERE clause, read over a connection of our own"""
+    conn = sqlite3.connect(queue_path, timeout=30)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM items WHERE {where}", params).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed work queue failover check")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes (default: 4)")
+    parser.add_argument("--items", type=int, default=40, help="Track items to queue (default: 40)")
+    parser.add_argument("--lease", type=float, default=2.0, help="Lease length in seconds (default: 2)")
+    parser.add_argument("--delay", type=float, default=0.2, help="Seconds per simulated download (default: 0.2)")
+    parser.add_argument("--worker", nargs=2, metavar=("QUEUE", "ID"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker[0], args.worker[1], args.lease, args.delay)
+        return
+
+    folder = tempfile.mkdtemp(prefix="work_queue_check_")
+    queue_path = os.path.join(folder, 'queue.db')
+    try:
+        work_queue = SQLiteWorkQueue(queue_path)
+        work_queue.add_items([{'track': f"Artist - Song {i}", 'subfolder': 'Mix'} for i in range(args.items)])
+
+        start = time.perf_counter()
+        workers = {
+            f"worker-{i}": subprocess.Popen([sys.executable, os.path.abspath(__file__), '--worker', queue_path,
+                                             f"worker-{i}", '--lease', str(args.lease), '--delay', str(args.delay)])
+            for i in range(args.workers)
+        }
+
+        # Kill a worker in the middle of a download
+        victim = 'worker-0'
+        deadline = time.monotonic() + 60
+        while not count_items(queue_path, "state = 'leased' AND worker = ?", victim):
+            if time.monotonic() > deadline or workers[victim].poll() is not None:
+                sys.exit(f"FAIL: {victim} never claimed an item")
+            time.sleep(0.01)
+        workers[victim].kill()
+        workers[victim].wait()
+        print(f"Killed {victim} while it held a lease")
+
+        for worker_id, process in workers.items():
+            if process.wait(timeout=max(120.0, args.items * args.delay * 2)) != 0 and worker_id != victim:
+                sys.exit(f"FAIL: {worker_id} exited with {process.returncode}")
+        elapsed = time.perf_counter() - start
+
+        counts = work_queue.counts()
+        retried = count_items(queue_path, "attempts > 1")
+        downloads = {}
+        for name in os.listdir(os.path.join(folder, 'downloaded', 'Mix')):
+            with open(os.path.join(folder, 'downloaded', 'Mix', name), encoding='utf-8') as f:
+                downloads[name] = len(f.read().split())
+        work_queue.close()
+
+        print(f"{args.items} items, {args.workers} workers, {elapsed:.2f} s: {counts}, {retried} taken over")
+        if counts['done'] != args.items or counts['pending'] or counts['leased'] or counts['failed']:
+            sys.exit("FAIL: not every item ended up done")
+        if not retried:
+            sys.exit("FAIL: the killed worker's lease was never taken over")
+        if len(downloads) != args.items or any(count > 2 for count in downloads.values()):
+            sys.exit("FAIL: missing tracks, or a track downloaded by more than the killed and one other worker")
+        print("ok")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
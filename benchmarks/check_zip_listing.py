@@ -0,0 +1,61 @@
+"""
+Check what library_archive() puts in a ZIP
+
+Builds a playlist folder in a temporary library with finished tracks next
+to everything a download in progress leaves around (raw yt-dlp stream,
+ffmpeg's '.part.mp3', segment records, atomic writes, hidden files), then
+checks the archive lists only the finished tracks and that the streamed
+bytes are a valid ZIP with the right contents.
+
+Usage:
+    python benchmarks/check_zip_listing.py
+"""
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.zipstream import library_archive, resolve_library_path
+
+FINISHED = ['Artist 1 - Song 1.mp3', 'Artist 2 - Song 2.mp3', 'Part.II - Song 3.mp3']
+IN_PROGRESS = ['Artist 3 - Song 4.part.mp3', 'Artist 3 - Song 4.source.webm', 'Artist 4 - Song 5.source.m4a.part',
+               'Artist 4 - Song 5.source.m4a.part.segments', 'cover.jpg.tmp', 'x.source.opus.ytdl', '.hidden.mp3']
+
+
+def main():
+    root = tempfile.mkdtemp(prefix="zip_listing_check_")
+    try:
+        folder = os.path.join(root, 'Playlist - Check')
+        os.makedirs(os.path.join(root, '.cache'))
+        os.makedirs(folder)
+        for name in FINISHED + IN_PROGRESS:
+            with open(os.path.join(folder, name), 'w', encoding='utf-8') as f:
+                f.write(name)
+
+        archive = library_archive(root, resolve_library_path(root, 'Playlist - Check'))
+        listed = [entry.name.decode('utf-8') for entry in archive.entries]
+        expected = sorted(f"Playlist - Check/{name}" for name in FINISHED)
+        print("Listed:", listed)
+        if listed != expected:
+            sys.exit(f"FAIL: expected {expected}")
+
+        with zipfile.ZipFile(io.BytesIO(b''.join(archive.iter_bytes()))) as zf:
+            if zf.testzip() is not None or any(zf.read(name).decode('utf-8') != name.split('/')[-1]
+                                               for name in expected):
+                sys.exit("FAIL: the streamed archive is corrupt")
+
+        if library_archive(root, resolve_library_path(root, f"Playlist - Check/{IN_PROGRESS[0]}")).entries:
+            sys.exit("FAIL: a file being encoded was offered on its own")
+        if resolve_library_path(root, '.cache') or resolve_library_path(root, '../x'):
+            sys.exit("FAIL: a hidden or outside path was resolved")
+        print("ok")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,40 @@ CLI Interface for Spotify Downloader
 """
 
 import argparse
-from lib import SpotifyDownloader
+import os
+import signal
+import time
+from lib import SpotifyDownloader, ConsoleProgress
+from lib.server import serve
+from lib.bandwidth import BandwidthManager, parse_rate, parse_schedule_entry
+from lib.distributed import SQLiteWorkQueue, Coordinator, QueueWorker
+from lib.cancel import CancelToken
+from lib.resolvers import ResolverChain, DEFAULT_RESOLVERS
+from lib.naming import OutputTemplate, DEFAULT_TEMPLATE
+from lib.transcode import CODECS
+from lib.watch import PlaylistWatcher, parse_interval
+from lib.metrics import MetricsServer, TextfileWriter
+
+
+def start_exporters(downloader, args):
+    """Start the --metrics-port endpoint and --metrics-file writer, if asked for"""
+    exporters = []
+    if args.metrics_port:
+        server = MetricsServer(downloader.metrics, port=args.metrics_port).start()
+        print(f"Metrics on {server.address}")
+        exporters.append(server)
+    if args.metrics_file:
+        exporters.append(TextfileWriter(downloader.metrics, args.metrics_file, args.metrics_interval).start())
+    return exporters
+
+
+def finish_run(downloader, exporters):
+    """Stop the metrics exporters (writing the file one last time) and write the --profile reports"""
+    for exporter in exporters:
+        exporter.stop()
+    run_dir = downloader.write_profile()
+    if run_dir:
+        print(f"Profile written to {run_dir} (summary.txt, memory.txt, <phase>.prof, <phase>.folded)")
 
 
 def run_cli():
@@ -12,32 +45,296 @@ def run_cli():
         description="Spotify Downloader CLI"
     )
     parser.add_argument(
-        "link",
-        help="Spotify track, album or playlist"
+        "links",
+        nargs="*",
+        help="One or more Spotify tracks, albums, playlists or artists"
+    )
+    parser.add_argument(
+        "--link-mode",
+        choices=["auto", "hardlink", "reflink", "copy"],
+        default="auto",
+        help="How songs shared between playlists are put into each folder (default: auto)"
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run as a long-lived download server with an HTTP/JSON job API"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Server mode: interface to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Server mode: port to listen on (default: 8765)")
+    parser.add_argument("--workers", type=int, default=4, help="Server mode: concurrent downloads (default: 4)")
+    parser.add_argument(
+        "--small-jobs-first",
+        action="store_true",
+        help="Server mode: run jobs with the fewest remaining tracks first"
+    )
+    parser.add_argument(
+        "--enqueue",
+        metavar="QUEUE",
+        help="Distributed mode: expand the links into track jobs on this shared queue file"
+    )
+    parser.add_argument(
+        "--work",
+        metavar="QUEUE",
+        help="Distributed mode: run a worker that downloads track jobs from this queue file"
+    )
+    parser.add_argument(
+        "--exit-when-empty",
+        action="store_true",
+        help="Distributed mode: stop the worker once the queue is drained"
+    )
+    parser.add_argument(
+        "--limit-rate",
+        metavar="RATE",
+        help="Total download bandwidth for all downloads together, e.g. 500K or 2M"
+    )
+    parser.add_argument(
+        "--schedule",
+        metavar="HH:MM-HH:MM=RATE",
+        action="append",
+        default=[],
+        help="Bandwidth limit during a time window, overrides --limit-rate (repeatable)"
+    )
+    parser.add_argument(
+        "--connections",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Fetch each file over N parallel connections (default: 1)"
+    )
+    parser.add_argument(
+        "--segment-size",
+        metavar="SIZE",
+        default="4M",
+        help="With --connections: bytes per range request, e.g. 1M or 8M (default: 4M)"
+    )
+    parser.add_argument(
+        "--cookies-from-browser",
+        metavar="BROWSER",
+        help="Send YouTube the cookies of this browser, e.g. chrome or firefox (for age-restricted songs)"
+    )
+    parser.add_argument(
+        "--min-free",
+        metavar="SIZE",
+        default="0",
+        help="Keep this much disk space free, e.g. 512M; songs wait for space before they start and fail "
+             "after 10 minutes without it (default: 0, disabled)"
+    )
+    parser.add_argument(
+        "--scratch-dir",
+        metavar="DIR",
+        help="Download and encode in this folder (e.g. a tmpfs), finished songs are moved to downloaded/"
+    )
+    parser.add_argument(
+        "--from-manifest",
+        metavar="MANIFEST",
+        action="append",
+        default=[],
+        help="Redo a playlist from the .json manifest an earlier run wrote, without contacting "
+             "Spotify or searching (repeatable)"
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep the playlists mirrored: check them every --interval and download added tracks"
+    )
+    parser.add_argument(
+        "--interval",
+        default="1h",
+        help="Watch mode: time between checks, e.g. 90, 15m or 6h (default: 1h)"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile CPU and memory per phase (Spotify, parsing, search, download, progress, encode) "
+             "and write the reports to profiles/<date-time>"
+    )
+    parser.add_argument(
+        "--profile-dir",
+        metavar="DIR",
+        help="With --profile: write the reports to DIR instead (implies --profile)"
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        metavar="PORT",
+        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics"
+    )
+    parser.add_argument(
+        "--metrics-file",
+        metavar="PATH",
+        help="Write Prometheus metrics to PATH every --metrics-interval seconds "
+             "(for the node_exporter textfile collector)"
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        type=float,
+        default=15,
+        metavar="SECONDS",
+        help="How often --metrics-file is rewritten (default: 15)"
+    )
+    parser.add_argument(
+        "-f", "--format",
+        choices=sorted(CODECS),
+        help="Audio format (default: mp3, or the manifest's format with --from-manifest; "
+             "a different one re-encodes the files)"
+    )
+    parser.add_argument(
+        "-o", "--output",
+        metavar="TEMPLATE",
+        help="File layout inside 'downloaded', e.g. \"{artist}/{album}/{nn} - {title}.{ext}\" "
+             f"(default: \"{DEFAULT_TEMPLATE}\")"
+    )
+    parser.add_argument(
+        "--resolvers",
+        default=",".join(DEFAULT_RESOLVERS),
+        help=f"Sources to search, in order (default: {','.join(DEFAULT_RESOLVERS)})"
+    )
+    parser.add_argument(
+        "--race-resolvers",
+        action="store_true",
+        help="Search all sources at once and download whichever answers first"
     )
     args = parser.parse_args()
-    link = args.link
+
+    try:
+        bandwidth = BandwidthManager(
+            parse_rate(args.limit_rate),
+            [parse_schedule_entry(entry) for entry in args.schedule]
+        )
+        resolvers = ResolverChain(
+            [name.strip() for name in args.resolvers.split(",") if name.strip()],
+            mode=ResolverChain.RACE if args.race_resolvers else ResolverChain.ORDERED
+        )
+        output_template = OutputTemplate(args.output or DEFAULT_TEMPLATE)
+        segment_size = parse_rate(args.segment_size)
+        min_free = parse_rate(args.min_free) or 0
+        interval = parse_interval(args.interval)
+        if args.connections < 1 or not segment_size:
+            raise ValueError("--connections and --segment-size must be positive")
+    except ValueError as e:
+        parser.error(str(e))
+
+    if not args.serve and not args.work and not args.links and not args.from_manifest:
+        parser.error("at least one Spotify link is required (or use --serve / --work / --from-manifest)")
+
+    profile = args.profile_dir
+    if args.profile and not profile:
+        profile = os.path.join("profiles", time.strftime("%Y%m%d-%H%M%S"))
+
+    if args.watch and not args.links:
+        parser.error("--watch needs at least one playlist link")
+
+    if args.enqueue or args.work:
+        downloader = SpotifyDownloader(download_dir='downloaded', console=False, bandwidth=bandwidth,
+                                       resolvers=resolvers, output_template=output_template,
+                                       connections=args.connections, segment_size=segment_size,
+                                       profile=profile, min_free_space=min_free, scratch_dir=args.scratch_dir,
+                                       cookie_browser=args.cookies_from_browser)
+        downloader.events.subscribe(ConsoleProgress())
+        exporters = start_exporters(downloader, args)
+        work_queue = SQLiteWorkQueue(args.enqueue or args.work)
+        if args.enqueue:
+            count = Coordinator(downloader, work_queue).enqueue(args.links, audio_format=args.format or 'mp3')
+            print(f"Queued {count} track jobs in {args.enqueue}")
+            finish_run(downloader, exporters)
+            return
+
+        worker = QueueWorker(downloader, work_queue)
+        print(f"Worker {worker.worker_id} processing {args.work}")
+        try:
+            stats = worker.run(exit_when_empty=args.exit_when_empty)
+        except KeyboardInterrupt:
+            stats = worker.stats
+        print(f"Worker done: {stats['successful']} downloaded, {stats['failed']} failed")
+        finish_run(downloader, exporters)
+        return
+
+    if args.serve:
+        downloader = SpotifyDownloader(download_dir='downloaded', console=False, bandwidth=bandwidth,
+                                       resolvers=resolvers, output_template=output_template,
+                                       connections=args.connections, segment_size=segment_size,
+                                       profile=profile, min_free_space=min_free, scratch_dir=args.scratch_dir,
+                                       cookie_browser=args.cookies_from_browser)
+        downloader.events.subscribe(ConsoleProgress())
+        exporters = start_exporters(downloader, args)
+        try:
+            serve(downloader, args.host, args.port, args.workers, args.small_jobs_first)
+        finally:
+            finish_run(downloader, exporters)
+        return
 
     print("\n - - - Spotify Downloader CLI - - - ")
-    print(f"Processing ->: {link}")
+    for link in args.links + args.from_manifest:
+        print(f"Processing ->: {link}")
     print(" --------------------------------------")
 
     downloader = SpotifyDownloader(
         download_dir='downloaded',
-        cookie_browser='chrome',
-        download_delay=3
+        console=False,
+        cookie_browser=args.cookies_from_browser,
+        download_delay=3,
+        bandwidth=bandwidth,
+        resolvers=resolvers,
+        output_template=output_template,
+        connections=args.connections,
+        segment_size=segment_size,
+        profile=profile,
+        min_free_space=min_free,
+        scratch_dir=args.scratch_dir
     )
+    # Render progress events to the terminal
+    downloader.events.subscribe(ConsoleProgress())
+    exporters = start_exporters(downloader, args)
+
+    # First Ctrl+C stops cleanly (the run can be resumed later), a second one quits right away
+    token = CancelToken()
+
+    def on_interrupt(signum, frame):
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        print("\nCancelling... (press Ctrl+C again to quit immediately)")
+        token.cancel()
+
+    signal.signal(signal.SIGINT, on_interrupt)
+
+    if args.watch:
+        watcher = PlaylistWatcher(downloader, args.links, interval, audio_format=args.format or 'mp3')
+        print(f"Watching {len(args.links)} playlist(s), checking every {args.interval} (Ctrl+C to stop)")
+        stats = watcher.run(token=token)
+        print(f"\nStopped watching ({stats['failed']} track downloads failed)")
+        finish_run(downloader, exporters)
+        return
 
     try:
-        stats = downloader.download_playlist(link)
+        stats = {'total': 0, 'successful': 0, 'failed': 0, 'saved': 0}
+        if args.links:
+            stats = downloader.download_playlists(args.links, audio_format=args.format or 'mp3',
+                                                  link_mode=args.link_mode, token=token)
+        for manifest in args.from_manifest:
+            if token.is_cancelled:
+                break
+            # Without -o the manifest's own layout is kept
+            manifest_stats = downloader.download_from_manifest(
+                manifest, audio_format=args.format, token=token,
+                template=output_template if args.output else None
+            )
+            for key in stats:
+                stats[key] += manifest_stats.get(key, 0)
         print("\n" + "=" * 50)
         print(f"Download Complete!")
         print(f"Total tracks: {stats['total']}")
         print(f"Successfully downloaded: {stats['successful']}")
         print(f"Failed: {stats['failed']}")
+        print(f"Downloads saved (duplicates): {stats['saved']}")
+        for name, resolver_stats in downloader.resolvers.stats().items():
+            if resolver_stats['searches']:
+                print(f"  {name}: {resolver_stats['hits']}/{resolver_stats['searches']} found, "
+                      f"{resolver_stats['downloads']} downloaded, "
+                      f"{resolver_stats['latency_avg']:.1f}s avg search")
         print("=" * 50)
     except Exception as e:
         print(f"\nSorry, an error has occurred: {e}")
+    finish_run(downloader, exporters)
 
 
 if __name__ == "__main__":
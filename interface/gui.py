@@ -4,40 +4,150 @@ Super Simple Test GUI to verify layout works
 
 import sys
 import os
+import queue
+from collections import deque
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QLineEdit, QPushButton, QTextEdit, QComboBox, QProgressBar
+    QLabel, QLineEdit, QPushButton, QComboBox, QProgressBar, QListView, QTableView,
+    QHeaderView, QAbstractItemView
 )
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
-from PyQt6.QtGui import QFont, QIcon, QTextCursor
+from PyQt6.QtCore import Qt, QThread, QTimer, pyqtSignal, QAbstractListModel, QAbstractTableModel, QModelIndex
+from PyQt6.QtGui import QFont, QIcon, QColor
 
 # Import the Spotify downloader
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from lib.spotify_lib import SpotifyDownloader
+from lib.progress import ProgressEvent
+from lib.cancel import CancelToken
 
 
-class ConsoleRedirector:
-    """Redirect stdout to GUI console"""
-    def __init__(self, signal):
-        self.signal = signal
+LOG_SYMBOLS = {'success': '✓', 'error': '✗', 'warning': '⚠', 'info': '•'}
 
-    def write(self, text):
-        # Remove ANSI color codes
-        import re
-        text = re.sub(r'\x1b\[[0-9;]*m', '', text)
-        if text.strip():
-            self.signal.emit(text)
+# Most lines the console keeps, older ones are dropped
+LOG_LINE_CAP = 2000
+# How often (ms) progress events are taken off the worker's queue and shown
+FLUSH_INTERVAL_MS = 100
+
+# Track row state -> text color
+STATUS_COLORS = {
+    'waiting': '#888888',
+    'active': '#00d9ff',
+    'done': '#00ff88',
+    'failed': '#ff6b6b',
+    'cancelled': '#ffaa00',
+}
+
+
+class LogModel(QAbstractListModel):
+    """Console lines in a ring buffer, so a long playlist can't grow the log forever"""
+
+    def __init__(self, cap=LOG_LINE_CAP, parent=None):
+        super().__init__(parent)
+        self.cap = cap
+        self.lines = deque()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.lines)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and index.isValid():
+            return self.lines[index.row()]
+        return None
+
+    def append_lines(self, lines):
+        """Add a batch of lines, dropping the oldest ones past the cap"""
+        lines = list(lines)[-self.cap:]
+        if not lines:
+            return
+        overflow = len(self.lines) + len(lines) - self.cap
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self.lines.popleft()
+            self.endRemoveRows()
+        start = len(self.lines)
+        self.beginInsertRows(QModelIndex(), start, start + len(lines) - 1)
+        self.lines.extend(lines)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.lines.clear()
+        self.endResetModel()
+
+
+class TrackTableModel(QAbstractTableModel):
+    """One row per track of the current download: position, name and status"""
+
+    HEADERS = ('#', 'Track', 'Status')
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.tracks = []
+        self.statuses = []
+        self._changed = None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.tracks)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            return (str(row + 1), self.tracks[row], self.statuses[row][1])[column]
+        if role == Qt.ItemDataRole.ForegroundRole and column == 2:
+            return QColor(STATUS_COLORS[self.statuses[row][0]])
+        return None
+
+    def set_tracks(self, tracks):
+        self.beginResetModel()
+        self.tracks = list(tracks)
+        self.statuses = [('waiting', 'Waiting')] * len(self.tracks)
+        self._changed = None
+        self.endResetModel()
+
+    def set_status(self, index, state, text):
+        """
+        Change the status of a track; the view is told in flush()
+
+        Args:
+            index (int): 1-based position of the track
+            state (str): Key of STATUS_COLORS
+            text (str): Status text
+        """
+        row = index - 1
+        if not 0 <= row < len(self.statuses) or self.statuses[row] == (state, text):
+            return
+        self.statuses[row] = (state, text)
+        low, high = self._changed or (row, row)
+        self._changed = (min(low, row), max(high, row))
 
     def flush(self):
-        pass
+        """Emit one dataChanged for every status changed since the last flush"""
+        if self._changed is None:
+            return
+        low, high = self._changed
+        self._changed = None
+        self.dataChanged.emit(self.index(low, 2), self.index(high, 2))
 
 
 class DownloadWorker(QThread):
-    """Worker thread to handle downloads without freezing the GUI"""
-    progress_update = pyqtSignal(int)
-    status_update = pyqtSignal(str)
-    console_update = pyqtSignal(str)
-    stats_update = pyqtSignal(dict)
+    """
+    Worker thread to handle downloads without freezing the GUI
+
+    Progress events are not sent as one Qt signal each. They are queued
+    and the window picks them up in batches on a timer (see
+    SimpleGUI.flush_events), so a fast download can't flood the event loop.
+    """
     finished = pyqtSignal(dict)
 
     def __init__(self, url, audio_format, quality):
@@ -45,87 +155,49 @@ class DownloadWorker(QThread):
         self.url = url
         self.audio_format = audio_format.lower()
         self.quality = quality
-        self.downloader = SpotifyDownloader()
-        self.is_cancelled = False
+        self.downloader = SpotifyDownloader(console=False)
+        self.events = queue.SimpleQueue()
+        self.downloader.events.subscribe(self.events.put)
+        self.token = CancelToken()
 
-    def stop(self):
-        """Stop the download process"""
-        self.is_cancelled = True
+    @property
+    def is_cancelled(self):
+        return self.token.is_cancelled
 
-    def run(self):
-        """Run the download process"""
-        # Redirect stdout to GUI
-        import sys
-        old_stdout = sys.stdout
-        sys.stdout = ConsoleRedirector(self.console_update)
+    def stop(self):
+        """Stop the download process, including the track in progress"""
+        self.token.cancel()
 
-        try:
-            self.console_update.emit(f"Starting download...\n")
-            self.status_update.emit("Downloading...")
-
-            # Validate URL first
-            if not self.downloader.validate_url(self.url):
-                self.finished.emit({'total': 0, 'successful': 0, 'failed': 0})
-                return
-
-            # Get playlist/album name for subfolder
-            playlist_name = self.downloader.get_playlist_name(self.url)
-            if playlist_name:
-                self.console_update.emit(f"Playlist/Album: {playlist_name}\n")
-
-            self.console_update.emit("Fetching track list...\n")
-            tracks = self.downloader.get_tracks_from_url(self.url)
-
-            if not tracks:
-                self.console_update.emit("No tracks found\n")
-                self.finished.emit({'total': 0, 'successful': 0, 'failed': 0})
-                return
-
-            # Download statistics
-            stats = {'total': len(tracks), 'successful': 0, 'failed': 0}
-            self.stats_update.emit(stats)
-
-            for i, track in enumerate(tracks, 1):
-                if self.is_cancelled:
-                    self.console_update.emit("\n⚠ Download cancelled by user\n")
-                    self.status_update.emit("Cancelled")
-                    break
-
-                self.console_update.emit(f"\n[{i}/{len(tracks)}]\n")
-
-                # Download track
-                if self.downloader.download_track(track, self.audio_format, self.quality, subfolder=playlist_name):
-                    stats['successful'] += 1
-                else:
-                    stats['failed'] += 1
+    def pause(self):
+        """Freeze the current download (and ffmpeg) until resume()"""
+        self.token.pause()
 
-                # Update progress and stats
-                progress = int((i / len(tracks)) * 100)
-                self.progress_update.emit(progress)
-                self.stats_update.emit(stats)
+    def resume(self):
+        """Continue a paused download"""
+        self.token.resume()
 
-            # Final update
-            if not self.is_cancelled:
-                self.progress_update.emit(100)
-                self.status_update.emit("Complete!")
+    def log(self, message, level='info'):
+        """Queue a console line from the worker thread"""
+        self.events.put(ProgressEvent(ProgressEvent.LOG, message=message, level=level))
 
+    def run(self):
+        """Run the download process"""
+        try:
+            self.log("Starting download...")
+            stats = self.downloader.download_playlist(self.url, self.audio_format, self.quality,
+                                                      token=self.token)
             self.finished.emit(stats)
 
         except Exception as e:
-            self.console_update.emit(f"Error: {str(e)}\n")
-            self.status_update.emit("Error occurred")
-            self.finished.emit({'total': 0, 'successful': 0, 'failed': 0})
-
-        finally:
-            # Restore stdout
-            sys.stdout = old_stdout
+            self.log(f"Error: {str(e)}", 'error')
+            self.finished.emit({'total': 0, 'successful': 0, 'failed': 0, 'error': True})
 
 
 class SimpleGUI(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Spotify Downloader")
-        self.setFixedSize(650, 580)
+        self.setFixedSize(650, 760)
 
         # Central widget
         central = QWidget()
@@ -318,7 +390,38 @@ class SimpleGUI(QMainWindow):
             }
         """)
 
+        self.pause_btn = QPushButton("Pause")
+        self.pause_btn.setMinimumHeight(36)
+        self.pause_btn.setMaximumWidth(100)
+        self.pause_btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.pause_btn.setEnabled(False)
+        self.pause_btn.setStyleSheet("""
+            QPushButton {
+                background: qlineargradient(x1:0, y1:0, x2:1, y2:1,
+                    stop:0 #ffcc66, stop:1 #cc9933);
+                color: white;
+                border: none;
+                border-radius: 8px;
+                font-size: 14px;
+                font-weight: bold;
+                padding: 10px;
+            }
+            QPushButton:hover {
+                background: qlineargradient(x1:0, y1:0, x2:1, y2:1,
+                    stop:0 #ffdd88, stop:1 #ffcc66);
+            }
+            QPushButton:pressed {
+                background: qlineargradient(x1:0, y1:0, x2:1, y2:1,
+                    stop:0 #cc9933, stop:1 #aa7722);
+            }
+            QPushButton:disabled {
+                background: #444444;
+                color: #888888;
+            }
+        """)
+
         button_layout.addWidget(self.download_btn)
+        button_layout.addWidget(self.pause_btn)
         button_layout.addWidget(self.stop_btn)
         layout.addLayout(button_layout)
 
@@ -327,11 +430,33 @@ class SimpleGUI(QMainWindow):
         console_label.setStyleSheet("font-size: 14px; font-weight: bold; color: #00ffcc;")
         layout.addWidget(console_label)
 
-        self.console = QTextEdit()
+        self.log_model = LogModel()
+        self.console = QListView()
+        self.console.setModel(self.log_model)
+        self.console.setUniformItemSizes(True)
         self.console.setFixedHeight(100)
-        self.console.setReadOnly(True)
         layout.addWidget(self.console)
 
+        # Tracks
+        tracks_label = QLabel("Tracks:")
+        tracks_label.setStyleSheet("font-size: 14px; font-weight: bold; color: #00ffcc;")
+        layout.addWidget(tracks_label)
+
+        self.track_model = TrackTableModel()
+        self.track_table = QTableView()
+        self.track_table.setModel(self.track_model)
+        self.track_table.setFixedHeight(160)
+        self.track_table.verticalHeader().setVisible(False)
+        self.track_table.verticalHeader().setDefaultSectionSize(22)
+        self.track_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.track_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        header = self.track_table.horizontalHeader()
+        header.setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents)
+        header.setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        header.setSectionResizeMode(2, QHeaderView.ResizeMode.Fixed)
+        header.resizeSection(2, 150)
+        layout.addWidget(self.track_table)
+
         # Stats
         stats_label = QLabel("Statistics:")
         stats_label.setStyleSheet("font-size: 14px; font-weight: bold; color: #00ffcc;")
@@ -393,15 +518,95 @@ class SimpleGUI(QMainWindow):
         # Connect buttons
         self.download_btn.clicked.connect(self.start_download)
         self.stop_btn.clicked.connect(self.stop_download)
+        self.pause_btn.clicked.connect(self.toggle_pause)
 
         # Worker thread
         self.worker = None
+        self.stats = {'total': 0, 'successful': 0, 'failed': 0}
+        # Track name -> row of the tracks being downloaded, progress events only carry the name
+        self.active_tracks = {}
+
+        # Picks up the worker's progress events in batches
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setInterval(FLUSH_INTERVAL_MS)
+        self.flush_timer.timeout.connect(self.flush_events)
 
     def log_to_console(self, message):
         """Add message to console"""
-        self.console.append(message.strip())
+        self.log_model.append_lines(message.strip().splitlines())
         # Auto-scroll to bottom
-        self.console.moveCursor(QTextCursor.MoveOperation.End)
+        self.console.scrollToBottom()
+
+    def flush_events(self):
+        """Apply every progress event queued since the last tick in one go"""
+        if self.worker is None:
+            return
+        lines = []
+        status = None
+        stats_changed = False
+
+        while True:
+            try:
+                event = self.worker.events.get_nowait()
+            except queue.Empty:
+                break
+
+            kind = event.kind
+            if kind == ProgressEvent.LOG:
+                lines.append(f"{LOG_SYMBOLS.get(event.level, '•')} {event.message}")
+            elif kind == ProgressEvent.JOB_STARTED:
+                tracks = event.data.get('tracks') or []
+                self.track_model.set_tracks(tracks)
+                self.active_tracks = {}
+                self.stats = {'total': len(tracks), 'successful': 0, 'failed': 0}
+                stats_changed = True
+                status = "Downloading..."
+            elif kind == ProgressEvent.TRACK_STARTED:
+                lines += ["", f"[{event.index}/{event.total}]", f"Searching for: '{event.track}'"]
+                self.active_tracks[event.track] = event.index
+                self.track_model.set_status(event.index, 'active', 'Searching...')
+            elif kind == ProgressEvent.TRACK_RESOLVED:
+                lines.append(f"✓ Found: {event.message}")
+            elif kind == ProgressEvent.DOWNLOAD_PROGRESS:
+                if event.percent is not None:
+                    status = f"Downloading... {event.percent:.0f}%"
+                    self._set_track_status(event.track, 'active', f"Downloading {event.percent:.0f}%")
+            elif kind == ProgressEvent.DOWNLOAD_FINISHED:
+                lines.append(f"✓ Completed: {event.message}")
+            elif kind == ProgressEvent.TRANSCODE_STARTED:
+                status = "Converting..."
+                self._set_track_status(event.track, 'active', 'Converting...')
+            elif kind == ProgressEvent.TRACK_DONE:
+                self.track_model.set_status(event.index, 'done', 'Downloaded')
+                self.stats['successful'] += 1
+                stats_changed = True
+            elif kind == ProgressEvent.TRACK_FAILED:
+                if event.data.get('cancelled'):
+                    self.track_model.set_status(event.index, 'cancelled', 'Cancelled')
+                else:
+                    self.track_model.set_status(event.index, 'failed', 'Failed')
+                    self.stats['failed'] += 1
+                    stats_changed = True
+            elif kind == ProgressEvent.JOB_FINISHED and event.data.get('cancelled'):
+                lines += ["", "⚠ Download cancelled by user"]
+                status = "Cancelled"
+
+        if lines:
+            self.log_to_console("\n".join(lines))
+        self.track_model.flush()
+        if status is not None and not (self.worker.token.is_paused and status.startswith("Downloading")):
+            self.update_status(status)
+        if stats_changed:
+            self.update_stats(self.stats)
+            if self.stats['total']:
+                done = self.stats['successful'] + self.stats['failed']
+                self.update_progress(int(done * 100 / self.stats['total']))
+
+    def _set_track_status(self, track, state, text):
+        """Status update for events that only carry the track name"""
+        index = self.active_tracks.get(track)
+        if index is not None:
+            self.track_model.set_status(index, state, text)
 
     def update_progress(self, value):
         """Update progress bar"""
@@ -419,10 +624,18 @@ class SimpleGUI(QMainWindow):
 
     def download_finished(self, stats):
         """Called when download is complete"""
+        # Show whatever the worker queued after the last tick
+        self.flush_events()
+        self.flush_timer.stop()
         self.update_stats(stats)
+        if not stats.get('error') and not self.worker.is_cancelled:
+            self.update_progress(100)
+            self.update_status("Complete!")
         self.download_btn.setEnabled(True)
         self.download_btn.setText("Start Download")
         self.stop_btn.setEnabled(False)
+        self.pause_btn.setEnabled(False)
+        self.pause_btn.setText("Pause")
 
         if stats['successful'] > 0:
             self.log_to_console(f"\n✓ Download complete! {stats['successful']}/{stats['total']} successful\n")
@@ -435,6 +648,22 @@ class SimpleGUI(QMainWindow):
             self.worker.stop()
             self.log_to_console("\nStopping download...\n")
             self.stop_btn.setEnabled(False)
+            self.pause_btn.setEnabled(False)
+
+    def toggle_pause(self):
+        """Pause or resume the current download"""
+        if not (self.worker and self.worker.isRunning()):
+            return
+        if self.worker.token.is_paused:
+            self.worker.resume()
+            self.update_status("Downloading...")
+            self.pause_btn.setText("Pause")
+            self.log_to_console("Resumed\n")
+        else:
+            self.worker.pause()
+            self.update_status("Paused")
+            self.pause_btn.setText("Resume")
+            self.log_to_console("Paused\n")
 
     def start_download(self):
         """Start the download process"""
@@ -453,19 +682,22 @@ class SimpleGUI(QMainWindow):
         quality = self.quality_combo.currentText().split()[0]  # Get just the number or 'auto'
 
         # Reset UI
-        self.console.clear()
+        self.log_model.clear()
+        self.track_model.set_tracks([])
+        self.stats = {'total': 0, 'successful': 0, 'failed': 0}
+        self.update_stats(self.stats)
         self.progress_bar.setValue(0)
+        self.update_status("Downloading...")
         self.download_btn.setEnabled(False)
         self.download_btn.setText("Downloading...")
         self.stop_btn.setEnabled(True)
+        self.pause_btn.setEnabled(True)
+        self.pause_btn.setText("Pause")
 
         # Create and start worker thread
         self.worker = DownloadWorker(url, audio_format, quality)
-        self.worker.progress_update.connect(self.update_progress)
-        self.worker.status_update.connect(self.update_status)
-        self.worker.console_update.connect(self.log_to_console)
-        self.worker.stats_update.connect(self.update_stats)
         self.worker.finished.connect(self.download_finished)
+        self.flush_timer.start()
         self.worker.start()
 
 def main():
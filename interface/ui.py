@@ -2,10 +2,22 @@
 Gradio Web UI for Spotify Downloader
 """
 
+import html
 import os
+import queue
+import threading
 import time
-from lib import SpotifyDownloader
+import uuid
+from collections import OrderedDict
+from urllib.parse import quote
+from lib import SpotifyDownloader, ProgressEvent
+from lib.cancel import CancelToken
+from lib.naming import sanitize_name
+from lib.zipstream import ZipExport, parse_range, resolve_library_path, library_archive
 import gradio as gr
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import uvicorn
 
 
 def load_css(file_path='assets/styles.css'):
@@ -16,104 +28,355 @@ def load_css(file_path='assets/styles.css'):
     return ""
 
 
-def download_spotify(spotify_url, audio_format, quality):
-    """Gradio function to download Spotify content with live progress"""
-
-    # Box wrapper style
-    box_wrapper = "<div style='background: #1a1a1a; border: 2px solid #00ffcc; border-radius: 12px; padding: 20px; font-family: monospace; font-size: 14px; line-height: 1.8; min-height: 400px; color: #ffffff; box-shadow: 0 4px 6px rgba(0, 255, 204, 0.1);'>"
-    box_close = "</div>"
-
-    if not spotify_url or not spotify_url.strip():
-        yield f"{box_wrapper}<span style='color: #ff6b6b; font-weight: bold;'> Please enter a valid Spotify URL</span>{box_close}"
-        return
-
-    downloader = SpotifyDownloader(download_dir='downloaded')
-
-    try:
-        # Show fetching message
-        output = "<span style='color: #00d9ff; font-weight: bold;'>• Fetching track list from Spotify...</span><br>"
-        print(f"DEBUG: Yielding initial message")  # Debug
-        yield f"{box_wrapper}{output}{box_close}"
-        time.sleep(0.1)  # Small delay for UI update
-
-        # Validate and get tracks
-        if not downloader.validate_url(spotify_url):
-            output += "<span style='color: #ff6b6b; font-weight: bold;'>✗ Invalid Spotify URL</span><br>"
-            yield f"{box_wrapper}{output}{box_close}"
-            return
-
-        tracks = downloader.get_tracks_from_url(spotify_url)
-
-        if not tracks:
-            output += "<span style='color: #ff6b6b; font-weight: bold;'>✗ No tracks found</span><br>"
-            yield f"{box_wrapper}{output}{box_close}"
+# Box wrapper style
+BOX_WRAPPER = "<div style='background: #1a1a1a; border: 2px solid #00ffcc; border-radius: 12px; padding: 20px; font-family: monospace; font-size: 14px; line-height: 1.8; min-height: 400px; color: #ffffff; box-shadow: 0 4px 6px rgba(0, 255, 204, 0.1);'>"
+BOX_CLOSE = "</div>"
+
+# Only this many track rows are rendered at a time, the rest are scrolled to
+WINDOW_ROWS = 40
+# Progress events are merged and the page is updated at most this often
+MAX_UPDATES_PER_SECOND = 4
+
+# Where the web UI downloads to, any folder in it can be fetched at /zip/library/<folder>
+DOWNLOAD_DIR = 'downloaded'
+
+# Downloads in progress that can be fetched as a ZIP (/zip/<id>). Finished ones move to
+# /zip/library/..., only exports that don't fit one folder stay, oldest are forgotten first
+MAX_EXPORTS = 50
+EXPORTS = OrderedDict()
+_exports_lock = threading.Lock()
+
+# Row status -> (color, bold)
+ROW_STYLES = {
+    'waiting': ('#888888', False),
+    'active': ('#00d9ff', False),
+    'done': ('#00ff88', True),
+    'failed': ('#ff6b6b', True),
+    'cancelled': ('#ffaa00', True),
+}
+
+
+class TrackTable:
+    """
+    Live state of one download, rendered a window of rows at a time
+
+    Every event only touches the row it is about (its HTML is cached), and
+    render() only builds the visible window, so the cost of an update does
+    not grow with the size of the playlist.
+    """
+
+    def __init__(self):
+        self.name = None
+        self.tracks = []
+        self.rows = []
+        self.counts = {'done': 0, 'failed': 0, 'cancelled': 0}
+        self.active = 0
+        self.error = None
+        self.stats = None
+        self.zip_url = None
+        self.dirty = True
+        self._positions = {}
+        self._percent = {}
+
+    def _set_row(self, index, status, label):
+        i = index - 1
+        if not 0 <= i < len(self.rows):
             return
-
-        output += f"<span style='color: #00ff88; font-weight: bold;'>✓ Found {len(tracks)} track(s)</span><br><br>"
-
-        # Initialize track list
-        track_lines = []
-        for i, track in enumerate(tracks, 1):
-            track_lines.append(f"<span style='color: #888888;'>{i}. {track} - Waiting...</span>")
-
-        output += "<br>".join(track_lines) + "<br>"
-        yield f"{box_wrapper}{output}{box_close}"
-        time.sleep(0.1)
-
-        # Download each track
-        successful = 0
-        failed = 0
-
-        for i, track in enumerate(tracks, 1):
-            # Animate progress from 0% to 95%
-            progress_steps = [0, 15, 35, 50, 65, 80, 95]
-
-            for progress in progress_steps:
-                track_lines[i-1] = f"<span style='color: #00d9ff;'>{i}. {track} - Downloading - {progress}%</span>"
-                output = f"<span style='color: #00d9ff; font-weight: bold;'>• Fetching track list from Spotify...</span><br>"
-                output += f"<span style='color: #00ff88; font-weight: bold;'>✓ Found {len(tracks)} track(s)</span><br><br>"
-                output += "<br>".join(track_lines) + "<br>"
-                yield f"{box_wrapper}{output}{box_close}"
-                time.sleep(0.15)  # Quick animation
-
-            # Attempt download
-            success = downloader.download_track(track, audio_format=audio_format.lower(), quality=quality)
-
-            # Update track to final status
-            if success:
-                track_lines[i-1] = f"<span style='color: #00ff88; font-weight: bold;'>{i}. {track} - Downloaded - 100%</span>"
-                successful += 1
-            else:
-                track_lines[i-1] = f"<span style='color: #ff6b6b; font-weight: bold;'>{i}. {track} - Failed</span>"
-                failed += 1
-
-            output = f"<span style='color: #00d9ff; font-weight: bold;'>• Fetching track list from Spotify...</span><br>"
-            output += f"<span style='color: #00ff88; font-weight: bold;'>✓ Found {len(tracks)} track(s)</span><br><br>"
-            output += "<br>".join(track_lines) + "<br>"
-            yield f"{box_wrapper}{output}{box_close}"
-            time.sleep(0.1)
-
-        # Final summary
-        total = len(tracks)
+        old_status = self.rows[i][0] if self.rows[i] else None
+        if old_status in self.counts:
+            self.counts[old_status] -= 1
+        if status in self.counts:
+            self.counts[status] += 1
+        color, bold = ROW_STYLES[status]
+        weight = " font-weight: bold;" if bold else ""
+        line = f"<span style='color: {color};{weight}'>{index}. {html.escape(self.tracks[i])} - {label}</span>"
+        self.rows[i] = (status, line)
+        self.dirty = True
+
+    def apply(self, event):
+        """Update the table from one progress event"""
+        kind = event.kind
+        if kind == ProgressEvent.JOB_STARTED:
+            self.name = event.message
+            self.tracks = list(event.data.get('tracks') or [])
+            self.rows = [None] * len(self.tracks)
+            for i in range(1, len(self.tracks) + 1):
+                self._set_row(i, 'waiting', 'Waiting...')
+            self._positions = {}
+        elif kind == ProgressEvent.JOB_FINISHED:
+            self.stats = dict(event.data)
+            self.dirty = True
+        elif kind == ProgressEvent.LOG:
+            if event.level == 'error' and not self.tracks:
+                self.error = event.message
+                self.dirty = True
+        elif event.index is not None or event.track in self._positions:
+            index = event.index or self._positions[event.track]
+            if kind == ProgressEvent.TRACK_STARTED:
+                self._positions[event.track] = index
+                self.active = index
+                self._set_row(index, 'active', 'Searching...')
+            elif kind == ProgressEvent.DOWNLOAD_PROGRESS and event.percent is not None:
+                # Whole percents only, anything finer is invisible anyway
+                percent = int(event.percent)
+                if self._percent.get(index) != percent:
+                    self._percent[index] = percent
+                    self._set_row(index, 'active', f"Downloading - {percent}%")
+            elif kind == ProgressEvent.TRANSCODE_STARTED:
+                self._set_row(index, 'active', 'Converting...')
+            elif kind == ProgressEvent.TRACK_DONE:
+                self._set_row(index, 'done', 'Downloaded - 100%')
+            elif kind == ProgressEvent.TRACK_FAILED:
+                if event.data.get('cancelled'):
+                    self._set_row(index, 'cancelled', 'Cancelled')
+                else:
+                    self._set_row(index, 'failed', 'Failed')
+
+    def render(self, start=None):
+        """
+        HTML for the status header and one window of rows
+
+        Args:
+            start (int): First row shown (0-based), None follows the track being downloaded
+        """
+        self.dirty = False
+        output = "<span style='color: #00d9ff; font-weight: bold;'>• Fetching track list from Spotify...</span><br>"
+        if self.error:
+            return f"{BOX_WRAPPER}{output}<span style='color: #ff6b6b; font-weight: bold;'>✗ {html.escape(self.error)}</span><br>{BOX_CLOSE}"
+        if not self.tracks:
+            return f"{BOX_WRAPPER}{output}{BOX_CLOSE}"
+
+        total = len(self.tracks)
+        title = f" in {html.escape(self.name)}" if self.name else ""
+        output += f"<span style='color: #00ff88; font-weight: bold;'>✓ Found {total} track(s){title}</span><br>"
+        output += (f"<span style='color: #ffffff;'>Done: {self.counts['done']}</span> | "
+                   f"<span style='color: #ff6b6b;'>Failed: {self.counts['failed']}</span> | "
+                   f"<span style='color: #888888;'>Remaining: {total - sum(self.counts.values())}</span><br>")
+        if self.zip_url and self.counts['done']:
+            note = "" if self.stats is not None else " (streams the rest as tracks finish)"
+            output += (f"<a href='{self.zip_url}' style='color: #00ffcc; font-weight: bold;'>⬇ Download ZIP</a>"
+                       f"<span style='color: #888888;'>{note}</span><br>")
+        output += "<br>"
+
+        if start is None:
+            start = max(0, self.active - 1 - WINDOW_ROWS // 4)
+        start = max(0, min(start, total - WINDOW_ROWS))
+        end = min(total, start + WINDOW_ROWS)
+        if start or end < total:
+            output += f"<span style='color: #888888;'>Showing tracks {start + 1}-{end} of {total}</span><br>"
+        output += "<br>".join(line for _, line in self.rows[start:end]) + "<br>"
+
+        if self.stats is not None:
+            output += self._render_summary()
+        return f"{BOX_WRAPPER}{output}{BOX_CLOSE}"
+
+    def _render_summary(self):
+        total = len(self.tracks)
+        successful = self.stats.get('successful', self.counts['done'])
+        failed = self.stats.get('failed', self.counts['failed'])
         success_rate = (successful/total*100) if total > 0 else 0
 
-        output += "<br><br><span style='color: #00ff88; font-size: 16px; font-weight: bold;'>✅ Download Complete!</span><br><br>"
+        if self.stats.get('cancelled'):
+            output = "<br><br><span style='color: #ffaa00; font-size: 16px; font-weight: bold;'>⚠ Download Cancelled</span><br><br>"
+        else:
+            output = "<br><br><span style='color: #00ff88; font-size: 16px; font-weight: bold;'>✅ Download Complete!</span><br><br>"
         output += "<span style='color: #00d9ff; font-weight: bold;'>📊 Statistics</span><br>"
         output += f"<span style='color: #ffffff;'>• Total: {total}</span> | "
         output += f"<span style='color: #00ff88;'>Successful: {successful}</span> | "
         output += f"<span style='color: #ff6b6b;'>Failed: {failed}</span> | "
         output += f"<span style='color: #ffaa00;'>Success rate: {success_rate:.1f}%</span><br>"
         output += f"<span style='color: #888888;'>📁 Saved to: ./downloaded/</span>"
+        return output
 
-        yield f"{box_wrapper}{output}{box_close}"
 
-    except Exception as e:
-        output = f"<span style='color: #ff6b6b; font-weight: bold;'>Error Occurred: {str(e)}</span><br><br>"
-        output += "<span style='color: #ffffff;'>Please check:</span><br>"
-        output += "<span style='color: #ffffff;'>• URL is correct</span><br>"
-        output += "<span style='color: #ffffff;'>• Internet connection</span><br>"
-        output += "<span style='color: #ffffff;'>• Chrome browser is closed (needed for cookie extraction)</span>"
-        yield f"{box_wrapper}{output}{box_close}"
+def download_spotify(spotify_url, audio_format, quality, session):
+    """Gradio function to download Spotify content with live progress"""
+    if not spotify_url or not spotify_url.strip():
+        yield f"{BOX_WRAPPER}<span style='color: #ff6b6b; font-weight: bold;'> Please enter a valid Spotify URL</span>{BOX_CLOSE}"
+        return
+
+    # Mostly single tracks here, so fetch each file over a few connections
+    downloader = SpotifyDownloader(download_dir=DOWNLOAD_DIR, connections=4)
+    # The Cancel/Pause buttons and the scroll box reach this download through the session state
+    token = CancelToken()
+    table = TrackTable()
+    session['token'] = token
+    session['table'] = table
+
+    # Finished files can be fetched as a ZIP right away, even while the rest download
+    export_id = uuid.uuid4().hex
+    export = register_export(export_id, ZipExport('spotify-download', downloader.download_dir))
+    table.zip_url = f"/zip/{export_id}"
+
+    def collect(event):
+        if event.kind == ProgressEvent.JOB_STARTED and event.message:
+            export.name = sanitize_name(event.message) or export.name
+        elif event.kind == ProgressEvent.TRACK_DONE and event.data.get('path'):
+            export.add(event.data['path'])
+
+    stop_collecting = downloader.events.subscribe(collect)
+
+    # Progress events come in on the download thread, hand them over via a queue
+    events = queue.Queue()
+    unsubscribe = downloader.events.subscribe(events.put)
+    result = {}
+
+    def run():
+        try:
+            result['stats'] = downloader.download_playlist(spotify_url.strip(), audio_format.lower(), quality,
+                                                           token=token)
+        except Exception as e:
+            result['error'] = e
+
+    try:
+        yield table.render()
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+
+        # Apply every event as it arrives, but only send a new page a few times a second
+        interval = 1.0 / MAX_UPDATES_PER_SECOND
+        last_update = 0.0
+        while worker.is_alive() or not events.empty():
+            try:
+                table.apply(events.get(timeout=interval))
+                while True:
+                    table.apply(events.get_nowait())
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            if table.dirty and now - last_update >= interval:
+                last_update = now
+                yield table.render(session.get('view_start'))
+        worker.join()
+    except GeneratorExit:
+        # The page was closed or reloaded, nobody is watching this download any more
+        token.cancel()
+        raise
+    finally:
+        unsubscribe()
+        stop_collecting()
+        export.finish()
+        session.pop('token', None)
+        # The files are on disk now, serve them from there (survives restarts, never evicted)
+        common = export.common_path()
+        if common is not None:
+            relative = os.path.relpath(common, os.path.realpath(DOWNLOAD_DIR)).replace(os.sep, '/')
+            table.zip_url = f"/zip/library/{quote(relative)}"
+            unregister_export(export_id)
+
+    if 'error' not in result:
+        yield table.render(session.get('view_start'))
+        return
+
+    output = f"<span style='color: #ff6b6b; font-weight: bold;'>Error Occurred: {html.escape(str(result['error']))}</span><br><br>"
+    output += "<span style='color: #ffffff;'>Please check:</span><br>"
+    output += "<span style='color: #ffffff;'>• URL is correct</span><br>"
+    output += "<span style='color: #ffffff;'>• Internet connection</span><br>"
+    output += "<span style='color: #ffffff;'>• Chrome browser is closed (needed for cookie extraction)</span>"
+    yield f"{BOX_WRAPPER}{output}{BOX_CLOSE}"
+
+
+def register_export(export_id, export):
+    """Make a ZipExport downloadable at /zip/<export_id>"""
+    with _exports_lock:
+        EXPORTS[export_id] = export
+        while len(EXPORTS) > MAX_EXPORTS:
+            EXPORTS.popitem(last=False)
+    return export
+
+
+def unregister_export(export_id):
+    with _exports_lock:
+        EXPORTS.pop(export_id, None)
+
+
+def zip_download(export_id: str, request: Request):
+    """
+    GET /zip/<id>: the files of one download as a stored ZIP, streamed from disk
+
+    While the download runs, files are streamed as they finish (no size,
+    no ranges). Once it is done the archive has a fixed size and layout,
+    so Range/If-Range requests can resume an interrupted download.
+    """
+    with _exports_lock:
+        export = EXPORTS.get(export_id)
+    if export is None:
+        return JSONResponse({'error': 'Unknown download'}, status_code=404)
+
+    if not export.finished:
+        headers = {'Content-Disposition': f"attachment; filename*=UTF-8''{quote(export.name)}.zip"}
+        return StreamingResponse(export.iter_live(), media_type='application/zip', headers=headers)
+    return archive_response(export.archive(), export.name, request)
+
+
+def library_zip(path: str, request: Request):
+    """
+    GET /zip/library/<folder>: a playlist/album folder (or one file) of the library as a ZIP
+
+    Built from what is on disk, so it works for anything in the download
+    folder, also after a restart. Supports Range/If-Range like /zip/<id>.
+    """
+    full_path = resolve_library_path(DOWNLOAD_DIR, path)
+    if full_path is None:
+        return JSONResponse({'error': 'Unknown folder'}, status_code=404)
+    archive = library_archive(DOWNLOAD_DIR, full_path)
+    if not archive.entries:
+        return JSONResponse({'error': 'Nothing to download yet'}, status_code=404)
+    name = os.path.basename(full_path)
+    if os.path.isfile(full_path):
+        name = os.path.splitext(name)[0]
+    return archive_response(archive, name, request)
+
+
+def archive_response(archive, name, request):
+    """Stream a ZipStream with its size and ETag, answering Range/If-Range requests"""
+    headers = {'Content-Disposition': f"attachment; filename*=UTF-8''{quote(name)}.zip"}
+    etag = f'"{archive.etag()}"'
+    headers.update({'Accept-Ranges': 'bytes', 'ETag': etag})
+
+    byte_range = None
+    if request.headers.get('If-Range', etag) == etag:
+        try:
+            byte_range = parse_range(request.headers.get('Range'), archive.size)
+        except ValueError:
+            return Response(status_code=416, headers={'Content-Range': f"bytes */{archive.size}"})
+
+    if byte_range is None:
+        headers['Content-Length'] = str(archive.size)
+        return StreamingResponse(archive.iter_bytes(), media_type='application/zip', headers=headers)
+    start, end = byte_range
+    headers['Content-Length'] = str(end - start + 1)
+    headers['Content-Range'] = f"bytes {start}-{end}/{archive.size}"
+    return StreamingResponse(archive.iter_bytes(start, end), status_code=206, media_type='application/zip',
+                             headers=headers)
+
+
+def scroll_tracks(position, session):
+    """Show the track list from row `position` (0 follows the track being downloaded)"""
+    session['view_start'] = int(position) - 1 if position and position > 0 else None
+    table = session.get('table')
+    if table is None:
+        return gr.update()
+    return table.render(session['view_start'])
+
+
+def cancel_download(session):
+    """Cancel the running download of this browser session, including the current track"""
+    token = session.get('token')
+    if token:
+        token.cancel()
+
+
+def toggle_pause(session):
+    """Pause or resume the running download of this browser session"""
+    token = session.get('token')
+    if not token:
+        return gr.update(value="Pause")
+    if token.is_paused:
+        token.resume()
+        return gr.update(value="Pause")
+    token.pause()
+    return gr.update(value="Resume")
 
 
 def create_ui():
@@ -150,14 +413,29 @@ def create_ui():
             elem_classes="result-output"
         )
 
+        session = gr.State({})
+
+        scroll_box = gr.Number(
+            label="Show tracks from # (0 follows the current track)",
+            value=0,
+            precision=0,
+            minimum=0
+        )
+
         submit_btn = gr.Button("Start Download")
+        with gr.Row():
+            pause_btn = gr.Button("Pause")
+            cancel_btn = gr.Button("Cancel")
 
         submit_btn.click(
             fn=download_spotify,
-            inputs=[spotify_input, audio_format_dropdown, quality_dropdown],
+            inputs=[spotify_input, audio_format_dropdown, quality_dropdown, session],
             outputs=result_box,
             show_progress=True
         )
+        pause_btn.click(fn=toggle_pause, inputs=session, outputs=pause_btn, queue=False)
+        cancel_btn.click(fn=cancel_download, inputs=session, outputs=None, queue=False)
+        scroll_box.change(fn=scroll_tracks, inputs=[scroll_box, session], outputs=result_box, queue=False)
 
         gr.Markdown(
             """
@@ -174,6 +452,19 @@ def create_ui():
     return webpage_UI
 
 
+def create_app():
+    """The Gradio UI plus the ZIP download route, as one FastAPI app"""
+    app = FastAPI()
+    app.get("/zip/library/{path:path}")(library_zip)
+    app.get("/zip/{export_id}")(zip_download)
+    return gr.mount_gradio_app(app, create_ui(), path="/")
+
+
+def launch(host="127.0.0.1", port=7860):
+    """Serve the web interface (same address as Gradio's launch())"""
+    print(f"Web interface running on http://{host}:{port}")
+    uvicorn.run(create_app(), host=host, port=port, log_level="warning")
+
+
 if __name__ == "__main__":
-    ui = create_ui()
-    ui.launch()
+    launch()
@@ -3,5 +3,8 @@ Core library modules for Spotify Downloader
 """
 
 from .spotify_lib import SpotifyDownloader
+from .progress import ProgressBus, ProgressEvent, ConsoleProgress
+from .library import LibraryIndex
+from .engine import DownloadEngine
 
-__all__ = ['SpotifyDownloader']
+__all__ = ['SpotifyDownloader', 'ProgressBus', 'ProgressEvent', 'ConsoleProgress', 'LibraryIndex', 'DownloadEngine']
@@ -0,0 +1,227 @@
+"""
+Bandwidth shaping for downloads
+
+yt-dlp pulls every stream as fast as the connection allows. Its own
+`ratelimit` option is fixed when the YoutubeDL object is built and applies
+to one download only, so it can't express "all downloads together may use
+2 MB/s" or be changed while a job runs.
+
+BandwidthManager instead charges every block yt-dlp reads against token
+buckets: one global bucket shared by all concurrent downloads and an
+optional bucket per job. The charge happens in the progress hook, which
+yt-dlp calls on the download thread right after each block is read, so
+sleeping there slows down the fetch loop itself.
+
+The global limit can follow a time-of-day schedule, and every limit can be
+changed at any time; throttled downloads pick up the new rate within a
+fraction of a second.
+"""
+
+import re
+import threading
+import time
+
+
+def parse_rate(text):
+    """
+    Parse a human rate like '500K', '2M' or '1.5MB' into bytes per second
+
+    Args:
+        text (str): Rate with optional K/M/G suffix (powers of 1024); '0' or '' means unlimited
+
+    Returns:
+        int: Bytes per second, or None for unlimited
+    """
+    if text is None:
+        return None
+    match = re.fullmatch(r'\s*([\d.]+)\s*([KMG]?)(?:i?B)?(?:/s)?\s*', str(text), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid rate '{text}', expected something like 500K or 2M")
+    value = float(match.group(1)) * {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}[match.group(2).upper()]
+    return int(value) or None
+
+
+def parse_schedule_entry(text):
+    """
+    Parse a schedule entry like '09:00-18:00=500K'
+
+    Returns:
+        tuple: (start_minute, end_minute, bytes_per_second or None)
+    """
+    match = re.fullmatch(r'\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*=\s*(\S+)\s*', text)
+    if not match:
+        raise ValueError(f"Invalid schedule '{text}', expected HH:MM-HH:MM=RATE")
+    start = int(match.group(1)) * 60 + int(match.group(2))
+    end = int(match.group(3)) * 60 + int(match.group(4))
+    return start, end, parse_rate(match.group(5))
+
+
+class TokenBucket:
+    """Classic token bucket; rate can be changed while consumers are waiting"""
+
+    def __init__(self, rate=None, burst_seconds=1.0):
+        """
+        Args:
+            rate (float): Bytes per second, None for unlimited
+            burst_seconds (float): How many seconds worth of bytes may be spent at once
+        """
+        self.burst_seconds = burst_seconds
+        self._lock = threading.Lock()
+        self._rate = rate
+        self._tokens = self._burst()
+        self._last = time.monotonic()
+
+    def _burst(self):
+        return (self._rate or 0) * self.burst_seconds
+
+    def _refill(self):
+        now = time.monotonic()
+        if self._rate:
+            self._tokens = min(self._burst(), self._tokens + (now - self._last) * self._rate)
+        self._last = now
+
+    @property
+    def rate(self):
+        return self._rate
+
+    def set_rate(self, rate):
+        """Change the rate (None for unlimited), effective for waiting consumers too"""
+        with self._lock:
+            self._refill()
+            self._rate = rate or None
+            self._tokens = min(self._tokens, self._burst())
+
+    def consume(self, amount):
+        """
+        Spend `amount` bytes, sleeping until the bucket has paid them back
+
+        Large blocks may push the bucket into debt; the caller then sleeps
+        until the debt is repaid, in short slices so rate changes apply quickly.
+        """
+        with self._lock:
+            if not self._rate:
+                return
+            self._refill()
+            self._tokens -= amount
+
+        while True:
+            with self._lock:
+                if not self._rate:
+                    return
+                self._refill()
+                if self._tokens >= 0:
+                    return
+                wait = -self._tokens / self._rate
+            time.sleep(min(wait, 0.25))
+
+
+class BandwidthManager:
+    """Global and per-job download rate limits with an optional time-of-day schedule"""
+
+    def __init__(self, global_limit=None, schedule=None):
+        """
+        Args:
+            global_limit (int): Bytes per second for all downloads together, None for unlimited
+            schedule (list): (start_minute, end_minute, rate) windows overriding global_limit,
+                see parse_schedule_entry(); windows may wrap past midnight
+        """
+        self._lock = threading.Lock()
+        self.global_limit = global_limit
+        self.schedule = list(schedule or [])
+        self._global = TokenBucket(self.current_global_limit())
+        self._jobs = {}
+        self._job_limits = {}
+        self._last_check = 0
+
+    # ===== Runtime configuration =====
+
+    def set_global_limit(self, rate):
+        """Change the default global limit (bytes/s, None for unlimited)"""
+        with self._lock:
+            self.global_limit = rate
+        self._global.set_rate(self.current_global_limit())
+
+    def set_schedule(self, schedule):
+        """Replace the time-of-day schedule"""
+        with self._lock:
+            self.schedule = list(schedule or [])
+        self._global.set_rate(self.current_global_limit())
+
+    def set_job_limit(self, job_id, rate):
+        """Cap one job (bytes/s, None to remove the cap)"""
+        with self._lock:
+            if rate:
+                self._job_limits[job_id] = rate
+                bucket = self._jobs.get(job_id)
+                if bucket is None:
+                    self._jobs[job_id] = TokenBucket(rate)
+                    return
+            else:
+                self._job_limits.pop(job_id, None)
+                bucket = self._jobs.pop(job_id, None)
+        if bucket is not None:
+            bucket.set_rate(rate)
+
+    def current_global_limit(self, now=None):
+        """
+        Global limit in force right now, taking the schedule into account
+
+        Returns:
+            int: Bytes per second, or None for unlimited
+        """
+        now = now or time.localtime()
+        minute = now.tm_hour * 60 + now.tm_min
+        for start, end, rate in self.schedule:
+            if start <= end:
+                active = start <= minute < end
+            else:
+                # Window wraps past midnight, e.g. 22:00-06:00
+                active = minute >= start or minute < end
+            if active:
+                return rate
+        return self.global_limit
+
+    def to_dict(self):
+        """JSON friendly view of the limits"""
+        with self._lock:
+            return {
+                'global_limit': self.global_limit,
+                'effective_global_limit': self._global.rate,
+                'schedule': [
+                    {'start': f"{s // 60:02d}:{s % 60:02d}", 'end': f"{e // 60:02d}:{e % 60:02d}", 'rate': r}
+                    for s, e, r in self.schedule
+                ],
+                'jobs': dict(self._job_limits),
+            }
+
+    # ===== Enforcement =====
+
+    def throttle(self, job_id, amount):
+        """
+        Charge `amount` freshly downloaded bytes, blocking as long as the limits require
+
+        Args:
+            job_id (str): Job the bytes belong to (None if not part of a job)
+            amount (int): Bytes read since the last call for this download
+        """
+        if amount <= 0:
+            return
+
+        # Follow the schedule, checked at most once a second
+        now = time.monotonic()
+        if self.schedule and now - self._last_check >= 1.0:
+            self._last_check = now
+            rate = self.current_global_limit()
+            if rate != self._global.rate:
+                self._global.set_rate(rate)
+
+        bucket = self._jobs.get(job_id) if job_id else None
+        if bucket is not None:
+            bucket.consume(amount)
+        self._global.consume(amount)
+
+    def forget_job(self, job_id):
+        """Drop the bucket of a finished job"""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._job_limits.pop(job_id, None)
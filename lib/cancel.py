@@ -0,0 +1,101 @@
+"""
+Cooperative cancellation and pause for downloads
+
+A CancelToken is handed to everything that does work for a job: the
+extraction loop, yt-dlp (through its progress hook and match filter) and
+the ffmpeg transcode loop. Each of them calls token.check() often (yt-dlp
+does so on every block it reads), which
+    - raises DownloadCancelled once the token is cancelled
+    - blocks while the token is paused, until it is resumed or cancelled
+
+DownloadCancelled subclasses yt-dlp's own DownloadCancelled, so yt-dlp
+lets it propagate out of extract_info instead of treating it as a failed
+download.
+"""
+
+import threading
+
+from yt_dlp.utils import DownloadCancelled as YtDlpDownloadCancelled
+
+
+class DownloadCancelled(YtDlpDownloadCancelled):
+    """Raised inside a download when its CancelToken has been cancelled"""
+
+    def __init__(self, msg='Download cancelled'):
+        super().__init__(msg)
+
+
+class CancelToken:
+    """Thread-safe cancel/pause flag shared by a job and all of its downloads"""
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+        self._pause_listeners = []
+
+    @property
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def is_paused(self):
+        return not self._running.is_set()
+
+    def cancel(self):
+        """Cancel everything using this token (also wakes up paused work)"""
+        self._cancelled.set()
+        self._running.set()
+
+    def pause(self):
+        """Make check() block until resume() or cancel()"""
+        if self.is_cancelled or self.is_paused:
+            return
+        self._running.clear()
+        for callback in list(self._pause_listeners):
+            try:
+                callback()
+            except Exception:
+                # Pausing must work even if a listener doesn't
+                pass
+
+    def on_pause(self, callback):
+        """
+        Call `callback()` (on the pausing thread) every time the token gets paused
+
+        Returns:
+            callable: Function that removes the listener when called
+        """
+        self._pause_listeners.append(callback)
+
+        def remove():
+            if callback in self._pause_listeners:
+                self._pause_listeners.remove(callback)
+        return remove
+
+    def resume(self):
+        """Let paused work continue"""
+        self._running.set()
+
+    def check(self):
+        """
+        Raise DownloadCancelled if cancelled, block while paused
+
+        Raises:
+            DownloadCancelled: When the token is (or gets) cancelled
+        """
+        if self.is_cancelled:
+            raise DownloadCancelled()
+        if not self._running.is_set():
+            self._running.wait()
+            if self.is_cancelled:
+                raise DownloadCancelled()
+
+    def wait(self, timeout):
+        """
+        Sleep for up to `timeout` seconds, returning early when cancelled
+
+        Returns:
+            bool: True if the token was cancelled
+        """
+        return self._cancelled.wait(timeout)
@@ -0,0 +1,211 @@
+"""
+Disk space admission control
+
+A FLAC or WAV playlist can fill a disk halfway through, and a track that
+runs out of space dies in the middle of its download or encode. Before a
+track is searched, the downloader reserves the space it is going to need
+(estimated from its duration, format and bitrate) on every filesystem it
+writes to. A track is only let through if the free space minus whatever
+other tracks in progress have reserved stays above `min_free`;
+otherwise it waits, which pauses the queue, until space is freed or
+reservations are released. If nothing frees up within `wait_timeout`
+the track fails with a disk space error. With `min_free` 0 (the
+default) there's no admission control at all.
+
+With a scratch directory (e.g. a tmpfs), the raw download and the encode
+happen there and the finished file is moved to the library once.
+"""
+
+import errno
+import os
+import shutil
+import threading
+import time
+
+from .cancel import DownloadCancelled
+from .transcode import is_lossless
+
+
+DEFAULT_MIN_FREE = 0
+# How long a track waits for space before it fails
+DEFAULT_WAIT_TIMEOUT = 600
+
+# Used when Spotify didn't tell how long a track is
+DEFAULT_DURATION = 360
+# What YouTube's best audio streams come in at, roughly
+SOURCE_KBPS = 160
+# Roughly what lossless formats take for CD audio
+LOSSLESS_KBPS = {'flac': 1000, 'alac': 1000, 'wav': 1411}
+# Container, tags and cover art
+OVERHEAD_BYTES = 512 * 1024
+
+
+def estimate_size(duration, audio_format, bitrate=None):
+    """
+    Bytes an encoded track is expected to take, erring on the large side
+
+    Args:
+        duration (float): Length in seconds (None: DEFAULT_DURATION)
+        audio_format (str): Output format
+        bitrate (str): Target bitrate in kbps for lossy formats (default: 320)
+    """
+    duration = duration or DEFAULT_DURATION
+    if is_lossless(audio_format):
+        kbps = LOSSLESS_KBPS.get(audio_format, 1411)
+    else:
+        try:
+            kbps = float(bitrate)
+        except (TypeError, ValueError):
+            kbps = 320
+    return int(duration * kbps * 1000 / 8 * 1.1) + OVERHEAD_BYTES
+
+
+def _existing(path):
+    """`path` or its nearest ancestor that exists (disk_usage needs a real path)"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def move_file(source, dest):
+    """
+    Move a finished file into place
+
+    A rename when both are on the same filesystem; otherwise the file is
+    copied next to `dest` under a temporary name and renamed, so `dest`
+    never exists half written.
+    """
+    try:
+        os.replace(source, dest)
+        return dest
+    except OSError:
+        if not os.path.exists(source):
+            raise
+    temp = f"{dest}.part"
+    try:
+        shutil.copyfile(source, temp)
+        os.replace(temp, dest)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+    os.remove(source)
+    return dest
+
+
+class Reservation:
+    """Space held for one track, given back by release() (or leaving a with block)"""
+
+    def __init__(self, guard, amounts):
+        self.guard = guard
+        self.amounts = amounts
+
+    def release(self):
+        if self.amounts:
+            self.guard._release(self.amounts)
+            self.amounts = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class DiskSpaceGuard:
+    """Hands out space reservations, keeping `min_free` bytes free on every filesystem"""
+
+    def __init__(self, min_free=DEFAULT_MIN_FREE, poll_interval=10.0, wait_timeout=DEFAULT_WAIT_TIMEOUT):
+        """
+        Args:
+            min_free (int): Bytes that must stay free after every reservation, 0 to reserve nothing
+            poll_interval (float): Seconds between free space checks while waiting
+            wait_timeout (float): Seconds a reservation waits for space before giving up,
+                None to wait forever
+        """
+        self.min_free = min_free or 0
+        self.poll_interval = poll_interval
+        self.wait_timeout = wait_timeout
+        self.reserved = {}
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def _device(path):
+        return os.stat(_existing(path)).st_dev
+
+    def free(self, path):
+        """Free bytes on the filesystem of `path`, minus what is reserved there"""
+        usage = shutil.disk_usage(_existing(path))
+        with self._cond:
+            return usage.free - self.reserved.get(self._device(path), 0)
+
+    def reserve(self, needs, token=None, on_wait=None):
+        """
+        Reserve space, waiting for it if there isn't enough
+
+        Args:
+            needs (list): (path, bytes) pairs, e.g. the scratch and the library folder
+            token (CancelToken): Stops waiting when cancelled (default: None)
+            on_wait (callable): Called once with (path, free bytes, needed bytes) if this has to wait
+
+        Returns:
+            Reservation: To release once the files are written (or the track failed)
+
+        Raises:
+            DownloadCancelled: If the token was cancelled while waiting
+            OSError: ENOSPC, if there still wasn't enough space after wait_timeout
+        """
+        if not self.min_free:
+            return Reservation(self, {})
+
+        amounts, paths = {}, {}
+        for path, size in needs:
+            device = self._device(path)
+            amounts[device] = amounts.get(device, 0) + size
+            paths.setdefault(device, path)
+
+        waited = False
+        deadline = None if self.wait_timeout is None else time.monotonic() + self.wait_timeout
+        with self._cond:
+            while True:
+                short = None
+                for device, size in amounts.items():
+                    free = shutil.disk_usage(_existing(paths[device])).free - self.reserved.get(device, 0)
+                    if free - size < self.min_free:
+                        short = (paths[device], free, size)
+                        break
+                if short is None:
+                    for device, size in amounts.items():
+                        self.reserved[device] = self.reserved.get(device, 0) + size
+                    return Reservation(self, amounts)
+
+                if not waited and on_wait is not None:
+                    on_wait(*short)
+                waited = True
+                if token is not None and token.is_cancelled:
+                    raise DownloadCancelled()
+                if deadline is not None and time.monotonic() >= deadline:
+                    path, free, size = short
+                    raise OSError(errno.ENOSPC, f"Not enough disk space at {os.path.dirname(path)}: "
+                                                f"{free / 1024 ** 2:.0f} MiB free, {size / 1024 ** 2:.0f} MiB needed "
+                                                f"plus {self.min_free / 1024 ** 2:.0f} MiB to keep free, "
+                                                f"gave up after {self.wait_timeout:.0f}s")
+                # Woken up early when another track releases its space
+                interval = self.poll_interval if token is None else min(self.poll_interval, 1.0)
+                if deadline is not None:
+                    interval = max(0.0, min(interval, deadline - time.monotonic()))
+                self._cond.wait(interval)
+
+    def _release(self, amounts):
+        with self._cond:
+            for device, size in amounts.items():
+                left = self.reserved.get(device, 0) - size
+                if left > 0:
+                    self.reserved[device] = left
+                else:
+                    self.reserved.pop(device, None)
+            self._cond.notify_all()
@@ -0,0 +1,363 @@
+"""
+Distributed work queue for very large catalogs
+
+One coordinator expands playlists/albums into one work item per track and
+puts them on a shared queue. Any number of worker processes, on this
+machine or on others sharing the queue, claim items with a time-limited
+lease, download the track and report the result. A worker that dies stops
+renewing its lease, so the item becomes claimable again once the lease
+expires.
+
+WorkQueue is the backend interface. SQLiteWorkQueue is the bundled
+backend: a single SQLite file, fine for several local processes or a
+network share with working file locks. Other backends (Redis, Postgres...)
+only have to implement the same methods.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from .errors import UnavailableError, BlockedError
+from .progress import ProgressEvent
+
+
+class WorkQueue:
+    """Backend interface for the distributed work queue"""
+
+    def add_items(self, items):
+        """
+        Add work items
+
+        Args:
+            items (list): dicts with 'url', 'track', 'subfolder', 'format', 'quality' and
+                optionally 'meta' (track metadata for tagging)
+
+        Returns:
+            int: Number of items added
+        """
+        raise NotImplementedError
+
+    def claim(self, worker_id, lease_seconds):
+        """
+        Lease the next pending (or expired) item to a worker
+
+        Returns:
+            dict: The claimed item including its 'id', or None if nothing is available
+        """
+        raise NotImplementedError
+
+    def renew(self, item_id, worker_id, lease_seconds):
+        """
+        Extend a lease the worker still holds
+
+        Returns:
+            bool: False if the lease was lost (expired and claimed by someone else)
+        """
+        raise NotImplementedError
+
+    def complete(self, item_id, worker_id, path):
+        """Mark an item as downloaded to `path`"""
+        raise NotImplementedError
+
+    def fail(self, item_id, worker_id, error, permanent=False):
+        """
+        Report a failed attempt; the item is retried until it runs out of attempts
+
+        Args:
+            permanent (bool): The track can never succeed (removed, blocked), don't retry it
+        """
+        raise NotImplementedError
+
+    def counts(self):
+        """
+        Returns:
+            dict: Number of items per state ('pending', 'leased', 'done', 'failed')
+        """
+        raise NotImplementedError
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """WorkQueue stored in one SQLite file, safe to share between processes"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS items (
+            id           INTEGER PRIMARY KEY AUTOINCREMENT,
+            url          TEXT,
+            track        TEXT NOT NULL,
+            subfolder    TEXT,
+            format       TEXT NOT NULL DEFAULT 'mp3',
+            quality      TEXT NOT NULL DEFAULT 'auto',
+            state        TEXT NOT NULL DEFAULT 'pending',
+            worker       TEXT,
+            lease_until  REAL,
+            attempts     INTEGER NOT NULL DEFAULT 0,
+            result       TEXT,
+            error        TEXT,
+            updated      REAL,
+            meta         TEXT
+        );
+        CREATE INDEX IF NOT EXISTS items_state ON items (state, lease_until);
+    """
+
+    def __init__(self, path, max_attempts=3):
+        """
+        Args:
+            path (str): SQLite file shared by the coordinator and all workers
+            max_attempts (int): Claims per item before it is marked failed (default: 3)
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # isolation_level=None: we issue BEGIN IMMEDIATE ourselves when claiming
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self.SCHEMA)
+        # Queue files from before track metadata was carried along
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(items)")]
+        if 'meta' not in columns:
+            self._conn.execute("ALTER TABLE items ADD COLUMN meta TEXT")
+
+    def add_items(self, items):
+        now = time.time()
+        rows = [
+            (item.get('url'), item['track'], item.get('subfolder'),
+             item.get('format', 'mp3'), item.get('quality', 'auto'), now,
+             json.dumps(item['meta']) if item.get('meta') else None)
+            for item in items
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO items (url, track, subfolder, format, quality, updated, meta) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def claim(self, worker_id, lease_seconds):
+        now = time.time()
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so two workers can't grab the same row
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Expired leases that already used up their attempts are given up on
+                self._conn.execute(
+                    "UPDATE items SET state = 'failed', error = 'lease expired too many times', updated = ? "
+                    "WHERE state = 'leased' AND lease_until < ? AND attempts >= ?",
+                    (now, now, self.max_attempts)
+                )
+                row = self._conn.execute(
+                    "SELECT id, url, track, subfolder, format, quality, attempts, meta FROM items "
+                    "WHERE state = 'pending' OR (state = 'leased' AND lease_until < ?) "
+                    "ORDER BY id LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE items SET state = 'leased', worker = ?, lease_until = ?, "
+                    "attempts = attempts + 1, updated = ? WHERE id = ?",
+                    (worker_id, now + lease_seconds, now, row[0])
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        return {
+            'id': row[0], 'url': row[1], 'track': row[2], 'subfolder': row[3],
+            'format': row[4], 'quality': row[5], 'attempts': row[6] + 1,
+            'meta': json.loads(row[7]) if row[7] else None,
+        }
+
+    def renew(self, item_id, worker_id, lease_seconds):
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE items SET lease_until = ?, updated = ? "
+                "WHERE id = ? AND worker = ? AND state = 'leased'",
+                (now + lease_seconds, now, item_id, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, item_id, worker_id, path):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE items SET state = 'done', result = ?, lease_until = NULL, updated = ? "
+                "WHERE id = ? AND worker = ?",
+                (path, time.time(), item_id, worker_id)
+            )
+
+    def fail(self, item_id, worker_id, error, permanent=False):
+        max_attempts = 0 if permanent else self.max_attempts
+        with self._lock:
+            self._conn.execute(
+                "UPDATE items SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = ?, lease_until = NULL, updated = ? WHERE id = ? AND worker = ?",
+                (max_attempts, error, time.time(), item_id, worker_id)
+            )
+
+    def counts(self):
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        with self._lock:
+            for state, count in self._conn.execute("SELECT state, COUNT(*) FROM items GROUP BY state"):
+                counts[state] = count
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class Coordinator:
+    """Expands Spotify URLs into per-track work items on a WorkQueue"""
+
+    def __init__(self, downloader, work_queue):
+        """
+        Args:
+            downloader (SpotifyDownloader): Used to fetch playlist names and track lists
+            work_queue (WorkQueue): Queue the workers read from
+        """
+        self.downloader = downloader
+        self.queue = work_queue
+
+    def enqueue(self, urls, audio_format='mp3', quality='auto'):
+        """
+        Expand every URL and queue one item per track
+
+        Args:
+            urls (list): Spotify track, album or playlist URLs
+            audio_format (str): Output audio format (default: 'mp3')
+            quality (str): Audio quality in kbps or 'auto' (default: 'auto')
+
+        Returns:
+            int: Number of work items queued
+        """
+        total = 0
+        for url in urls:
+            if not self.downloader.validate_url(url):
+                continue
+            playlist_name = self.downloader.get_playlist_name(url)
+            tracks = self.downloader.get_tracks_from_url(url)
+            if not tracks:
+                self.downloader.print_error(f"No tracks found for {url}")
+                continue
+            # Metadata travels with the item, workers don't fetch the Spotify page again
+            total += self.queue.add_items([
+                {'url': url, 'track': track, 'subfolder': playlist_name,
+                 'format': audio_format, 'quality': quality,
+                 'meta': self.downloader.track_meta.get(track)}
+                for track in tracks
+            ])
+            self.downloader.print_success(f"Queued {len(tracks)} tracks from {playlist_name or url}")
+        return total
+
+
+class QueueWorker:
+    """Claims items from a WorkQueue and downloads them until told to stop"""
+
+    def __init__(self, downloader, work_queue, worker_id=None, lease_seconds=300, poll_interval=5.0):
+        """
+        Args:
+            downloader (SpotifyDownloader): Downloader that does the actual work
+            work_queue (WorkQueue): Shared queue
+            worker_id (str): Unique worker name (default: hostname-pid)
+            lease_seconds (float): How long a claim lasts without renewal (default: 300)
+            poll_interval (float): Seconds to wait when the queue is empty (default: 5)
+        """
+        self.downloader = downloader
+        self.queue = work_queue
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.stats = {'total': 0, 'successful': 0, 'failed': 0}
+        self._stop = threading.Event()
+        downloader.metrics.queue_depth.set_function(lambda: self.queue.counts()['pending'], queue='shared')
+
+    def stop(self):
+        """Finish the current item and exit the run loop"""
+        self._stop.set()
+
+    def run(self, exit_when_empty=False):
+        """
+        Process items until stop() is called (or the queue is drained)
+
+        Args:
+            exit_when_empty (bool): Return once nothing is pending or leased (default: False)
+
+        Returns:
+            dict: Statistics for this worker {'total', 'successful', 'failed'}
+        """
+        while not self._stop.is_set():
+            item = self.queue.claim(self.worker_id, self.lease_seconds)
+            if item is None:
+                counts = self.queue.counts()
+                if exit_when_empty and not counts['pending'] and not counts['leased']:
+                    break
+                self._stop.wait(self.poll_interval)
+                continue
+            self.downloader.metrics.workers_active.inc(pool='queue')
+            try:
+                self._process(item)
+            finally:
+                self.downloader.metrics.workers_active.dec(pool='queue')
+        return self.stats
+
+    def _process(self, item):
+        # Keep the lease alive while yt-dlp and ffmpeg are busy
+        done = threading.Event()
+
+        def heartbeat():
+            while not done.wait(self.lease_seconds / 3):
+                if not self.queue.renew(item['id'], self.worker_id, self.lease_seconds):
+                    return
+
+        renewer = threading.Thread(target=heartbeat, daemon=True)
+        renewer.start()
+
+        # Find out why a track failed, so permanent failures aren't handed to other workers
+        failure = {}
+
+        def on_event(event):
+            if event.kind == ProgressEvent.TRACK_FAILED and event.track == item['track']:
+                failure['kind'] = (event.data or {}).get('error')
+
+        unsubscribe = self.downloader.events.subscribe(on_event)
+
+        if item.get('meta'):
+            self.downloader.track_meta[item['track']] = item['meta']
+            if item['meta'].get('spotify_id'):
+                self.downloader.track_ids[item['track']] = item['meta']['spotify_id']
+
+        self.stats['total'] += 1
+        try:
+            path = self.downloader.download_track_file(
+                item['track'], item['format'], item['quality'], subfolder=item['subfolder']
+            )
+        except Exception as e:
+            path = None
+            error = str(e)
+        else:
+            error = f"download failed ({failure.get('kind') or 'unknown'})"
+        finally:
+            unsubscribe()
+            done.set()
+            renewer.join()
+
+        if path:
+            self.stats['successful'] += 1
+            self.queue.complete(item['id'], self.worker_id, path)
+        else:
+            self.stats['failed'] += 1
+            permanent = failure.get('kind') in (UnavailableError.kind, BlockedError.kind)
+            self.queue.fail(item['id'], self.worker_id, error, permanent=permanent)
@@ -0,0 +1,420 @@
+"""
+Long-running download engine for Spotify Downloader
+
+The CLI, Gradio and PyQt front ends each build a SpotifyDownloader per job
+and throw it away afterwards. DownloadEngine instead keeps one warm
+downloader (HTTP session, library index, scan cache) alive and runs jobs
+from any number of clients on a shared pool of worker threads, pulling
+work from a FairScheduler.
+
+Every job is split into work items: one 'expand' item that fetches the
+track list, then one 'track' item per song. Items of a higher priority
+job always run first, jobs of equal priority share the workers by weight.
+
+Each job owns a CancelToken that is passed down into the download, so
+cancelling stops the track that is downloading or encoding right now, and
+pausing freezes it in place. Queued items of a paused job are parked on the
+job and handed back to the scheduler on resume.
+
+Finished jobs stay queryable for a while (the last `keep_finished`, for at
+most `finished_ttl` seconds), then they are dropped with their tracks and
+events so a long-running server doesn't grow without bound.
+"""
+
+import threading
+import time
+import uuid
+from collections import deque
+
+from .bandwidth import BandwidthManager
+from .cancel import CancelToken
+from .errors import RetryBudget
+from .progress import ProgressEvent
+from .scheduler import FairScheduler
+
+
+class Job:
+    """State of one submitted URL (track, album or playlist)"""
+
+    QUEUED = 'queued'
+    RESOLVING = 'resolving'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    FINAL_STATES = (DONE, FAILED, CANCELLED)
+
+    def __init__(self, url, audio_format='mp3', quality='auto', priority=0, weight=1.0, max_events=1000,
+                 retry_budget=None):
+        """
+        Args:
+            url (str): Spotify URL
+            audio_format (str): Output audio format
+            quality (str): Audio quality in kbps or 'auto'
+            priority (int): Higher runs first (default: 0)
+            weight (float): Worker share relative to jobs of the same priority (default: 1)
+            max_events (int): How many progress events to keep for streaming
+            retry_budget (int): Retries all tracks of the job may spend together (default: no limit)
+        """
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.audio_format = audio_format
+        self.quality = quality
+        self.priority = priority
+        self.weight = weight
+        self.metrics = None
+        self.state = self.QUEUED
+        self.playlist_name = None
+        self.tracks = []
+        self.pending = 0
+        self.stats = {'total': 0, 'successful': 0, 'failed': 0}
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.cancelled = False
+        self.token = CancelToken()
+        self.budget = RetryBudget(retry_budget)
+        self.parked = []
+        self.events = deque(maxlen=max_events)
+        self.event_seq = 0
+
+    def to_dict(self, include_tracks=False):
+        """JSON friendly job status (metrics: queue wait vs. service time, see FairScheduler)"""
+        data = {
+            'id': self.id,
+            'url': self.url,
+            'format': self.audio_format,
+            'quality': self.quality,
+            'priority': self.priority,
+            'weight': self.weight,
+            'state': self.state,
+            'paused': self.token.is_paused,
+            'playlist': self.playlist_name,
+            'stats': dict(self.stats),
+            'error': self.error,
+            'created': self.created,
+            'finished': self.finished,
+            'metrics': self.metrics,
+            'retries': self.budget.used,
+        }
+        if include_tracks:
+            data['tracks'] = [dict(track) for track in self.tracks]
+        return data
+
+
+class DownloadEngine:
+    """One shared downloader, a fair work scheduler and a pool of worker threads"""
+
+    def __init__(self, downloader, workers=4, max_events=1000, small_jobs_first=False,
+                 keep_finished=100, finished_ttl=3600):
+        """
+        Args:
+            downloader (SpotifyDownloader): Warm downloader shared by every job
+            workers (int): Number of worker threads (concurrent downloads)
+            max_events (int): Progress events kept per job for streaming
+            small_jobs_first (bool): Serve jobs with the fewest remaining tracks first (default: False)
+            keep_finished (int): Finished jobs kept for status queries, older ones are dropped (default: 100)
+            finished_ttl (float): Seconds a finished job is kept at most (default: 1 hour)
+        """
+        self.downloader = downloader
+        self.workers = workers
+        self.max_events = max_events
+        self.keep_finished = keep_finished
+        self.finished_ttl = finished_ttl
+        self.jobs = {}
+        self.scheduler = FairScheduler(small_jobs_first=small_jobs_first)
+
+        # Always shape through a manager so limits can be changed while jobs run
+        if self.downloader.bandwidth is None:
+            self.downloader.bandwidth = BandwidthManager()
+        self.bandwidth = self.downloader.bandwidth
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._threads = []
+        self._running = False
+
+        self.downloader.events.subscribe(self._on_event)
+        self.downloader.metrics.queue_depth.set_function(self.scheduler.pending, queue='engine')
+
+    # ===== Lifecycle =====
+
+    def start(self):
+        """Start the worker threads"""
+        if self._running:
+            return
+        self._running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"download-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def shutdown(self, wait=True):
+        """Stop the worker threads once their current item is done"""
+        self._running = False
+        self.scheduler.close()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self._threads = []
+
+    # ===== Jobs =====
+
+    def submit(self, url, audio_format='mp3', quality='auto', priority=0, weight=1.0, rate_limit=None):
+        """
+        Queue a new job
+
+        Args:
+            url (str): Spotify track, album or playlist URL
+            audio_format (str): Output audio format (default: 'mp3')
+            quality (str): Audio quality in kbps or 'auto' (default: 'auto')
+            priority (int): Higher runs first (default: 0)
+            weight (float): Worker share relative to jobs of the same priority (default: 1)
+            rate_limit (int): Download cap for this job in bytes/s (default: None, only the global limit)
+
+        Returns:
+            Job: The queued job
+        """
+        job = Job(url, audio_format, quality, priority, weight, self.max_events,
+                  retry_budget=self.downloader.retry_budget)
+        with self._lock:
+            self._evict_finished()
+            self.jobs[job.id] = job
+        if rate_limit:
+            self.bandwidth.set_job_limit(job.id, rate_limit)
+        self._put(job, ('expand', job, None))
+        return job
+
+    def get(self, job_id):
+        """Return a job by id, or None (also once a finished job expired)"""
+        with self._lock:
+            self._evict_finished()
+            return self.jobs.get(job_id)
+
+    def list_jobs(self):
+        """Return all jobs, newest first"""
+        with self._lock:
+            self._evict_finished()
+            return sorted(self.jobs.values(), key=lambda job: job.created, reverse=True)
+
+    def cancel(self, job_id):
+        """
+        Cancel a job: the running downloads stop right away, queued tracks are skipped
+
+        Returns:
+            bool: False if the job doesn't exist or has already finished
+        """
+        with self._changed:
+            job = self.jobs.get(job_id)
+            if not job or job.state in Job.FINAL_STATES:
+                return False
+            job.cancelled = True
+            job.token.cancel()
+            dropped = self.scheduler.drop(job.id) + job.parked
+            job.parked = []
+            self._changed.notify_all()
+
+        for kind, _, index in dropped:
+            if kind == 'expand':
+                self._finish(job, Job.CANCELLED)
+            else:
+                job.tracks[index]['status'] = 'skipped'
+                self._track_finished(job, index, None, counted=False)
+        return True
+
+    def pause(self, job_id):
+        """
+        Pause a job: running downloads (and ffmpeg) freeze, queued tracks wait
+
+        A frozen download keeps its worker thread busy, queued tracks don't.
+
+        Returns:
+            bool: False if the job doesn't exist or has already finished
+        """
+        with self._changed:
+            job = self.jobs.get(job_id)
+            if not job or job.state in Job.FINAL_STATES:
+                return False
+            job.token.pause()
+            job.parked.extend(self.scheduler.drop(job.id))
+            self._changed.notify_all()
+        return True
+
+    def resume(self, job_id):
+        """
+        Resume a paused job
+
+        Returns:
+            bool: False if the job doesn't exist or has already finished
+        """
+        with self._changed:
+            job = self.jobs.get(job_id)
+            if not job or job.state in Job.FINAL_STATES:
+                return False
+            job.token.resume()
+            parked, job.parked = job.parked, []
+            self._changed.notify_all()
+
+        for item in parked:
+            self._put(job, item)
+        return True
+
+    def wait_events(self, job_id, since=0, timeout=15.0):
+        """
+        Block until the job has events newer than `since` (or it finished, or timeout)
+
+        Args:
+            job_id (str): Job id
+            since (int): Sequence number of the last event the caller has seen
+            timeout (float): Maximum seconds to wait
+
+        Returns:
+            list: (seq, event dict) tuples newer than `since`, oldest first
+        """
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            job = self.jobs.get(job_id)
+            if not job:
+                return []
+            while job.event_seq <= since and job.state not in Job.FINAL_STATES:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+            return [(seq, event) for seq, event in job.events if seq > since]
+
+    # ===== Internals =====
+
+    def _put(self, job, item):
+        self.scheduler.put(job.id, item, priority=job.priority, weight=job.weight)
+
+    def _on_event(self, event):
+        with self._changed:
+            job = self.jobs.get(event.job_id)
+            if not job:
+                return
+            job.event_seq += 1
+            job.events.append((job.event_seq, event.to_dict()))
+            self._changed.notify_all()
+
+    def _worker(self):
+        while True:
+            work = self.scheduler.get()
+            if work is None:
+                return
+            _, item, ticket = work
+            kind, job, index = item
+            self.downloader.metrics.workers_active.inc(pool='engine')
+            try:
+                if self._park(job, item):
+                    continue
+                if kind == 'expand':
+                    self._expand(job)
+                else:
+                    self._run_track(job, index)
+            except Exception as e:
+                self.downloader.print_error(f"Job {job.id[:8]} error: {e}")
+                if kind == 'expand':
+                    self._finish(job, Job.FAILED, str(e))
+                else:
+                    self._track_finished(job, index, None)
+            finally:
+                self.downloader.metrics.workers_active.dec(pool='engine')
+                metrics = self.scheduler.done(ticket)
+                if metrics is not None:
+                    job.metrics = metrics
+
+    def _park(self, job, item):
+        """Hold back an item dequeued just as its job got paused"""
+        with self._changed:
+            if job.token.is_paused:
+                job.parked.append(item)
+                return True
+        return False
+
+    def _expand(self, job):
+        """Fetch the track list of a job and queue one work item per track"""
+        if job.cancelled:
+            self._finish(job, Job.CANCELLED)
+            return
+
+        job.state = Job.RESOLVING
+        downloader = self.downloader
+        if not downloader.validate_url(job.url):
+            self._finish(job, Job.FAILED, 'Invalid Spotify URL')
+            return
+
+        job.playlist_name = downloader.get_playlist_name(job.url)
+        tracks = downloader.get_tracks_from_url(job.url)
+        if not tracks:
+            self._finish(job, Job.FAILED, 'No tracks found')
+            return
+
+        with self._changed:
+            job.tracks = [{'track': track, 'status': 'queued', 'path': None} for track in tracks]
+            job.pending = len(tracks)
+            job.stats['total'] = len(tracks)
+            job.state = Job.RUNNING
+            self._changed.notify_all()
+
+        downloader.emit(ProgressEvent.JOB_STARTED, job_id=job.id, total=len(tracks),
+                        message=job.playlist_name, data={'url': job.url, 'tracks': list(tracks)})
+
+        for index in range(len(tracks)):
+            self._put(job, ('track', job, index))
+
+    def _run_track(self, job, index):
+        """Download one track of a job"""
+        entry = job.tracks[index]
+        if job.cancelled:
+            entry['status'] = 'skipped'
+            self._track_finished(job, index, None, counted=False)
+            return
+
+        entry['status'] = 'downloading'
+        path = self.downloader.download_track_file(
+            entry['track'], job.audio_format, job.quality, subfolder=job.playlist_name,
+            job_id=job.id, index=index + 1, total=len(job.tracks), token=job.token, budget=job.budget
+        )
+        if path is None and job.cancelled:
+            entry['status'] = 'cancelled'
+            self._track_finished(job, index, None, counted=False)
+            return
+        self._track_finished(job, index, path)
+
+    def _track_finished(self, job, index, path, counted=True):
+        with self._changed:
+            entry = job.tracks[index]
+            if counted:
+                entry['status'] = 'done' if path else 'failed'
+                entry['path'] = path
+                job.stats['successful' if path else 'failed'] += 1
+            job.pending -= 1
+            last = job.pending == 0
+
+        if last:
+            state = Job.CANCELLED if job.cancelled else Job.DONE
+            self.downloader.emit(ProgressEvent.JOB_FINISHED, job_id=job.id, total=len(job.tracks),
+                                 data=dict(job.stats))
+            self._finish(job, state)
+
+    def _finish(self, job, state, error=None):
+        self.bandwidth.forget_job(job.id)
+        # Otherwise every dispatch keeps scanning the queues of all jobs ever submitted
+        job.metrics = self.scheduler.metrics(job.id) or job.metrics
+        self.scheduler.forget(job.id)
+        with self._changed:
+            job.state = state
+            job.error = error
+            job.finished = time.time()
+            self._evict_finished()
+            self._changed.notify_all()
+
+    def _evict_finished(self):
+        """Drop finished jobs past keep_finished or finished_ttl (call with the lock held)"""
+        finished = sorted((job for job in self.jobs.values() if job.state in Job.FINAL_STATES),
+                          key=lambda job: job.finished or 0, reverse=True)
+        cutoff = time.time() - self.finished_ttl
+        for count, job in enumerate(finished):
+            if count >= self.keep_finished or (job.finished or 0) < cutoff:
+                del self.jobs[job.id]
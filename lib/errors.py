@@ -0,0 +1,304 @@
+"""
+Failure classification, retry policies and the negative cache
+
+yt-dlp reports almost everything as a DownloadError with a message, so a
+track that is gone for good looked the same as a dropped connection.
+classify() turns any exception into one of a few TrackError classes, and
+each class has its own RetryPolicy:
+
+    network      transient connection trouble   retried with backoff
+    throttled    HTTP 429 / rate limited         retried with a long backoff
+    unavailable  removed, private, no results    never retried, cached
+    blocked      geo blocked or age restricted   never retried, cached
+    encoder      ffmpeg failed                   retried at a lower bitrate
+    local        disk full, permission denied    never retried, not cached
+    unknown      anything else (a bug, usually)  never retried, not cached
+
+Retries of one job also draw from a shared RetryBudget, so a playlist
+where everything fails gives up instead of backing off for hours.
+Permanent failures go into a NegativeCache on disk, so the next run skips
+them without searching again.
+"""
+
+import errno
+import http.client
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from yt_dlp.utils import GeoRestrictedError, YoutubeDLError
+from yt_dlp.networking.exceptions import HTTPError
+
+from .segmented import SegmentedDownloadError
+from .transcode import TranscodeError
+
+
+class TrackError(Exception):
+    """A classified download failure"""
+
+    kind = 'unknown'
+    permanent = False
+
+    def __init__(self, message, cause=None):
+        super().__init__(message)
+        self.cause = cause
+
+
+class NetworkError(TrackError):
+    """Connection reset, timeout, DNS... worth trying again shortly"""
+    kind = 'network'
+
+
+class ThrottledError(TrackError):
+    """The site is rate limiting us, back off for a while"""
+    kind = 'throttled'
+
+
+class UnavailableError(TrackError):
+    """Removed, private or simply not found; retrying won't help"""
+    kind = 'unavailable'
+    permanent = True
+
+
+class BlockedError(TrackError):
+    """Geo blocked or age restricted; retrying won't help"""
+    kind = 'blocked'
+    permanent = True
+
+
+class EncoderError(TrackError):
+    """ffmpeg could not convert the download"""
+    kind = 'encoder'
+
+
+class LocalError(TrackError):
+    """Disk full, no permission, bad path... a problem on this machine, not the site's"""
+    kind = 'local'
+    permanent = True
+
+
+class UnknownError(TrackError):
+    """Nothing we recognise, most likely a bug; retrying would only repeat it"""
+    kind = 'unknown'
+
+
+# OSError numbers that point at the local disk or file system rather than the network
+_LOCAL_ERRNOS = {
+    errno.ENOSPC, errno.EDQUOT, errno.EACCES, errno.EPERM, errno.EROFS, errno.ENAMETOOLONG,
+    errno.EISDIR, errno.ENOTDIR, errno.EEXIST, errno.EMFILE, errno.ENFILE, errno.EFBIG, errno.EXDEV,
+}
+
+# What the download stack raises for connection trouble; the requests and socket
+# exceptions are all OSErrors. yt-dlp wraps its network errors in a DownloadError.
+_NETWORK_ERRORS = (OSError, YoutubeDLError, http.client.HTTPException, SegmentedDownloadError)
+
+# Message patterns, checked in order. Anything unmatched is a network error if it
+# came from the download stack, or an unknown one otherwise.
+_PATTERNS = [
+    (BlockedError, re.compile(r"confirm your age|age[- ]restricted|inappropriate for some users|"
+                              r"not available in your country|geo[- ]?restrict|blocked it in your country",
+                              re.IGNORECASE)),
+    (ThrottledError, re.compile(r"\b429\b|too many requests|rate[- ]limit", re.IGNORECASE)),
+    (UnavailableError, re.compile(r"video unavailable|private video|has been removed|no longer available|"
+                                  r"account .* terminated|copyright|does not exist|no results|"
+                                  r"unsupported url|requested format is not available",
+                                  re.IGNORECASE)),
+]
+
+
+def _causes(exc):
+    """The exception plus everything it wraps (yt-dlp keeps the original in exc_info)"""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        exc_info = getattr(exc, 'exc_info', None)
+        if isinstance(exc_info, tuple) and len(exc_info) > 1 and exc_info[1] is not exc:
+            exc = exc_info[1]
+        else:
+            exc = exc.__cause__ or exc.__context__
+
+
+def classify(exc):
+    """
+    Turn any exception raised while downloading a track into a TrackError
+
+    Args:
+        exc (Exception): What yt-dlp, ffmpeg or the network raised
+
+    Returns:
+        TrackError: Instance of the matching class, with `cause` set to `exc`
+    """
+    if isinstance(exc, TrackError):
+        return exc
+    message = str(exc) or exc.__class__.__name__
+
+    for cause in _causes(exc):
+        if isinstance(cause, OSError) and cause.errno in _LOCAL_ERRNOS:
+            return LocalError(message, exc)
+        if isinstance(cause, TranscodeError):
+            return EncoderError(str(cause), exc)
+        if isinstance(cause, GeoRestrictedError):
+            return BlockedError(message, exc)
+        if isinstance(cause, HTTPError):
+            if cause.status == 429:
+                return ThrottledError(message, exc)
+            if cause.status in (404, 410):
+                return UnavailableError(message, exc)
+
+    for error_class, pattern in _PATTERNS:
+        if pattern.search(message):
+            return error_class(message, exc)
+
+    # Connection errors and timeouts; anything else isn't worth retrying
+    if any(isinstance(cause, _NETWORK_ERRORS) for cause in _causes(exc)):
+        return NetworkError(message, exc)
+    return UnknownError(message, exc)
+
+
+class RetryPolicy:
+    """How often and how patiently one class of failure is retried"""
+
+    def __init__(self, attempts, base_delay=0.0, max_delay=60.0, factor=2.0, jitter=0.25):
+        """
+        Args:
+            attempts (int): Total tries, including the first one
+            base_delay (float): Seconds to wait before the first retry
+            max_delay (float): Upper bound for the backoff
+            factor (float): Backoff multiplier per retry
+            jitter (float): Random +/- fraction added to each delay
+        """
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.jitter = jitter
+
+    def delay(self, attempt):
+        """Seconds to wait after failed try number `attempt` (1 based)"""
+        delay = min(self.max_delay, self.base_delay * self.factor ** (attempt - 1))
+        return max(0.0, delay * (1 + random.uniform(-self.jitter, self.jitter)))
+
+
+RETRY_POLICIES = {
+    NetworkError.kind: RetryPolicy(attempts=4, base_delay=2, max_delay=30),
+    ThrottledError.kind: RetryPolicy(attempts=3, base_delay=30, max_delay=300),
+    UnavailableError.kind: RetryPolicy(attempts=1),
+    BlockedError.kind: RetryPolicy(attempts=1),
+    # Encoder failures are retried at the next lower bitrate, see _convert_download
+    EncoderError.kind: RetryPolicy(attempts=1),
+    LocalError.kind: RetryPolicy(attempts=1),
+    UnknownError.kind: RetryPolicy(attempts=1),
+}
+
+
+class RetryBudget:
+    """Retries one job may spend in total, shared by all of its tracks"""
+
+    def __init__(self, limit):
+        """
+        Args:
+            limit (int): Number of retries allowed, None for no limit
+        """
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def take(self):
+        """
+        Spend one retry
+
+        Returns:
+            bool: False when the budget is used up
+        """
+        with self._lock:
+            if self.limit is not None and self.used >= self.limit:
+                return False
+            self.used += 1
+            return True
+
+    @property
+    def exhausted(self):
+        return self.limit is not None and self.used >= self.limit
+
+
+class NegativeCache:
+    """Tracks that failed permanently, remembered across runs for a while"""
+
+    # How long a failure is trusted, by kind (seconds)
+    TTL = {
+        UnavailableError.kind: 7 * 24 * 3600,
+        BlockedError.kind: 30 * 24 * 3600,
+    }
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): JSON file the failures are kept in
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def _key(query, spotify_id=None):
+        return f"spotify:{spotify_id}" if spotify_id else f"query:{' '.join(query.lower().split())}"
+
+    def get(self, query, spotify_id=None):
+        """
+        Look up a remembered failure
+
+        Returns:
+            dict: {'kind', 'message', 'failed_at', 'expires'} or None if unknown or expired
+        """
+        with self._lock:
+            entry = self._entries.get(self._key(query, spotify_id))
+        if entry and entry['expires'] > time.time():
+            return entry
+        return None
+
+    def add(self, query, spotify_id, error):
+        """Remember a permanent failure (other kinds are ignored)"""
+        ttl = self.TTL.get(error.kind)
+        if not ttl:
+            return
+        now = time.time()
+        with self._lock:
+            self._entries[self._key(query, spotify_id)] = {
+                'kind': error.kind,
+                'message': str(error)[:200],
+                'failed_at': now,
+                'expires': now + ttl,
+            }
+            self._save()
+
+    def remove(self, query, spotify_id=None):
+        """Forget a failure, e.g. to force a retry"""
+        with self._lock:
+            if self._entries.pop(self._key(query, spotify_id), None) is not None:
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._save()
+
+    def _save(self):
+        # Drop expired entries while we're at it
+        now = time.time()
+        self._entries = {key: entry for key, entry in self._entries.items() if entry['expires'] > now}
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(self.path + '.tmp', self.path)
+        except OSError:
+            pass
@@ -0,0 +1,320 @@
+"""
+Persistent library index for Spotify Downloader
+
+Keeps a small SQLite database inside download_dir with one row per audio
+file we have downloaded, keyed by the normalized track query, the Spotify
+track id (when the extractor found one) and a content hash of the file.
+
+That lets the downloader answer "do we already have this song?" with one
+indexed lookup instead of walking the whole download folder, and put a
+hardlink into a new playlist folder instead of downloading the song again.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+
+
+# ioctl number for FICLONE on Linux (copy-on-write clone, e.g. btrfs/xfs)
+FICLONE = 0x40049409
+
+LINK_MODES = ('auto', 'hardlink', 'reflink', 'copy')
+
+
+def _reflink(source, dest):
+    """Copy-on-write clone of a file, raises OSError where unsupported"""
+    if not sys.platform.startswith('linux'):
+        raise OSError("reflinks are only supported on Linux")
+    import fcntl
+    with open(source, 'rb') as src, open(dest, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(dest)
+            raise
+
+
+def materialize(source, dest_dir, mode='auto', name=None):
+    """
+    Make an existing file show up in another folder without downloading it again
+
+    Args:
+        source (str): Existing file
+        dest_dir (str): Folder it should also appear in
+        mode (str): 'hardlink', 'reflink', 'copy' or 'auto' (hardlink, then reflink,
+            then copy, whichever the filesystem supports first)
+        name (str): File name in dest_dir (default: the source's name)
+
+    Returns:
+        str: Path of the new file (left untouched if it already exists)
+    """
+    if mode not in LINK_MODES:
+        raise ValueError(f"Unknown link mode '{mode}', expected one of {LINK_MODES}")
+
+    os.makedirs(dest_dir, exist_ok=True)
+    dest = os.path.join(dest_dir, name or os.path.basename(source))
+    if os.path.exists(dest):
+        return dest
+
+    if mode in ('auto', 'hardlink'):
+        try:
+            os.link(source, dest)
+            return dest
+        except OSError:
+            if mode == 'hardlink':
+                raise
+    if mode in ('auto', 'reflink'):
+        try:
+            _reflink(source, dest)
+            return dest
+        except OSError:
+            if mode == 'reflink':
+                raise
+    shutil.copy2(source, dest)
+    return dest
+
+
+class LibraryIndex:
+    """SQLite index of every downloaded file, shared by all downloads of a library"""
+
+    DB_NAME = '.library.db'
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS files (
+            path         TEXT PRIMARY KEY,
+            track_key    TEXT NOT NULL,
+            spotify_id   TEXT,
+            content_hash TEXT,
+            size         INTEGER,
+            mtime        REAL,
+            format       TEXT,
+            added        REAL,
+            source       TEXT
+        );
+        CREATE INDEX IF NOT EXISTS files_track_key ON files (track_key);
+        CREATE INDEX IF NOT EXISTS files_spotify_id ON files (spotify_id);
+        CREATE INDEX IF NOT EXISTS files_content_hash ON files (content_hash);
+    """
+
+    def __init__(self, library_dir, db_path=None):
+        """
+        Args:
+            library_dir (str): Root folder the indexed paths are relative to (download_dir)
+            db_path (str): Location of the database (default: <library_dir>/.library.db)
+        """
+        self.library_dir = library_dir
+        self.db_path = db_path or os.path.join(library_dir, self.DB_NAME)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.executescript(self.SCHEMA)
+        # Databases from before the source column was added
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(files)")]
+        if 'source' not in columns:
+            self._conn.execute("ALTER TABLE files ADD COLUMN source TEXT")
+        self._conn.commit()
+
+    @staticmethod
+    def track_key(query):
+        """
+        Normalize a track query so trivial differences don't count as a new song
+
+        Args:
+            query (str): Track string in "Artist - Title" format
+
+        Returns:
+            str: Lowercased key with collapsed whitespace
+        """
+        return re.sub(r'\s+', ' ', query).strip().lower()
+
+    @staticmethod
+    def hash_file(path, chunk_size=1024 * 1024):
+        """
+        Content hash of a file, read in chunks so memory use stays flat
+
+        Args:
+            path (str): File to hash
+
+        Returns:
+            str: Hex SHA-1 of the file contents
+        """
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _relative(self, path):
+        return os.path.relpath(os.path.abspath(path), os.path.abspath(self.library_dir))
+
+    def _absolute(self, rel_path):
+        return os.path.join(self.library_dir, rel_path)
+
+    def add(self, path, query, spotify_id=None, content_hash=None, source=None):
+        """
+        Record a completed download
+
+        Args:
+            path (str): Path of the final audio file
+            query (str): Track query it was downloaded for
+            spotify_id (str): Spotify track id, if known
+            content_hash (str): Precomputed content hash (default: hash the file)
+            source (dict): Where it was downloaded from ({'url', 'resolver', ...}), if known
+
+        Returns:
+            str: Content hash of the file
+        """
+        stat = os.stat(path)
+        content_hash = content_hash or self.hash_file(path)
+        audio_format = os.path.splitext(path)[1].lstrip('.').lower()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files "
+                "(path, track_key, spotify_id, content_hash, size, mtime, format, added, source) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self._relative(path), self.track_key(query), spotify_id, content_hash,
+                 stat.st_size, stat.st_mtime, audio_format, time.time(),
+                 json.dumps(source) if source else None)
+            )
+            self._conn.commit()
+        return content_hash
+
+    def lookup(self, query=None, spotify_id=None, audio_format=None):
+        """
+        Find a file we already have for a track
+
+        Rows whose file has been deleted from disk are dropped on the way.
+
+        Args:
+            query (str): Track query ("Artist - Title")
+            spotify_id (str): Spotify track id (preferred over the query when given)
+            audio_format (str): Only accept files in this format (default: any)
+
+        Returns:
+            str: Absolute path of an existing file, or None
+        """
+        clauses, params = [], []
+        if spotify_id:
+            clauses.append("spotify_id = ?")
+            params.append(spotify_id)
+        if query:
+            clauses.append("track_key = ?")
+            params.append(self.track_key(query))
+        if not clauses:
+            return None
+
+        sql = f"SELECT path FROM files WHERE ({' OR '.join(clauses)})"
+        if audio_format:
+            sql += " AND format = ?"
+            params.append(audio_format.lower())
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        for (rel_path,) in rows:
+            path = self._absolute(rel_path)
+            if os.path.exists(path):
+                return path
+            self.remove(path)
+        return None
+
+    def find_by_hash(self, content_hash):
+        """
+        Args:
+            content_hash (str): Hash returned by hash_file()
+
+        Returns:
+            list: Absolute paths of indexed files with that content
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path FROM files WHERE content_hash = ?", (content_hash,)
+            ).fetchall()
+        return [self._absolute(rel_path) for (rel_path,) in rows]
+
+    def owner(self, path):
+        """
+        Args:
+            path (str): File inside the library
+
+        Returns:
+            str: track_key the file was downloaded for, or None if it isn't indexed
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT track_key FROM files WHERE path = ?", (self._relative(path),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def info(self, path):
+        """
+        Args:
+            path (str): File inside the library
+
+        Returns:
+            dict: 'track_key', 'spotify_id', 'content_hash' and 'source' of an indexed file,
+                  or None if it isn't indexed
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT track_key, spotify_id, content_hash, source FROM files WHERE path = ?",
+                (self._relative(path),)
+            ).fetchone()
+        if not row:
+            return None
+        return {'track_key': row[0], 'spotify_id': row[1], 'content_hash': row[2],
+                'source': json.loads(row[3]) if row[3] else None}
+
+    def remove(self, path):
+        """Forget a file (does not touch the file itself)"""
+        with self._lock:
+            self._conn.execute("DELETE FROM files WHERE path = ?", (self._relative(path),))
+            self._conn.commit()
+
+    def link_into(self, source, dest_dir, mode='auto', name=None):
+        """
+        Make an already downloaded file appear in another folder
+
+        Uses a hardlink so no extra disk space is used, and falls back to a
+        reflink or plain copy when the filesystem can't hardlink (FAT, other
+        drives). The new path is added to the index with the source's metadata.
+
+        Args:
+            source (str): Existing indexed file
+            dest_dir (str): Folder the file should also show up in
+            mode (str): See materialize() (default: 'auto')
+            name (str): File name in dest_dir (default: the source's name)
+
+        Returns:
+            str: Path of the linked (or copied) file
+        """
+        dest = materialize(source, dest_dir, mode, name)
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT track_key, spotify_id, content_hash, format, source FROM files WHERE path = ?",
+                (self._relative(source),)
+            ).fetchone()
+            if row:
+                stat = os.stat(dest)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO files "
+                    "(path, track_key, spotify_id, content_hash, size, mtime, format, added, source) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (self._relative(dest), row[0], row[1], row[2],
+                     stat.st_size, stat.st_mtime, row[3], time.time(), row[4])
+                )
+                self._conn.commit()
+        return dest
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,144 @@
+"""
+Playlist manifests
+
+Every download_playlist run writes two files next to the playlist:
+
+    downloaded/<playlist>.m3u8   plain playlist, paths relative to itself
+    downloaded/<playlist>.json   everything needed to redo the run
+
+The JSON manifest keeps the track order, the Spotify metadata, the source
+each track was downloaded from, and the file path and hash. That is enough to
+download the playlist again, or re-encode it into another format, without
+asking Spotify for the track list and without searching for any track
+(see SpotifyDownloader.download_from_manifest).
+"""
+
+import json
+import os
+import time
+
+from .naming import sanitize_name
+
+
+MANIFEST_VERSION = 1
+
+
+def manifest_paths(download_dir, name):
+    """
+    Where the manifests of a playlist go
+
+    Args:
+        download_dir (str): Library root
+        name (str): Playlist/album name
+
+    Returns:
+        tuple: (m3u8 path, json path)
+    """
+    base = os.path.join(download_dir, sanitize_name(name) or 'playlist')
+    return f"{base}.m3u8", f"{base}.json"
+
+
+def _write_atomic(path, text):
+    temp = f"{path}.tmp"
+    with open(temp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temp, path)
+
+
+def render_m3u8(manifest, base_dir):
+    """
+    Extended M3U playlist for a manifest
+
+    Tracks without a file (failed or not downloaded yet) are left out.
+
+    Args:
+        manifest (dict): Manifest as built by build_manifest()
+        base_dir (str): Folder the playlist file lives in, paths are written relative to it
+
+    Returns:
+        str: Playlist text
+    """
+    lines = ['#EXTM3U']
+    if manifest.get('name'):
+        lines.append(f"#PLAYLIST:{manifest['name']}")
+    for entry in manifest['tracks']:
+        if not entry.get('path'):
+            continue
+        path = os.path.join(manifest['root'], entry['path'])
+        duration = (entry.get('source') or {}).get('duration')
+        lines.append(f"#EXTINF:{int(duration) if duration else -1},{entry['query']}")
+        lines.append(os.path.relpath(path, base_dir).replace(os.sep, '/'))
+    return '\n'.join(lines) + '\n'
+
+
+def build_manifest(url, name, playlist, audio_format, quality, template, entries, root):
+    """
+    Args:
+        url (str): Spotify URL the tracks came from
+        name (str): Name the manifest files get
+        playlist (str): Playlist/album folder name, None for a single track
+        audio_format (str): Format the files were written in
+        quality (str): Requested quality
+        template (str): Output template the paths were built with
+        entries (list): One dict per track in playlist order with 'index', 'query',
+            'spotify_id', 'meta', 'source', 'path' (relative to root), 'hash' and 'status'
+        root (str): Folder the entry paths are relative to (download_dir)
+
+    Returns:
+        dict: The manifest
+    """
+    return {
+        'version': MANIFEST_VERSION,
+        'url': url,
+        'name': name,
+        'playlist': playlist,
+        'format': audio_format,
+        'quality': quality,
+        'template': template,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'root': root,
+        'tracks': entries,
+    }
+
+
+def write_manifest(manifest, download_dir):
+    """
+    Write the M3U8 and JSON files of a manifest
+
+    Returns:
+        tuple: (m3u8 path, json path)
+    """
+    m3u8_path, json_path = manifest_paths(download_dir, manifest.get('name') or 'playlist')
+    stored = dict(manifest)
+    # Paths are relative to the manifest's folder, so the library can be moved
+    stored['root'] = os.path.relpath(os.path.abspath(manifest['root']), os.path.abspath(download_dir))
+    _write_atomic(json_path, json.dumps(stored, indent=2, ensure_ascii=False))
+    _write_atomic(m3u8_path, render_m3u8(manifest, download_dir))
+    return m3u8_path, json_path
+
+
+def read_manifest(path):
+    """
+    Load a JSON manifest written by write_manifest()
+
+    Args:
+        path (str): Manifest file
+
+    Returns:
+        dict: The manifest, with 'root' made absolute again
+
+    Raises:
+        ValueError: If the file is not a manifest this version understands
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            manifest = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{path} is not a valid manifest: {e}")
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('tracks'), list):
+        raise ValueError(f"{path} is not a playlist manifest")
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported manifest version {manifest.get('version')} in {path}")
+    manifest['root'] = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(path)),
+                                                     manifest.get('root') or '.'))
+    return manifest
@@ -0,0 +1,381 @@
+"""
+Prometheus metrics
+
+Every SpotifyDownloader keeps a MetricsRegistry (downloader.metrics) with
+counters, gauges and histograms about what it does:
+
+    spotify_downloader_tracks_total{status}          tracks done/failed/cancelled/skipped
+    spotify_downloader_failures_total{kind}          failed tracks by error class
+    spotify_downloader_downloaded_bytes_total        bytes of media fetched
+    spotify_downloader_retries_total{kind}           retries by error class ('throttled' = 429s)
+    spotify_downloader_fallbacks_total{kind}         next source / lower bitrate tried
+    spotify_downloader_cache_hits_total{cache}       work skipped thanks to a cache
+    spotify_downloader_jobs_total{status}            playlist jobs finished/cancelled
+    spotify_downloader_phase_seconds{phase}          search/download/encode/track latency
+    spotify_downloader_active_tracks                 tracks in progress
+    spotify_downloader_queue_depth{queue}            work waiting in the engine or shared queue
+    spotify_downloader_workers_active{pool}          workers busy with a track
+
+Most of them are derived from progress events by a bus subscriber, the
+rest are counted where they happen. They are exposed in the Prometheus
+text format by render(), on a local /metrics endpoint (MetricsServer,
+also served by server mode) or in a file rewritten periodically for the
+node_exporter textfile collector (TextfileWriter).
+
+Only the standard library is used.
+"""
+
+import math
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .progress import ProgressEvent
+
+
+PREFIX = 'spotify_downloader_'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(labels):
+        return tuple(sorted(labels.items()))
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_label_text(labels)} {_number(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Value that only goes up"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text):
+        super().__init__(name, help_text)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            return [('', key, value) for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, or is read from a function at scrape time"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text):
+        super().__init__(name, help_text)
+        self._values = {}
+        self._functions = {}
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function, **labels):
+        """Read the value from `function()` whenever the metrics are rendered"""
+        with self._lock:
+            self._functions[self._key(labels)] = function
+
+    def value(self, **labels):
+        key = self._key(labels)
+        function = self._functions.get(key)
+        return function() if function else self._values.get(key, 0)
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, function in functions.items():
+            try:
+                values[key] = function()
+            except Exception:
+                values.pop(key, None)  # Whatever it reads is gone (closed queue...)
+        return [('', key, value) for key, value in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def count(self, **labels):
+        series = self._series.get(self._key(labels))
+        return series['count'] if series else 0
+
+    def _samples(self):
+        samples = []
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series['counts']):
+                    cumulative += count
+                    samples.append(('_bucket', key + (('le', _number(bound)),), cumulative))
+                samples.append(('_sum', key, series['sum']))
+                samples.append(('_count', key, series['count']))
+        return samples
+
+
+class MetricsRegistry:
+    """Named metrics, rendered together in the Prometheus text format"""
+
+    def __init__(self, prefix=PREFIX):
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help_text, **kwargs):
+        name = self.prefix + name
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already exists as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help_text):
+        return self._get(Counter, name, help_text)
+
+    def gauge(self, name, help_text):
+        return self._get(Gauge, name, help_text)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path):
+        """Atomically (re)write the metrics to `path` (node_exporter textfile collector)"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(temp, path)
+
+
+class DownloaderMetrics(MetricsRegistry):
+    """
+    The downloader's metrics, most of them fed by its progress events
+
+    Subscribed to the downloader's ProgressBus; the counters the events
+    can't tell (retries, fallbacks, cache hits) are incremented by the
+    downloader itself.
+    """
+
+    # Track phases timed from events: the phase ends at the event on the right
+    PHASE_ENDS = {
+        ProgressEvent.TRACK_RESOLVED: 'search',
+        ProgressEvent.TRANSCODE_STARTED: 'download',
+    }
+
+    def __init__(self, bus=None, prefix=PREFIX):
+        super().__init__(prefix)
+        self.tracks = self.counter('tracks_total', "Tracks finished, by status (done, failed, cancelled, skipped)")
+        self.failures = self.counter('failures_total', "Failed tracks by error class")
+        self.downloaded_bytes = self.counter('downloaded_bytes_total', "Bytes of media downloaded")
+        self.retries = self.counter('retries_total', "Retries by error class (throttled = HTTP 429)")
+        self.fallbacks = self.counter('fallbacks_total', "Next source or lower quality tried, by kind")
+        self.cache_hits = self.counter('cache_hits_total', "Searches and downloads skipped thanks to a cache")
+        self.jobs = self.counter('jobs_total', "Playlist/album jobs, by status (finished, cancelled)")
+        self.phase_seconds = self.histogram('phase_seconds', "Time per track spent in each phase")
+        self.active_tracks = self.gauge('active_tracks', "Tracks being searched, downloaded or encoded")
+        self.queue_depth = self.gauge('queue_depth', "Work items waiting to be picked up")
+        self.workers_active = self.gauge('workers_active', "Workers busy with a work item")
+
+        # (job, track) -> {'started', 'mark'} of tracks in progress
+        self._tracks = {}
+        self._tracks_lock = threading.Lock()
+        if bus is not None:
+            bus.subscribe(self.on_event)
+
+    def on_event(self, event):
+        key = (event.job_id, event.track)
+        if event.kind == ProgressEvent.TRACK_STARTED:
+            with self._tracks_lock:
+                if key not in self._tracks:
+                    self.active_tracks.inc()
+                self._tracks[key] = {'started': event.timestamp, 'mark': event.timestamp}
+        elif event.kind in self.PHASE_ENDS:
+            state = self._tracks.get(key)
+            if state is not None:
+                self.phase_seconds.observe(event.timestamp - state['mark'], phase=self.PHASE_ENDS[event.kind])
+                state['mark'] = event.timestamp
+        elif event.kind == ProgressEvent.DOWNLOAD_FINISHED:
+            if event.downloaded_bytes:
+                self.downloaded_bytes.inc(event.downloaded_bytes)
+        elif event.kind in ProgressEvent.TERMINAL_KINDS:
+            with self._tracks_lock:
+                state = self._tracks.pop(key, None)
+                if state is not None:
+                    self.active_tracks.dec()
+            data = event.data or {}
+            if event.kind == ProgressEvent.TRACK_DONE and data.get('resumed'):
+                # Already there from an earlier run
+                self.tracks.inc(status='skipped')
+            elif event.kind == ProgressEvent.TRACK_DONE:
+                if data.get('deduplicated'):
+                    self.cache_hits.inc(cache='run')
+                if state is not None:
+                    if state['mark'] != state['started']:
+                        self.phase_seconds.observe(event.timestamp - state['mark'], phase='encode')
+                    self.phase_seconds.observe(event.timestamp - state['started'], phase='track')
+                self.tracks.inc(status='done')
+            elif data.get('cancelled'):
+                self.tracks.inc(status='cancelled')
+            else:
+                self.tracks.inc(status='failed')
+                self.failures.inc(kind=data.get('error') or 'unknown')
+        elif event.kind == ProgressEvent.JOB_FINISHED:
+            self.jobs.inc(status='cancelled' if (event.data or {}).get('cancelled') else 'finished')
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    server_version = "SpotifyDownloader"
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer:
+    """Serves GET /metrics on a local port from a background thread"""
+
+    def __init__(self, registry, host='127.0.0.1', port=9464):
+        self.httpd = ThreadingHTTPServer((host, port), _MetricsHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.registry = registry
+        self._thread = None
+
+    @property
+    def address(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='metrics-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class TextfileWriter:
+    """Rewrites a metrics file every `interval` seconds, and once more on stop()"""
+
+    def __init__(self, registry, path, interval=15.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _write(self):
+        try:
+            self.registry.write_textfile(self.path)
+        except OSError:
+            pass  # Try again next time, the run must not fail over its metrics
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._write()
+
+    def start(self):
+        self._write()
+        self._thread = threading.Thread(target=self._run, name='metrics-textfile', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._write()
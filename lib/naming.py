@@ -0,0 +1,168 @@
+"""
+Deterministic output paths
+
+Files used to be named after the YouTube video title, so the same track
+could end up under a different name on every run, and finding out whether
+we already had a song meant scanning folders. An OutputTemplate builds the
+path from Spotify metadata instead, e.g.
+
+    {playlist}/{artist} - {title}.{ext}         (default)
+    {artist}/{album}/{nn} - {title}.{ext}
+
+so the final path of a track is known before anything is downloaded and
+"do we have it?" is a single stat.
+
+Fields:
+    {artist}   first artist            {artists}  all artists, comma separated
+    {title}    track title             {album}    album name (or 'Unknown Album')
+    {nn}       track number, 2 digits  {disc}     disc number
+    {index}    position in the playlist, 2 digits
+    {playlist} playlist/album folder name, empty for single tracks
+    {year}     release year            {ext}      file extension for the format
+    {id}       Spotify track id (or a hash of the query if unknown)
+"""
+
+import hashlib
+import re
+import string
+
+
+DEFAULT_TEMPLATE = '{playlist}/{artist} - {title}.{ext}'
+
+FIELDS = ('artist', 'artists', 'title', 'album', 'nn', 'disc', 'index', 'playlist', 'year', 'ext', 'id')
+
+# Files of downloads in progress, never library files: the raw stream ('x.source.webm'),
+# ffmpeg's encode ('x.part.mp3'), yt-dlp/segmented partials and atomic writes
+_TEMPORARY = re.compile(r'\.(source|part)\.[^.]+$|\.(part|segments|tmp|ytdl)$', re.IGNORECASE)
+
+# Names Windows refuses to create, whatever the extension
+_RESERVED = {'CON', 'PRN', 'AUX', 'NUL'} | {f"COM{i}" for i in range(1, 10)} | {f"LPT{i}" for i in range(1, 10)}
+
+
+def is_temporary_file(name):
+    """True for a file the downloader is still writing (see _TEMPORARY)"""
+    return _TEMPORARY.search(name) is not None
+
+
+def sanitize_name(name, max_length=100):
+    """
+    Make a string safe to use as one file or folder name on Windows/Mac/Linux
+
+    Args:
+        name (str): Original name
+        max_length (int): Maximum length in characters (default: 100)
+
+    Returns:
+        str: Sanitized name, '' if nothing usable is left
+    """
+    # Remove invalid characters (and control characters)
+    sanitized = re.sub(r'[<>:"/\\|?*\x00-\x1f]', '', str(name))
+    # Replace multiple spaces with single space
+    sanitized = re.sub(r'\s+', ' ', sanitized)
+    # Remove leading/trailing spaces and dots
+    sanitized = sanitized.strip('. ')
+    if len(sanitized) > max_length:
+        sanitized = sanitized[:max_length].strip('. ')
+    if sanitized.split('.')[0].upper() in _RESERVED:
+        sanitized = f"_{sanitized}"
+    return sanitized
+
+
+def split_query(query):
+    """Best effort (artist, title) from an 'Artist - Title' query"""
+    artist, sep, title = query.partition(' - ')
+    return (artist.strip(), title.strip()) if sep else ('', query.strip())
+
+
+class OutputTemplate:
+    """Turns track metadata into a relative output path"""
+
+    def __init__(self, template=DEFAULT_TEMPLATE):
+        """
+        Args:
+            template (str): Path template with '/' separated components, see the module docstring
+
+        Raises:
+            ValueError: For unknown fields or a malformed template
+        """
+        template = template.replace('\\', '/').strip('/')
+        try:
+            used = {field for _, field, _, _ in string.Formatter().parse(template) if field is not None}
+        except ValueError as e:
+            raise ValueError(f"Invalid output template '{template}': {e}")
+        unknown = used - set(FIELDS)
+        if unknown or '' in used:
+            raise ValueError(f"Unknown field(s) {', '.join(sorted(unknown)) or '{}'} in output template, "
+                             f"available: {', '.join(FIELDS)}")
+        if '{ext}' not in template.rsplit('/', 1)[-1]:
+            template += '.{ext}'
+        self.template = template
+
+    def fields(self, query, ext, meta=None, playlist=None, index=None):
+        """
+        Field values for one track
+
+        Args:
+            query (str): 'Artist - Title', used when metadata is missing
+            ext (str): File extension
+            meta (dict): Spotify metadata, see SpotifyDownloader.track_meta (default: None)
+            playlist (str): Playlist/album folder name (default: None)
+            index (int): Position in the playlist (default: None)
+
+        Returns:
+            dict: Raw (unsanitized) values
+        """
+        meta = meta or {}
+        query_artist, query_title = split_query(query)
+        artists = meta.get('artists') or ([query_artist] if query_artist else [])
+        number = meta.get('track_number') or index
+        return {
+            'artist': artists[0] if artists else 'Unknown Artist',
+            'artists': ', '.join(artists) or 'Unknown Artist',
+            'title': meta.get('title') or query_title,
+            'album': meta.get('album') or 'Unknown Album',
+            'nn': f"{int(number):02d}" if number else '00',
+            'disc': str(meta.get('disc_number') or 1),
+            'index': f"{int(index):02d}" if index else '00',
+            'playlist': playlist or '',
+            'year': (meta.get('release_date') or '')[:4],
+            'ext': ext,
+            'id': meta.get('spotify_id') or hashlib.sha1(query.encode('utf-8')).hexdigest()[:22],
+        }
+
+    def render(self, fields, suffix=''):
+        """
+        Build the relative path for a track
+
+        Every value is sanitized on its own, so a '/' in a title can never
+        create a folder. Components that end up empty (e.g. {playlist} for a
+        single track) are dropped.
+
+        Args:
+            fields (dict): Values from fields()
+            suffix (str): Text added before the extension, used to tell colliding tracks apart
+
+        Returns:
+            str: Relative path using '/' separators
+        """
+        safe = {key: sanitize_name(value) if key != 'ext' else value for key, value in fields.items()}
+        parts = []
+        components = self.template.split('/')
+        for position, component in enumerate(components):
+            last = position == len(components) - 1
+            if last and suffix:
+                component = component.replace('.{ext}', f"{suffix}.{{ext}}") if '.{ext}' in component \
+                    else component + suffix
+            name = component.format(**safe)
+            if last:
+                # Clean up what empty fields left behind, e.g. ' - Title.mp3'
+                base, dot, ext = name.rpartition('.')
+                base = re.sub(r'^[\s\-_.]+|[\s\-_]+$', '', base)
+                name = sanitize_name(f"{base}{dot}{ext}", max_length=180) if base else ''
+            else:
+                name = sanitize_name(name)
+            if name:
+                parts.append(name)
+        if not parts or not parts[-1].endswith(f".{fields['ext']}"):
+            parts.append(f"{sanitize_name(fields['id'])}.{fields['ext']}")
+        return '/'.join(parts)
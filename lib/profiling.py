@@ -0,0 +1,289 @@
+"""
+Per phase profiling
+
+When a run is slow, Profiler tells which part is to blame. A run is split
+into phases (Spotify requests, page parsing, searching, downloading,
+progress rendering, encoding, library bookkeeping) and for each phase it
+records:
+
+    - wall time, Python CPU time and CPU time of child processes (ffmpeg)
+    - a cProfile profile               -> <phase>.prof   (pstats, snakeviz, flameprof)
+    - sampled stacks of every thread   -> <phase>.folded (flamegraph.pl, speedscope)
+    - the peak of memory allocated while it ran, with the allocation sites
+      still alive at that point       -> memory.txt
+
+Times are exclusive: while a phase runs inside another one (a progress
+event during a download), it counts for the inner phase only.
+
+Phases are attached by instrument(), which replaces methods on the objects
+it is given. A downloader without a profiler is never instrumented, so
+profiling costs nothing when it's off.
+"""
+
+import cProfile
+import functools
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows, child CPU time is not available
+    resource = None
+
+
+SAMPLE_INTERVAL = 0.005
+MEMORY_TOP_LINES = 15
+SNAPSHOT_MIN_GROWTH = 64 * 1024
+
+
+def _children_cpu():
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _format_size(size):
+    for unit in ('B', 'KiB', 'MiB'):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+class _Phase:
+    """Totals of one phase"""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.child_cpu = 0.0
+        self.peak = 0
+        self.peak_sites = []
+        self.samples = {}
+
+
+class _Frame:
+    """One active call of a phase on one thread"""
+
+    __slots__ = ('phase', 'profile', 'resumed', 'cpu_resumed', 'child_resumed', 'base', 'peak')
+
+    def __init__(self, phase, profile, base):
+        self.phase = phase
+        self.profile = profile
+        self.base = base
+        self.peak = 0
+
+
+class Profiler:
+    """Collects per phase CPU, stack and memory profiles of a run"""
+
+    def __init__(self, run_dir, sample_interval=SAMPLE_INTERVAL):
+        """
+        Args:
+            run_dir (str): Folder the reports are written to (created on write())
+            sample_interval (float): Seconds between two stack samples (default: 5 ms)
+        """
+        self.run_dir = run_dir
+        self.sample_interval = sample_interval
+        self.phases = {}
+        self._profiles = {}
+        self._stacks = {}
+        self._active = set()
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._stop = threading.Event()
+
+        self._snapshot_filters = [tracemalloc.Filter(False, tracemalloc.__file__),
+                                  tracemalloc.Filter(False, __file__)]
+        self._owns_tracing = not tracemalloc.is_tracing()
+        if self._owns_tracing:
+            tracemalloc.start()
+        self._sampler = threading.Thread(target=self._sample, name='profile-sampler', daemon=True)
+        self._sampler.start()
+
+    # ===== Instrumentation =====
+
+    def instrument(self, obj, phases):
+        """
+        Run methods of `obj` inside phases
+
+        Args:
+            obj: Object whose methods are replaced (on the instance only)
+            phases (dict): Phase name -> list of method names
+        """
+        for phase, names in phases.items():
+            for name in names:
+                method = getattr(obj, name, None)
+                if callable(method):
+                    setattr(obj, name, self.wrap(phase, method))
+
+    def wrap(self, phase, func):
+        """`func` running inside `phase`"""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if self._stop.is_set():
+                return func(*args, **kwargs)
+            self.enter(phase)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.exit()
+        return wrapper
+
+    def _phase(self, name):
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases.setdefault(name, _Phase(name))
+        return phase
+
+    def _profile(self, name):
+        key = (threading.get_ident(), name)
+        profile = self._profiles.get(key)
+        if profile is None:
+            with self._lock:
+                profile = self._profiles.setdefault(key, cProfile.Profile())
+        return profile
+
+    def _pause(self, frame):
+        frame.phase.wall += time.perf_counter() - frame.resumed
+        frame.phase.cpu += time.thread_time() - frame.cpu_resumed
+        frame.phase.child_cpu += _children_cpu() - frame.child_resumed
+        if frame.profile is not None:
+            frame.profile.disable()
+
+    def _resume(self, frame):
+        frame.resumed = time.perf_counter()
+        frame.cpu_resumed = time.thread_time()
+        frame.child_resumed = _children_cpu()
+        if frame.profile is not None:
+            try:
+                frame.profile.enable()
+            except ValueError:
+                # Python 3.12+ allows one active profiler per process, the samples still cover this
+                frame.profile = None
+
+    def _memory_boundary(self):
+        """Hand the peak since the last boundary to every phase running right now"""
+        current, peak = tracemalloc.get_traced_memory()
+        for frame in self._active:
+            frame.peak = max(frame.peak, peak - frame.base)
+        tracemalloc.reset_peak()
+        return current
+
+    def enter(self, name):
+        """Start a phase on this thread (pausing the one it runs inside)"""
+        stack = self._stacks.setdefault(threading.get_ident(), [])
+        if stack:
+            self._pause(stack[-1])
+        phase = self._phase(name)
+        phase.calls += 1
+        profile = self._profile(name)
+        with self._lock:
+            frame = _Frame(phase, profile, self._memory_boundary())
+            self._active.add(frame)
+        stack.append(frame)
+        self._resume(frame)
+
+    def exit(self):
+        """End the innermost phase of this thread"""
+        stack = self._stacks[threading.get_ident()]
+        frame = stack.pop()
+        self._pause(frame)
+        with self._lock:
+            self._memory_boundary()
+            self._active.discard(frame)
+        phase = frame.phase
+        if frame.peak > phase.peak:
+            # Keep what was allocated at the phase's biggest moment (not for every small
+            # step up, snapshots are slow)
+            if frame.peak > max(phase.peak * 1.25, SNAPSHOT_MIN_GROWTH):
+                snapshot = tracemalloc.take_snapshot().filter_traces(self._snapshot_filters)
+                phase.peak_sites = snapshot.statistics('lineno')[:MEMORY_TOP_LINES]
+            phase.peak = frame.peak
+        if stack:
+            self._resume(stack[-1])
+
+    # ===== Stack sampling =====
+
+    def _sample(self):
+        while not self._stop.wait(self.sample_interval):
+            frames = sys._current_frames()
+            for thread_id, stack in list(self._stacks.items()):
+                try:
+                    phase = stack[-1].phase
+                    frame = frames[thread_id]
+                except (IndexError, KeyError):
+                    continue  # Not in a phase (or gone) right now
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                folded = ';'.join(reversed(names))
+                phase.samples[folded] = phase.samples.get(folded, 0) + 1
+
+    # ===== Reports =====
+
+    def write(self):
+        """
+        Stop profiling and write the reports
+
+        Returns:
+            str: The run directory
+        """
+        self._stop.set()
+        self._sampler.join()
+        os.makedirs(self.run_dir, exist_ok=True)
+        elapsed = time.perf_counter() - self._started
+
+        summary = [f"Run time: {elapsed:.2f}s",
+                   f"{'phase':<10} {'calls':>7} {'wall':>9} {'cpu':>9} {'child cpu':>10} {'peak mem':>11}"]
+        phases = sorted(self.phases.values(), key=lambda phase: -phase.wall)
+        for phase in phases:
+            summary.append(f"{phase.name:<10} {phase.calls:>7} {phase.wall:>8.2f}s {phase.cpu:>8.2f}s "
+                           f"{phase.child_cpu:>9.2f}s {_format_size(phase.peak):>11}")
+
+        memory = []
+        for phase in phases:
+            profiles = [profile for (_, name), profile in self._profiles.items() if name == phase.name]
+            stats = None
+            for profile in profiles:
+                try:
+                    stats = pstats.Stats(profile) if stats is None else stats.add(profile)
+                except TypeError:
+                    continue  # Never got to run
+            if stats is not None:
+                stats.dump_stats(os.path.join(self.run_dir, f"{phase.name}.prof"))
+                text = io.StringIO()
+                stats.stream = text
+                stats.sort_stats('cumulative').print_stats(15)
+                summary += ['', f"===== {phase.name} =====", text.getvalue().strip()]
+
+            with open(os.path.join(self.run_dir, f"{phase.name}.folded"), 'w', encoding='utf-8') as f:
+                for folded, count in sorted(phase.samples.items()):
+                    f.write(f"{folded} {count}\n")
+
+            memory += [f"===== {phase.name}: peak {_format_size(phase.peak)} =====",
+                       *[str(stat) for stat in phase.peak_sites], '']
+
+        with open(os.path.join(self.run_dir, 'summary.txt'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(summary) + '\n')
+        with open(os.path.join(self.run_dir, 'memory.txt'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(memory) + '\n')
+        if self._owns_tracing:
+            tracemalloc.stop()
+        return self.run_dir
+
+    def summary(self):
+        """One line per phase: name, calls, wall and CPU time, peak memory"""
+        return [f"{phase.name}: {phase.calls} calls, {phase.wall:.2f}s wall, {phase.cpu:.2f}s cpu, "
+                f"{phase.child_cpu:.2f}s child cpu, peak {_format_size(phase.peak)}"
+                for phase in sorted(self.phases.values(), key=lambda phase: -phase.wall)]
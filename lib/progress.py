@@ -0,0 +1,418 @@
+"""
+Progress events for Spotify Downloader
+
+The downloader never writes progress to sys.stdout directly. Instead it
+publishes ProgressEvent objects on a ProgressBus and every front end
+(CLI, Gradio, PyQt) subscribes a callback and renders them its own way.
+
+Byte progress events can fire hundreds of times a second, so the bus
+throttles them per track and only hands the newest one to subscribers.
+"""
+
+import sys
+import threading
+import time
+from colorama import Fore, Style
+
+
+class ProgressEvent:
+    """A single thing that happened during a download job"""
+
+    # Event kinds
+    JOB_STARTED = 'job_started'
+    TRACK_STARTED = 'track_started'
+    TRACK_RESOLVED = 'track_resolved'
+    DOWNLOAD_PROGRESS = 'download_progress'
+    DOWNLOAD_FINISHED = 'download_finished'
+    TRANSCODE_STARTED = 'transcode_started'
+    TRACK_DONE = 'track_done'
+    TRACK_FAILED = 'track_failed'
+    JOB_FINISHED = 'job_finished'
+    LOG = 'log'
+
+    # Events after which nothing else is published for that track
+    TERMINAL_KINDS = (TRACK_DONE, TRACK_FAILED)
+
+    __slots__ = (
+        'kind', 'job_id', 'track', 'index', 'total', 'downloaded_bytes',
+        'total_bytes', 'speed', 'eta', 'message', 'level', 'data', 'timestamp'
+    )
+
+    def __init__(self, kind, job_id=None, track=None, index=None, total=None,
+                 downloaded_bytes=None, total_bytes=None, speed=None, eta=None,
+                 message=None, level='info', data=None):
+        """
+        Args:
+            kind (str): One of the event kind constants above
+            job_id (str): Job the event belongs to (one playlist/album/track request)
+            track (str): Track query ("Artist - Title") the event is about
+            index (int): 1-based position of the track in the job
+            total (int): Number of tracks in the job
+            downloaded_bytes (int): Bytes fetched so far (DOWNLOAD_PROGRESS)
+            total_bytes (int): Expected size in bytes, if known
+            speed (float): Download speed in bytes per second, if known
+            eta (int): Estimated seconds remaining, if known
+            message (str): Human readable text (LOG, TRACK_RESOLVED, TRACK_FAILED...)
+            level (str): 'info', 'success', 'warning' or 'error' for LOG events
+            data (dict): Any extra payload (stats, filenames...)
+        """
+        self.kind = kind
+        self.job_id = job_id
+        self.track = track
+        self.index = index
+        self.total = total
+        self.downloaded_bytes = downloaded_bytes
+        self.total_bytes = total_bytes
+        self.speed = speed
+        self.eta = eta
+        self.message = message
+        self.level = level
+        self.data = data or {}
+        self.timestamp = time.monotonic()
+
+    @property
+    def percent(self):
+        """Download percentage (0-100) or None if the total size is unknown"""
+        if self.downloaded_bytes is None or not self.total_bytes:
+            return None
+        return min(100.0, self.downloaded_bytes * 100.0 / self.total_bytes)
+
+    def to_dict(self):
+        """JSON friendly version of the event (timestamp is left out, it's process-local)"""
+        return {name: getattr(self, name) for name in self.__slots__ if name != 'timestamp'}
+
+    def __repr__(self):
+        return f"ProgressEvent({self.kind!r}, track={self.track!r}, message={self.message!r})"
+
+
+class ProgressBus:
+    """
+    Thread-safe publish/subscribe hub for ProgressEvents
+
+    DOWNLOAD_PROGRESS events are throttled per (job, track): at most one is
+    delivered every `min_interval` seconds and anything in between is
+    coalesced into the latest pending event. A pending event goes out once
+    its window is over even if nothing else is published, so a stalled or
+    paused download still shows its last byte count. Every other event is
+    delivered straight away, after flushing the pending progress for its
+    track (or its whole job for JOB_FINISHED) so subscribers always see the
+    final byte count before "done".
+    """
+
+    def __init__(self, min_interval=0.1):
+        """
+        Args:
+            min_interval (float): Minimum seconds between two progress events for the same track
+        """
+        self.min_interval = min_interval
+        self._subscribers = []
+        self._last_sent = {}
+        self._pending = {}
+        self._timer = None
+        self._lock = threading.Lock()
+        # Held while delivering, so a timer flush can't overtake newer events of a track
+        self._delivery = threading.RLock()
+
+    def subscribe(self, callback):
+        """
+        Register a callback that receives every delivered ProgressEvent
+
+        Callbacks run on the thread that published the event, so GUI
+        subscribers should hand the event over to their own thread.
+
+        Args:
+            callback (callable): Function taking a single ProgressEvent
+
+        Returns:
+            callable: Function that removes the subscription when called
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+        return lambda: self.unsubscribe(callback)
+
+    def unsubscribe(self, callback):
+        """Remove a previously subscribed callback (no-op if unknown)"""
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def publish(self, event):
+        """
+        Publish an event to all subscribers (throttled for byte progress)
+
+        Args:
+            event (ProgressEvent): Event to publish
+        """
+        key = (event.job_id, event.track)
+
+        if event.kind == ProgressEvent.DOWNLOAD_PROGRESS:
+            with self._lock:
+                last = self._last_sent.get(key, 0)
+                if event.timestamp - last < self.min_interval:
+                    # Too soon, keep only the newest one around until the window is over
+                    self._pending[key] = event
+                    self._arm_timer(last + self.min_interval - event.timestamp)
+                    return
+
+        with self._delivery:
+            with self._lock:
+                if event.kind == ProgressEvent.DOWNLOAD_PROGRESS:
+                    self._last_sent[key] = event.timestamp
+                    self._pending.pop(key, None)
+                    pending = []
+                elif event.kind == ProgressEvent.JOB_FINISHED:
+                    pending = self._take_pending(lambda k: k[0] == event.job_id)
+                else:
+                    pending = [self._pending.pop(key)] if key in self._pending else []
+                    if event.kind in ProgressEvent.TERMINAL_KINDS:
+                        self._last_sent.pop(key, None)
+
+            for pending_event in pending:
+                self._dispatch(pending_event)
+            self._dispatch(event)
+
+    def flush(self, job_id=None):
+        """
+        Deliver the coalesced progress events that are still pending
+
+        Args:
+            job_id (str): Only those of this job (default: all of them)
+        """
+        with self._delivery:
+            with self._lock:
+                pending = self._take_pending(lambda key: job_id is None or key[0] == job_id)
+            for event in pending:
+                self._dispatch(event)
+
+    def _take_pending(self, match):
+        """Remove and return the pending events whose key matches (call with the lock held)"""
+        keys = [key for key in self._pending if match(key)]
+        return [self._pending.pop(key) for key in keys]
+
+    def _arm_timer(self, delay):
+        """Make sure pending events get flushed in `delay` seconds (call with the lock held)"""
+        if self._timer is None:
+            self._timer = threading.Timer(max(delay, 0.0), self._flush_due)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_due(self):
+        """Timer callback: deliver pending events whose throttle window is over"""
+        with self._delivery:
+            with self._lock:
+                self._timer = None
+                now = time.monotonic()
+                due = self._take_pending(lambda key: now - self._last_sent.get(key, 0) >= self.min_interval)
+                for event in due:
+                    self._last_sent[(event.job_id, event.track)] = now
+                if self._pending:
+                    wait = min(self._last_sent.get(key, 0) + self.min_interval - now for key in self._pending)
+                    self._arm_timer(wait)
+            for event in due:
+                self._dispatch(event)
+
+    def _dispatch(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception:
+                # A broken front end must never break the download itself
+                pass
+
+
+def format_bar(percentage, width=40):
+    """Coloured text progress bar used by the console renderer"""
+    filled = int(width * percentage / 100)
+    bar = '█' * filled + '░' * (width - filled)
+    return f"{Fore.GREEN}{bar}{Fore.WHITE} {percentage:.1f}%"
+
+
+def format_bytes(num):
+    """Format a byte count like yt-dlp does (e.g. '3.42MiB')"""
+    if num is None:
+        return 'N/A'
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if abs(num) < 1024 or unit == 'GiB':
+            return f"{num:.2f}{unit}" if unit != 'B' else f"{int(num)}B"
+        num /= 1024.0
+
+
+def format_eta(seconds):
+    """Format seconds as MM:SS"""
+    if seconds is None:
+        return 'N/A'
+    seconds = int(seconds)
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+class ConsoleProgress:
+    """
+    Subscriber that renders events to the terminal
+
+    On a TTY, byte progress is drawn as a small dashboard with one bar per
+    track being downloaded, redrawn at most every `refresh_interval`
+    seconds no matter how many events come in. When stdout is not a TTY
+    (log files, pipes, GUI redirects) no bars or cursor movement are
+    written at all, just a plain progress line per track every
+    `log_interval` seconds.
+    """
+
+    LOG_STYLES = {
+        'success': (Fore.GREEN, '✓'),
+        'error': (Fore.RED, '✗'),
+        'warning': (Fore.YELLOW, '⚠'),
+        'info': (Fore.CYAN, '•'),
+    }
+
+    def __init__(self, stream=None, refresh_interval=0.2, log_interval=5.0, tty=None):
+        """
+        Args:
+            stream: File-like object to write to (default: sys.stdout at write time)
+            refresh_interval (float): Minimum seconds between two dashboard redraws on a TTY
+            log_interval (float): Seconds between plain progress lines per track when not a TTY
+            tty (bool): Force TTY or plain mode (default: detect with isatty())
+        """
+        self.stream = stream
+        self.refresh_interval = refresh_interval
+        self.log_interval = log_interval
+        self.tty = tty
+        self._active = {}
+        self._last_logged = {}
+        self._last_draw = 0
+        self._drawn_lines = 0
+        self._lock = threading.Lock()
+
+    def _is_tty(self, out):
+        if self.tty is not None:
+            return self.tty
+        try:
+            return out.isatty()
+        except Exception:
+            return False
+
+    def __call__(self, event):
+        out = self.stream or sys.stdout
+        if out is None:
+            # pythonw has no console at all
+            return
+
+        with self._lock:
+            if self._is_tty(out):
+                self._render_tty(out, event)
+            else:
+                self._render_plain(out, event)
+
+    # ----- TTY rendering -----
+
+    def _render_tty(self, out, event):
+        key = (event.job_id, event.track)
+
+        if event.kind == ProgressEvent.DOWNLOAD_PROGRESS:
+            self._active[key] = event
+            if event.timestamp - self._last_draw < self.refresh_interval:
+                return
+            self._clear_dashboard(out)
+            self._draw_dashboard(out)
+            self._last_draw = event.timestamp
+            out.flush()
+            return
+
+        if event.kind in (ProgressEvent.DOWNLOAD_FINISHED,) + ProgressEvent.TERMINAL_KINDS:
+            self._active.pop(key, None)
+
+        text = self._format(event, color=True)
+        if text is None:
+            return
+
+        # Log lines go above the dashboard, so wipe it, print and draw it again
+        self._clear_dashboard(out)
+        out.write(text)
+        self._draw_dashboard(out)
+        out.flush()
+
+    def _clear_dashboard(self, out):
+        if self._drawn_lines:
+            out.write(f"\x1b[{self._drawn_lines}A\r\x1b[J")
+            self._drawn_lines = 0
+
+    def _draw_dashboard(self, out):
+        for event in self._active.values():
+            percent = event.percent
+            if percent is None:
+                out.write(f"{Fore.CYAN}Downloading... {Fore.WHITE}{event.track}{Style.RESET_ALL}\n")
+            else:
+                speed = f"{format_bytes(event.speed)}/s" if event.speed else 'N/A'
+                out.write(
+                    f"{Fore.CYAN}Downloading {format_bar(percent, 30)} {Fore.MAGENTA}| "
+                    f"{Fore.GREEN}{speed} {Fore.MAGENTA}| {Fore.YELLOW}{format_eta(event.eta)}"
+                )
+                if len(self._active) > 1:
+                    out.write(f" {Fore.MAGENTA}| {Fore.WHITE}{event.track}")
+                out.write(f"{Style.RESET_ALL}\n")
+            self._drawn_lines += 1
+
+    # ----- Plain rendering -----
+
+    def _render_plain(self, out, event):
+        key = (event.job_id, event.track)
+
+        if event.kind == ProgressEvent.DOWNLOAD_PROGRESS:
+            last = self._last_logged.get(key)
+            if last is not None and event.timestamp - last < self.log_interval:
+                return
+            self._last_logged[key] = event.timestamp
+            percent = event.percent
+            line = f"Downloading '{event.track}'"
+            if percent is not None:
+                line += f": {percent:.1f}% of {format_bytes(event.total_bytes)}"
+            if event.speed:
+                line += f" at {format_bytes(event.speed)}/s"
+            if event.eta is not None:
+                line += f", ETA {format_eta(event.eta)}"
+            out.write(line + "\n")
+            out.flush()
+            return
+
+        if event.kind in ProgressEvent.TERMINAL_KINDS:
+            self._last_logged.pop(key, None)
+
+        text = self._format(event, color=False)
+        if text is not None:
+            out.write(text)
+            out.flush()
+
+    # ----- Shared formatting -----
+
+    def _format(self, event, color):
+        """Format a non-progress event, or return None if it isn't shown"""
+        if event.kind == ProgressEvent.LOG:
+            style, symbol = self.LOG_STYLES.get(event.level, self.LOG_STYLES['info'])
+            if color:
+                return f"{style}{Style.BRIGHT}{symbol} {event.message}{Style.RESET_ALL}\n"
+            return f"{symbol} {event.message}\n"
+
+        if event.kind == ProgressEvent.TRACK_STARTED:
+            text = ''
+            if event.index is not None and event.total:
+                text += f"\n{Fore.MAGENTA}[{event.index}/{event.total}]{Style.RESET_ALL}\n" if color \
+                    else f"\n[{event.index}/{event.total}]\n"
+            if event.data.get('deduplicated'):
+                # Nothing is searched for songs already downloaded this run
+                return text
+            if color:
+                return text + f"{Fore.CYAN}Searching for: {Fore.WHITE}'{event.track}'{Style.RESET_ALL}\n"
+            return text + f"Searching for: '{event.track}'\n"
+
+        if event.kind == ProgressEvent.TRACK_RESOLVED:
+            if color:
+                return f"{Fore.GREEN}✓ Found: {Fore.WHITE}{event.message}{Style.RESET_ALL}\n"
+            return f"✓ Found: {event.message}\n"
+
+        if event.kind == ProgressEvent.DOWNLOAD_FINISHED:
+            if color:
+                return f"{Fore.GREEN}{Style.BRIGHT}✓ Completed: {Fore.WHITE}{event.message}{Style.RESET_ALL}\n"
+            return f"✓ Completed: {event.message}\n"
+
+        return None
@@ -0,0 +1,296 @@
+"""
+Resolvers: turning a "Artist - Title" query into something yt-dlp can download
+
+The downloader used to take the first `ytsearch1` hit and give up if that
+video failed. A ResolverChain tries several sources instead, either one
+after another in a configured order or all at once (raced, with a
+deadline). The first candidate is downloaded; if that download fails the
+next candidate is tried.
+
+Every resolver keeps statistics (searches, hits, latency, downloads that
+worked) so the order can be tuned from real numbers.
+"""
+
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeout
+from urllib.parse import quote_plus
+
+from .cancel import DownloadCancelled
+
+
+def normalize_query(query):
+    """
+    Strip the noise Spotify titles carry but video titles usually don't
+
+    'Artist - Song (feat. X) - 2011 Remaster' -> 'Artist Song'
+    """
+    text = re.sub(r"\s*[\(\[][^\)\]]*[\)\]]", "", query)
+    text = re.sub(r"\s+-\s+(\d{4}\s+)?(remaster(ed)?|live|radio edit|single version|mono|stereo)\b.*$",
+                  "", text, flags=re.IGNORECASE)
+    text = re.sub(r"\b(feat\.?|ft\.?|featuring)\s.*$", "", text, flags=re.IGNORECASE)
+    text = text.replace(' - ', ' ')
+    return ' '.join(text.split())
+
+
+def _first_entry(info):
+    """First usable result of a search (entries may be a lazy list when process=False)"""
+    if not info:
+        return None
+    entries = info.get('entries')
+    if entries is None:
+        return info if info.get('_type') not in ('playlist', 'multi_video') else None
+    for entry in entries:
+        if entry:
+            return entry
+    return None
+
+
+class Resolver:
+    """Base class: one way of finding a downloadable URL for a track"""
+
+    name = 'resolver'
+
+    def build_query(self, query):
+        """
+        Return what to pass to yt-dlp for this query, or None to skip the query
+
+        Args:
+            query (str): 'Artist - Title'
+        """
+        raise NotImplementedError
+
+    def search(self, ydl, query):
+        """
+        Search for a track
+
+        Args:
+            ydl (YoutubeDL): yt-dlp instance to search with
+            query (str): 'Artist - Title'
+
+        Returns:
+            dict: {'url', 'title', 'duration'} of the best hit, or None if nothing was found
+        """
+        search = self.build_query(query)
+        if search is None:
+            return None
+        # process=False: just the result list, formats are resolved once when downloading
+        entry = _first_entry(ydl.extract_info(search, download=False, process=False))
+        if not entry:
+            return None
+        url = entry.get('webpage_url') or entry.get('url') or entry.get('id')
+        if not url:
+            return None
+        return {'url': url, 'title': entry.get('title') or url, 'duration': entry.get('duration')}
+
+
+class YouTubeSearchResolver(Resolver):
+    """The original behaviour: first YouTube search hit for the query as-is"""
+
+    name = 'youtube'
+
+    def build_query(self, query):
+        return f"ytsearch1:{query}"
+
+
+class NormalizedQueryResolver(Resolver):
+    """YouTube search with feat./remaster/bracket noise removed and 'audio' added"""
+
+    name = 'youtube-normalized'
+
+    def build_query(self, query):
+        normalized = normalize_query(query)
+        if not normalized or normalized.lower() == query.lower():
+            return None
+        return f"ytsearch1:{normalized} audio"
+
+
+class YouTubeMusicResolver(Resolver):
+    """YouTube Music song search, which prefers official audio over music videos"""
+
+    name = 'youtube-music'
+
+    def build_query(self, query):
+        return f"https://music.youtube.com/search?q={quote_plus(query)}#songs"
+
+
+class SoundCloudResolver(Resolver):
+    """First SoundCloud search hit"""
+
+    name = 'soundcloud'
+
+    def build_query(self, query):
+        return f"scsearch1:{query}"
+
+
+RESOLVERS = {
+    resolver.name: resolver
+    for resolver in (YouTubeSearchResolver, YouTubeMusicResolver, NormalizedQueryResolver, SoundCloudResolver)
+}
+
+DEFAULT_RESOLVERS = ['youtube', 'youtube-music', 'youtube-normalized', 'soundcloud']
+
+
+class ResolverChain:
+    """Tries resolvers in order (or races them) and records how each one does"""
+
+    ORDERED = 'ordered'
+    RACE = 'race'
+
+    def __init__(self, resolvers=None, mode=ORDERED, deadline=30.0):
+        """
+        Args:
+            resolvers (list): Resolver instances or names from RESOLVERS (default: DEFAULT_RESOLVERS)
+            mode (str): 'ordered' tries one resolver at a time, 'race' searches with all of
+                them at once and takes hits as they arrive (default: 'ordered')
+            deadline (float): Race mode: seconds to wait for search results (default: 30)
+        """
+        if mode not in (self.ORDERED, self.RACE):
+            raise ValueError(f"Unknown resolver mode '{mode}'")
+        self.resolvers = []
+        for resolver in resolvers or DEFAULT_RESOLVERS:
+            if isinstance(resolver, str):
+                if resolver not in RESOLVERS:
+                    raise ValueError(f"Unknown resolver '{resolver}', choose from {', '.join(RESOLVERS)}")
+                resolver = RESOLVERS[resolver]()
+            self.resolvers.append(resolver)
+        self.mode = mode
+        self.deadline = deadline
+        self._lock = threading.Lock()
+        self._stats = {resolver.name: self._empty_stats() for resolver in self.resolvers}
+
+    @staticmethod
+    def _empty_stats():
+        return {'searches': 0, 'hits': 0, 'misses': 0, 'errors': 0, 'latency_total': 0.0,
+                'downloads': 0, 'download_failures': 0}
+
+    # ===== Statistics =====
+
+    def _record_search(self, name, outcome, latency):
+        with self._lock:
+            stats = self._stats.setdefault(name, self._empty_stats())
+            stats['searches'] += 1
+            stats[outcome] += 1
+            stats['latency_total'] += latency
+
+    def record_download(self, name, success):
+        """Record whether the candidate a resolver found could actually be downloaded"""
+        with self._lock:
+            stats = self._stats.setdefault(name, self._empty_stats())
+            stats['downloads' if success else 'download_failures'] += 1
+
+    def stats(self):
+        """
+        Per resolver statistics
+
+        Returns:
+            dict: name -> counters plus 'hit_rate' (hits per search), 'success_rate'
+                  (downloads per hit) and 'latency_avg' (seconds per search)
+        """
+        with self._lock:
+            result = {name: dict(stats) for name, stats in self._stats.items()}
+        for stats in result.values():
+            stats['hit_rate'] = stats['hits'] / stats['searches'] if stats['searches'] else None
+            tried = stats['downloads'] + stats['download_failures']
+            stats['success_rate'] = stats['downloads'] / tried if tried else None
+            stats['latency_avg'] = stats['latency_total'] / stats['searches'] if stats['searches'] else None
+        return result
+
+    # ===== Resolving =====
+
+    def _search(self, resolver, ydl, query, retry=None):
+        """Run one resolver, returning its candidate or None (errors are recorded, not raised)"""
+        if resolver.build_query(query) is None:
+            return None
+        start = time.monotonic()
+        try:
+            if retry is not None:
+                candidate = retry(lambda: resolver.search(ydl, query))
+            else:
+                candidate = resolver.search(ydl, query)
+        except DownloadCancelled:
+            raise
+        except Exception:
+            self._record_search(resolver.name, 'errors', time.monotonic() - start)
+            return None
+        self._record_search(resolver.name, 'hits' if candidate else 'misses', time.monotonic() - start)
+        return candidate
+
+    def candidates(self, query, ydl, make_ydl=None, retry=None):
+        """
+        Yield (resolver name, candidate) pairs for a query, best first
+
+        The caller downloads the first candidate and only asks for the next
+        one if that failed, so in ordered mode later resolvers never run for
+        tracks the first one handles. Candidates pointing to a URL that was
+        already yielded are skipped.
+
+        Args:
+            query (str): 'Artist - Title'
+            ydl (YoutubeDL): yt-dlp instance for ordered mode
+            make_ydl (callable): Returns a new YoutubeDL; race mode needs one per thread
+                (default: share `ydl`)
+            retry (callable): Wraps each search for retries, e.g. the downloader's _with_retries
+        """
+        seen = set()
+
+        def fresh(candidate):
+            if candidate is None or candidate['url'] in seen:
+                return False
+            seen.add(candidate['url'])
+            return True
+
+        if self.mode == self.ORDERED or len(self.resolvers) == 1:
+            for resolver in self.resolvers:
+                candidate = self._search(resolver, ydl, query, retry)
+                if fresh(candidate):
+                    yield resolver.name, candidate
+            return
+
+        def run(resolver):
+            if make_ydl is None:
+                return self._search(resolver, ydl, query, retry)
+            with make_ydl() as search_ydl:
+                return self._search(resolver, search_ydl, query, retry)
+
+        executor = ThreadPoolExecutor(max_workers=len(self.resolvers), thread_name_prefix='resolver')
+        try:
+            futures = [(resolver, executor.submit(run, resolver)) for resolver in self.resolvers]
+            deadline = time.monotonic() + self.deadline
+
+            # Whichever hit comes back first gets downloaded first...
+            pending = list(futures)
+            first = None
+            while pending and first is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                done, _ = wait([future for _, future in pending], timeout=remaining,
+                               return_when=FIRST_COMPLETED)
+                if not done:
+                    return
+                for resolver, future in list(pending):
+                    if future in done:
+                        pending.remove((resolver, future))
+                        candidate = future.result()
+                        if fresh(candidate):
+                            first = (resolver.name, candidate)
+                            break
+            if first is None:
+                return
+            yield first
+
+            # ...the rest are then tried in the configured order
+            for resolver, future in pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    candidate = future.result(timeout=remaining)
+                except FutureTimeout:
+                    return
+                if fresh(candidate):
+                    yield resolver.name, candidate
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,166 @@
+"""
+Incremental filesystem scanner for the download folder
+
+Listing a big library with os.walk means one directory read per folder
+and one stat per file on every call, which is slow on network drives.
+LibraryScanner remembers every folder's mtime and contents in a small JSON
+cache. A folder whose mtime hasn't changed (nothing added, removed or
+renamed in it) is served from the cache with a single stat instead of
+being listed again.
+
+The cache lives in a hidden folder so that writing it doesn't change the
+mtime of the root folder itself. Hidden folders are never scanned, and
+files of downloads in progress (raw streams, encodes, partials: see
+naming.is_temporary_file) are never reported.
+"""
+
+import itertools
+import json
+import os
+
+from .naming import is_temporary_file
+
+
+AUDIO_EXTENSIONS = ('.mp3', '.m4a', '.webm', '.opus', '.flac', '.wav', '.aac', '.ogg', '.alac')
+
+
+class LibraryScanner:
+    """Scan download_dir for audio files, reusing cached results for unchanged folders"""
+
+    CACHE_NAME = os.path.join('.cache', 'scan_cache.json')
+
+    def __init__(self, root, cache_path=None, extensions=AUDIO_EXTENSIONS):
+        """
+        Args:
+            root (str): Folder to scan (download_dir)
+            cache_path (str): Where to keep the folder cache (default: <root>/.cache/scan_cache.json)
+            extensions (tuple): File extensions to report
+        """
+        self.root = root
+        self.cache_path = cache_path or os.path.join(root, self.CACHE_NAME)
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self._cache = self._load()
+        self._dirty = False
+
+    def _load(self):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        tmp_path = self.cache_path + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._cache, f)
+            os.replace(tmp_path, self.cache_path)
+            self._dirty = False
+        except OSError:
+            # Not being able to cache is never fatal, next scan is just slower
+            pass
+
+    def _read_dir(self, rel_dir, abs_dir, mtime):
+        """List one folder with os.scandir and store the result in the cache"""
+        files, dirs = [], []
+        with os.scandir(abs_dir) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not entry.name.startswith('.'):
+                            dirs.append(entry.name)
+                    elif entry.name.lower().endswith(self.extensions) and not is_temporary_file(entry.name):
+                        stat = entry.stat()
+                        files.append([entry.name, stat.st_size, stat.st_mtime])
+                except OSError:
+                    continue
+        files.sort()
+        dirs.sort()
+        record = {'mtime': mtime, 'files': files, 'dirs': dirs}
+        self._cache[rel_dir] = record
+        self._dirty = True
+        return record
+
+    def iter_files(self):
+        """
+        Yield every audio file under root
+
+        Unchanged folders come from the cache, changed ones are re-listed.
+        The cache is written back when the generator finishes or is closed.
+
+        Yields:
+            dict: {'path': path relative to root, 'size': bytes, 'format': extension, 'mtime': float}
+        """
+        if not os.path.isdir(self.root):
+            return
+
+        seen = set()
+        completed = False
+        stack = ['.']
+        try:
+            while stack:
+                rel_dir = stack.pop()
+                abs_dir = os.path.join(self.root, rel_dir) if rel_dir != '.' else self.root
+                try:
+                    mtime = os.stat(abs_dir).st_mtime
+                except OSError:
+                    continue
+
+                record = self._cache.get(rel_dir)
+                if record is None or record['mtime'] != mtime:
+                    try:
+                        record = self._read_dir(rel_dir, abs_dir, mtime)
+                    except OSError:
+                        continue
+                seen.add(rel_dir)
+
+                prefix = '' if rel_dir == '.' else rel_dir + os.sep
+                for name, size, file_mtime in record['files']:
+                    if is_temporary_file(name):
+                        continue  # Cached by an older version while it was being written
+                    yield {
+                        'path': prefix + name,
+                        'size': size,
+                        'format': name.rpartition('.')[2].lower(),
+                        'mtime': file_mtime,
+                    }
+
+                # Reversed so folders come out in alphabetical order
+                for name in reversed(record['dirs']):
+                    stack.append(name if rel_dir == '.' else os.path.join(rel_dir, name))
+            completed = True
+        finally:
+            if completed:
+                # Only a full scan knows which folders are gone
+                for rel_dir in set(self._cache) - seen:
+                    del self._cache[rel_dir]
+                    self._dirty = True
+            if self._dirty:
+                self._save()
+
+    def get_page(self, offset=0, limit=100):
+        """
+        Return one page of the scan
+
+        Args:
+            offset (int): Number of files to skip
+            limit (int): Maximum number of files to return
+
+        Returns:
+            dict: {'items': list of file dicts, 'offset': int, 'limit': int,
+                   'next_offset': int or None when there are no more files}
+        """
+        files = self.iter_files()
+        try:
+            page = list(itertools.islice(files, offset, offset + limit + 1))
+        finally:
+            files.close()
+
+        has_more = len(page) > limit
+        return {
+            'items': page[:limit],
+            'offset': offset,
+            'limit': limit,
+            'next_offset': offset + limit if has_more else None,
+        }
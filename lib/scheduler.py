@@ -0,0 +1,220 @@
+"""
+Priority and fairness scheduler for download work items
+
+A plain priority queue runs jobs first-come-first-served within a
+priority, so a 2,000 track playlist submitted first keeps every worker
+busy and a single-track request waits behind all of it.
+
+FairScheduler keeps one FIFO of work items per job and decides which job
+the next free worker serves:
+    - higher `priority` jobs are always served first
+    - jobs of the same priority share the workers in proportion to their
+      `weight` (stride scheduling: every dispatched item advances the
+      job's virtual time by 1/weight, the job furthest behind goes next)
+    - with small_jobs_first, the job with the fewest remaining items goes
+      next instead, so short requests finish almost immediately
+
+Every item records how long it waited in the queue and how long it took
+to run, aggregated per job for latency reporting.
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class _JobQueue:
+    """Pending items and latency metrics of one job"""
+
+    def __init__(self, job_id, priority, weight, virtual_time):
+        self.job_id = job_id
+        self.priority = priority
+        self.weight = max(weight, 0.001)
+        self.pass_value = virtual_time
+        self.items = deque()
+        self.running = 0
+        self.forgotten = False
+        self.metrics = {
+            'dispatched': 0,
+            'completed': 0,
+            'wait_total': 0.0,
+            'wait_max': 0.0,
+            'service_total': 0.0,
+            'service_max': 0.0,
+        }
+
+
+class FairScheduler:
+    """Thread-safe scheduler handing out work items to a pool of workers"""
+
+    def __init__(self, small_jobs_first=False):
+        """
+        Args:
+            small_jobs_first (bool): Within a priority, serve the job with the fewest
+                remaining items first instead of sharing fairly (default: False)
+        """
+        self.small_jobs_first = small_jobs_first
+        self._jobs = {}
+        self._virtual_time = 0.0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, job_id, item, priority=0, weight=1.0):
+        """
+        Queue a work item for a job
+
+        Args:
+            job_id (str): Job the item belongs to
+            item: Anything, handed back unchanged by get()
+            priority (int): Higher is served first (default: 0)
+            weight (float): Share of the workers relative to jobs of the same priority (default: 1)
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                # New jobs start at the current virtual time, not at zero, so they
+                # get their fair share from now on rather than a burst to catch up
+                job = _JobQueue(job_id, priority, weight, self._virtual_time)
+                self._jobs[job_id] = job
+            job.items.append((time.monotonic(), item))
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """
+        Take the next work item, blocking until one is available
+
+        Args:
+            timeout (float): Seconds to wait (default: forever)
+
+        Returns:
+            tuple: (job_id, item, ticket) where ticket is passed back to done(),
+                   or None once the scheduler is closed (or on timeout)
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None
+                job = self._pick()
+                if job is not None:
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+            enqueued, item = job.items.popleft()
+            now = time.monotonic()
+            wait = now - enqueued
+            job.pass_value += 1.0 / job.weight
+            self._virtual_time = max(self._virtual_time, min(
+                (other.pass_value for other in self._jobs.values() if other.items), default=job.pass_value
+            ))
+            job.running += 1
+            job.metrics['dispatched'] += 1
+            job.metrics['wait_total'] += wait
+            job.metrics['wait_max'] = max(job.metrics['wait_max'], wait)
+            return job.job_id, item, (job.job_id, now)
+
+    def done(self, ticket):
+        """
+        Report that a work item returned by get() has finished
+
+        Args:
+            ticket (tuple): Third element returned by get()
+
+        Returns:
+            dict: The job's latency metrics including this item (see metrics()),
+                  or None for unknown jobs
+        """
+        job_id, started = ticket
+        service = time.monotonic() - started
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job.running -= 1
+            job.metrics['completed'] += 1
+            job.metrics['service_total'] += service
+            job.metrics['service_max'] = max(job.metrics['service_max'], service)
+            if job.forgotten and not job.running:
+                del self._jobs[job_id]
+            m = dict(job.metrics)
+        return self._averages(m)
+
+    def _pick(self):
+        candidates = [job for job in self._jobs.values() if job.items]
+        if not candidates:
+            return None
+        top = max(job.priority for job in candidates)
+        candidates = [job for job in candidates if job.priority == top]
+        if self.small_jobs_first:
+            return min(candidates, key=lambda job: (len(job.items) + job.running, job.pass_value))
+        return min(candidates, key=lambda job: job.pass_value)
+
+    def drop(self, job_id):
+        """
+        Remove every pending item of a job
+
+        Returns:
+            list: The items that were dropped
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return []
+            dropped = [item for _, item in job.items]
+            job.items.clear()
+            return dropped
+
+    def forget(self, job_id):
+        """
+        Discard a finished job's queue and metrics
+
+        Items of the job that are still running keep it around until they
+        are done(), so their service time is still counted.
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.items.clear()
+            if job.running:
+                job.forgotten = True
+            else:
+                del self._jobs[job_id]
+
+    def pending(self, job_id=None):
+        """Number of queued items (for one job, or in total)"""
+        with self._cond:
+            if job_id is not None:
+                job = self._jobs.get(job_id)
+                return len(job.items) if job else 0
+            return sum(len(job.items) for job in self._jobs.values())
+
+    def metrics(self, job_id):
+        """
+        Latency metrics of a job
+
+        Returns:
+            dict: dispatched/completed counts plus average and max queue wait and
+                  service time in seconds, or None for unknown jobs
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            m = dict(job.metrics)
+        return self._averages(m)
+
+    @staticmethod
+    def _averages(m):
+        m['wait_avg'] = m['wait_total'] / m['dispatched'] if m['dispatched'] else 0.0
+        m['service_avg'] = m['service_total'] / m['completed'] if m['completed'] else 0.0
+        return m
+
+    def close(self):
+        """Wake up every worker blocked in get(); they all receive None"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
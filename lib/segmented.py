@@ -0,0 +1,237 @@
+"""
+Segmented downloads
+
+YouTube throttles each connection on its own, so one HTTP stream is often
+much slower than the line it runs on. segmented_download() fetches a file
+over several connections at once, each one pulling byte ranges
+('segments') off a shared queue until the file is complete.
+
+Every segment is written straight to its offset in a file preallocated at
+the final size, so there is no reassembly step and no extra copy; the file
+is renamed into place once every byte is there.
+
+Finished segments are recorded next to the '.part' file. When a download
+fails or is cancelled both are kept, and the next attempt at the same
+file (same size) only fetches the segments that are missing.
+
+Progress is reported through yt-dlp style progress hooks, so the
+downloader's progress_hook (events, cancel/pause, bandwidth shaping)
+works the same as for a normal yt-dlp download.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+
+import requests
+
+
+DEFAULT_SEGMENT_SIZE = 4 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+
+class SegmentedDownloadError(Exception):
+    """The server answered a range request with an error"""
+
+
+class RangesNotSupported(SegmentedDownloadError):
+    """The server ignores Range headers (or doesn't say how big the file is)"""
+
+
+def probe(url, headers=None, session=None, timeout=30):
+    """
+    Ask the server for the size of a file and whether it serves byte ranges
+
+    A one byte range GET is used instead of HEAD, which some CDNs refuse.
+
+    Returns:
+        int: Size in bytes
+
+    Raises:
+        RangesNotSupported: If no 206 with a total size came back
+        SegmentedDownloadError: For HTTP errors
+    """
+    session = session or requests.Session()
+    response = session.get(url, headers=dict(headers or {}, Range='bytes=0-0'), stream=True, timeout=timeout)
+    try:
+        if response.status_code >= 400:
+            raise SegmentedDownloadError(f"HTTP Error {response.status_code}: {response.reason}")
+        content_range = response.headers.get('Content-Range', '')
+        if response.status_code != 206 or '/' not in content_range or content_range.endswith('/*'):
+            raise RangesNotSupported(f"{url} does not support range requests")
+        return int(content_range.rsplit('/', 1)[1])
+    finally:
+        response.close()
+
+
+def split_segments(size, segment_size=DEFAULT_SEGMENT_SIZE):
+    """[(start, end)] inclusive byte ranges covering `size` bytes"""
+    segment_size = max(1, int(segment_size))
+    return [(start, min(start + segment_size, size) - 1) for start in range(0, size, segment_size)]
+
+
+def _load_segments(state_path, temp_dest, size, segment_size):
+    """Starts of the segments an earlier attempt finished, if its .part file can be reused"""
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('size') != size or state.get('segment_size') != segment_size or \
+                os.path.getsize(temp_dest) != size:
+            return set()
+        return set(state.get('done') or [])
+    except (OSError, ValueError, TypeError, AttributeError):
+        return set()
+
+
+def _save_segments(state_path, size, segment_size, done):
+    try:
+        with open(state_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'size': size, 'segment_size': segment_size, 'done': sorted(done)}, f)
+        os.replace(state_path + '.tmp', state_path)
+    except OSError:
+        pass  # Only costs a full download next time
+
+
+def _remove(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def segmented_download(url, dest, size=None, connections=4, segment_size=DEFAULT_SEGMENT_SIZE,
+                       headers=None, progress_hooks=None, retries=3, timeout=30):
+    """
+    Download `url` to `dest` over several connections
+
+    Args:
+        url (str): Direct media URL
+        dest (str): Final file path
+        size (int): File size if already known (default: probe the server)
+        connections (int): Parallel connections (default: 4)
+        segment_size (int): Bytes per range request (default: 4 MiB)
+        headers (dict): HTTP headers for every request (User-Agent, Cookie...)
+        progress_hooks (list): yt-dlp style callables taking a progress dict; they are
+            called one at a time and may raise (e.g. DownloadCancelled) to abort
+        retries (int): Extra attempts per segment after a connection error (default: 3)
+        timeout (float): Socket timeout in seconds
+
+    Returns:
+        str: `dest`
+
+    Raises:
+        RangesNotSupported: If the server can't do ranges, nothing was written
+        SegmentedDownloadError: For HTTP errors, the finished segments are kept for the next attempt
+    """
+    headers = dict(headers or {})
+    if size is None:
+        size = probe(url, headers, timeout=timeout)
+    segment_size = max(1, int(segment_size))
+
+    temp_dest = f"{dest}.part"
+    state_path = f"{temp_dest}.segments"
+    finished = _load_segments(state_path, temp_dest, size, segment_size)
+    if not finished:
+        with open(temp_dest, 'wb') as f:
+            f.truncate(size)
+
+    segments = queue.SimpleQueue()
+    resumed = 0
+    for start, end in split_segments(size, segment_size):
+        if start in finished:
+            resumed += end + 1 - start
+        else:
+            segments.put((start, end))
+
+    hook_lock = threading.Lock()
+    stop = threading.Event()
+    errors = []
+    state = {'downloaded': resumed, 'start': time.monotonic()}
+
+    def report(amount):
+        # Hooks are called one at a time, a hook that sleeps (bandwidth limit) holds everyone back
+        with hook_lock:
+            state['downloaded'] += amount
+            elapsed = time.monotonic() - state['start']
+            speed = (state['downloaded'] - resumed) / elapsed if elapsed > 0 else None
+            status = {
+                'status': 'downloading',
+                'filename': dest,
+                'tmpfilename': temp_dest,
+                'downloaded_bytes': state['downloaded'],
+                'total_bytes': size,
+                'speed': speed,
+                'eta': int((size - state['downloaded']) / speed) if speed else None,
+            }
+            for hook in progress_hooks or []:
+                hook(status)
+
+    def fetch(session, f, start, end):
+        position = start
+        for attempt in range(retries + 1):
+            try:
+                response = session.get(url, headers=dict(headers, Range=f"bytes={position}-{end}"),
+                                       stream=True, timeout=timeout)
+                with response:
+                    if response.status_code >= 400:
+                        raise SegmentedDownloadError(f"HTTP Error {response.status_code}: {response.reason}")
+                    if response.status_code != 206 or \
+                            not response.headers.get('Content-Range', '').startswith(f"bytes {position}-"):
+                        raise RangesNotSupported(f"{url} ignored the range request")
+                    f.seek(position)
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        if stop.is_set():
+                            return
+                        chunk = chunk[:end + 1 - position]
+                        f.write(chunk)
+                        position += len(chunk)
+                        report(len(chunk))
+                if position > end:
+                    return
+            except requests.RequestException:
+                if attempt == retries:
+                    raise
+            # Connection dropped or came back short, carry on from where it stopped
+        raise SegmentedDownloadError(f"Segment {start}-{end} ended early at {position}")
+
+    def worker():
+        try:
+            with requests.Session() as session, open(temp_dest, 'r+b') as f:
+                while not stop.is_set():
+                    try:
+                        start, end = segments.get_nowait()
+                    except queue.Empty:
+                        return
+                    fetch(session, f, start, end)
+                    if not stop.is_set():
+                        f.flush()
+                        with hook_lock:
+                            finished.add(start)
+                            _save_segments(state_path, size, segment_size, finished)
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+    threads = [threading.Thread(target=worker, name=f"segment-{i}", daemon=True)
+               for i in range(max(1, min(connections, -(-size // max(1, segment_size)))))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors or state['downloaded'] < size:
+        if errors and isinstance(errors[0], RangesNotSupported) and not finished:
+            # The caller falls back to a plain download, there's nothing worth keeping
+            _remove(temp_dest, state_path)
+        if errors:
+            raise errors[0]
+        raise SegmentedDownloadError(f"Download ended early ({state['downloaded']}/{size} bytes)")
+
+    os.replace(temp_dest, dest)
+    _remove(state_path)
+    for hook in progress_hooks or []:
+        hook({'status': 'finished', 'filename': dest, 'downloaded_bytes': size, 'total_bytes': size})
+    return dest
@@ -0,0 +1,288 @@
+"""
+Local HTTP/JSON API for the download engine (server mode)
+
+Routes:
+    GET  /health                   -> {"status": "ok", "workers": int}
+    GET  /jobs                     -> list of jobs
+    POST /jobs                     -> submit {"url", "format", "quality", "priority", "weight", "rate_limit"}
+    GET  /jobs/<id>                -> job status including per-track state (404 once a finished
+                                      job expired, see DownloadEngine.keep_finished)
+    GET  /jobs/<id>/events         -> Server-Sent Events stream until the job ends
+    GET  /jobs/<id>/events?since=N&wait=S
+                                   -> JSON long-poll: events newer than N
+    POST /jobs/<id>/cancel         -> cancel the job, including the track in progress
+    POST /jobs/<id>/pause          -> pause the job
+    POST /jobs/<id>/resume         -> resume a paused job
+    GET  /resolvers                -> hit rate and latency of each track source
+    GET  /metrics                  -> Prometheus metrics (text format, see lib/metrics.py)
+    GET  /bandwidth                -> current rate limits
+    POST /bandwidth                -> change limits {"global": "2M", "schedule": ["09:00-18:00=500K"],
+                                      "jobs": {"<id>": "1M"}}; null/"0" removes a limit
+
+Only the standard library is used, so server mode needs nothing extra.
+"""
+
+import json
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from .bandwidth import parse_rate, parse_schedule_entry
+from .engine import DownloadEngine, Job
+from .metrics import CONTENT_TYPE
+from .transcode import CODECS
+
+
+class APIHandler(BaseHTTPRequestHandler):
+    """Request handler, the engine is reached through self.server.engine"""
+
+    server_version = "SpotifyDownloader"
+
+    ROUTES = [
+        ('GET', re.compile(r'^/health$'), 'health'),
+        ('GET', re.compile(r'^/jobs$'), 'list_jobs'),
+        ('POST', re.compile(r'^/jobs$'), 'submit_job'),
+        ('GET', re.compile(r'^/jobs/(?P<job_id>[0-9a-f]+)$'), 'get_job'),
+        ('GET', re.compile(r'^/jobs/(?P<job_id>[0-9a-f]+)/events$'), 'job_events'),
+        ('POST', re.compile(r'^/jobs/(?P<job_id>[0-9a-f]+)/cancel$'), 'cancel_job'),
+        ('POST', re.compile(r'^/jobs/(?P<job_id>[0-9a-f]+)/pause$'), 'pause_job'),
+        ('POST', re.compile(r'^/jobs/(?P<job_id>[0-9a-f]+)/resume$'), 'resume_job'),
+        ('GET', re.compile(r'^/resolvers$'), 'get_resolvers'),
+        ('GET', re.compile(r'^/metrics$'), 'get_metrics'),
+        ('GET', re.compile(r'^/bandwidth$'), 'get_bandwidth'),
+        ('POST', re.compile(r'^/bandwidth$'), 'set_bandwidth'),
+    ]
+
+    # ===== Plumbing =====
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def _dispatch(self, method):
+        parsed = urlparse(self.path)
+        self.query = parse_qs(parsed.query)
+        for route_method, pattern, handler in self.ROUTES:
+            match = pattern.match(parsed.path)
+            if match and route_method == method:
+                try:
+                    getattr(self, handler)(**match.groupdict())
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                return
+        self.send_json({'error': 'Not found'}, 404)
+
+    def log_message(self, format, *args):
+        # Keep the console for download progress
+        pass
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length).decode('utf-8'))
+        except ValueError:
+            return None
+
+    def query_value(self, name, default, cast=str):
+        try:
+            return cast(self.query[name][0])
+        except (KeyError, IndexError, ValueError):
+            return default
+
+    @property
+    def engine(self):
+        return self.server.engine
+
+    # ===== Routes =====
+
+    def health(self):
+        self.send_json({'status': 'ok', 'workers': self.engine.workers})
+
+    def list_jobs(self):
+        self.send_json({'jobs': [job.to_dict() for job in self.engine.list_jobs()]})
+
+    def submit_job(self):
+        data = self.read_json()
+        if not isinstance(data, dict) or not data.get('url'):
+            self.send_json({'error': "JSON body with a 'url' is required"}, 400)
+            return
+        try:
+            priority = int(data.get('priority', 0))
+            weight = float(data.get('weight', 1.0))
+            rate_limit = parse_rate(data.get('rate_limit'))
+        except (TypeError, ValueError):
+            self.send_json({'error': "'priority' must be an integer, 'weight' a number and 'rate_limit' a rate like 1M"}, 400)
+            return
+        if weight <= 0:
+            self.send_json({'error': "'weight' must be positive"}, 400)
+            return
+        # Checked here, otherwise every track is downloaded only to fail in the encoder
+        audio_format = str(data.get('format', 'mp3')).lower()
+        if audio_format not in CODECS:
+            self.send_json({'error': f"'format' must be one of: {', '.join(CODECS)}"}, 400)
+            return
+        quality = str(data.get('quality', 'auto')).lower()
+        if quality != 'auto' and not (quality.isdigit() and int(quality) > 0):
+            self.send_json({'error': "'quality' must be 'auto' or a bitrate in kbps like 320"}, 400)
+            return
+
+        job = self.engine.submit(
+            data['url'],
+            audio_format=audio_format,
+            quality=quality,
+            priority=priority,
+            weight=weight,
+            rate_limit=rate_limit,
+        )
+        self.send_json(job.to_dict(), 201)
+
+    def get_job(self, job_id):
+        job = self.engine.get(job_id)
+        if not job:
+            self.send_json({'error': 'Unknown or expired job'}, 404)
+            return
+        self.send_json(job.to_dict(include_tracks=True))
+
+    def cancel_job(self, job_id):
+        if not self.engine.get(job_id):
+            self.send_json({'error': 'Unknown job'}, 404)
+            return
+        cancelled = self.engine.cancel(job_id)
+        self.send_json({'cancelled': cancelled})
+
+    def pause_job(self, job_id):
+        if not self.engine.get(job_id):
+            self.send_json({'error': 'Unknown job'}, 404)
+            return
+        self.send_json({'paused': self.engine.pause(job_id)})
+
+    def resume_job(self, job_id):
+        if not self.engine.get(job_id):
+            self.send_json({'error': 'Unknown job'}, 404)
+            return
+        self.send_json({'resumed': self.engine.resume(job_id)})
+
+    def get_resolvers(self):
+        chain = self.engine.downloader.resolvers
+        self.send_json({'mode': chain.mode, 'resolvers': chain.stats()})
+
+    def get_metrics(self):
+        body = self.engine.downloader.metrics.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def get_bandwidth(self):
+        self.send_json(self.engine.bandwidth.to_dict())
+
+    def set_bandwidth(self):
+        data = self.read_json()
+        if not isinstance(data, dict):
+            self.send_json({'error': 'JSON object expected'}, 400)
+            return
+        bandwidth = self.engine.bandwidth
+        try:
+            if 'global' in data:
+                bandwidth.set_global_limit(parse_rate(data['global']))
+            if 'schedule' in data:
+                bandwidth.set_schedule([parse_schedule_entry(entry) for entry in data['schedule'] or []])
+            for job_id, rate in (data.get('jobs') or {}).items():
+                bandwidth.set_job_limit(job_id, parse_rate(rate))
+        except (TypeError, ValueError) as e:
+            self.send_json({'error': str(e)}, 400)
+            return
+        self.send_json(bandwidth.to_dict())
+
+    def job_events(self, job_id):
+        job = self.engine.get(job_id)
+        if not job:
+            self.send_json({'error': 'Unknown job'}, 404)
+            return
+
+        since = self.query_value('since', 0, int)
+
+        if 'text/event-stream' not in self.headers.get('Accept', '') and 'since' in self.query:
+            # Long-poll flavour for clients that can't do SSE
+            wait = min(self.query_value('wait', 15.0, float), 60.0)
+            events = self.engine.wait_events(job_id, since, timeout=wait)
+            self.send_json({
+                'state': job.state,
+                'events': [dict(event, seq=seq) for seq, event in events],
+                'last': events[-1][0] if events else since,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+
+        while True:
+            events = self.engine.wait_events(job_id, since, timeout=15.0)
+            if events:
+                for seq, event in events:
+                    self.wfile.write(f"id: {seq}\nevent: {event['kind']}\ndata: {json.dumps(event)}\n\n".encode('utf-8'))
+                since = events[-1][0]
+            else:
+                # Keep-alive comment so proxies don't drop the connection
+                self.wfile.write(b": ping\n\n")
+            self.wfile.flush()
+
+            if job.state in Job.FINAL_STATES and job.event_seq <= since:
+                self.wfile.write(f"event: end\ndata: {json.dumps(job.to_dict())}\n\n".encode('utf-8'))
+                self.wfile.flush()
+                return
+
+
+class DownloadServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer that carries the shared DownloadEngine"""
+
+    daemon_threads = True
+
+    def __init__(self, engine, host='127.0.0.1', port=8765):
+        """
+        Args:
+            engine (DownloadEngine): Engine that runs the submitted jobs
+            host (str): Interface to bind (default: localhost only)
+            port (int): Port to listen on (default: 8765)
+        """
+        self.engine = engine
+        super().__init__((host, port), APIHandler)
+
+
+def serve(downloader, host='127.0.0.1', port=8765, workers=4, small_jobs_first=False):
+    """
+    Run server mode until interrupted with Ctrl+C
+
+    Args:
+        downloader (SpotifyDownloader): The warm downloader every job shares
+        host (str): Interface to bind (default: '127.0.0.1')
+        port (int): Port to listen on (default: 8765)
+        workers (int): Concurrent downloads (default: 4)
+        small_jobs_first (bool): Serve jobs with the fewest remaining tracks first (default: False)
+    """
+    engine = DownloadEngine(downloader, workers=workers, small_jobs_first=small_jobs_first)
+    engine.start()
+    server = DownloadServer(engine, host, port)
+    downloader.print_success(f"Server listening on http://{host}:{port} with {workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        downloader.print_info("Shutting down...")
+    finally:
+        server.server_close()
+        engine.shutdown(wait=False)
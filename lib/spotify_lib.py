@@ -32,13 +32,32 @@ QUALITY FALLBACK:
 import yt_dlp
 import requests
 import re
-import sys
 import os
 import json
+import hashlib
+import threading
+import time
+import uuid
 import warnings
-from colorama import Fore, Style, init # This library is to make the console look nice and everything
+from concurrent.futures import ThreadPoolExecutor
+from colorama import init # This library is to make the console look nice and everything
 import urllib3
 
+from .progress import ProgressBus, ProgressEvent, ConsoleProgress, format_bar
+from .library import LibraryIndex, materialize
+from .scanner import LibraryScanner
+from .cancel import DownloadCancelled
+from .transcode import transcode, output_extension, is_lossless, pick_bitrates, TranscodeError
+from .resolvers import ResolverChain
+from .naming import OutputTemplate, DEFAULT_TEMPLATE, sanitize_name
+from .tagging import CoverCache, COVER_FORMATS, metadata_args, pick_cover
+from .errors import classify, RETRY_POLICIES, RetryBudget, NegativeCache, UnavailableError, EncoderError, LocalError
+from .manifest import build_manifest, write_manifest, read_manifest
+from .segmented import segmented_download, RangesNotSupported, DEFAULT_SEGMENT_SIZE
+from .profiling import Profiler
+from .metrics import DownloaderMetrics
+from .diskspace import DiskSpaceGuard, DEFAULT_MIN_FREE, SOURCE_KBPS, estimate_size, move_file
+
 
 # Suppress any useless console warnings
 warnings.filterwarnings("ignore")
@@ -52,16 +71,78 @@ class SpotifyDownloader:
     # Quality fallback order (highest to lowest)
     QUALITY_FALLBACK = ['320', '256', '192', '128', '96']
 
-    def __init__(self, download_dir='downloaded', auto_fallback=True):
+    # What each profiling phase covers (only used with profile=..., see lib/profiling.py)
+    PROFILE_PHASES = {
+        'spotify': ['get_tracks_from_url', 'get_playlist_name', 'fetch_tracks_if_changed', 'fetch_pages'],
+        'parse': ['parse_embed_page', 'enhanced_regex_extract', 'extract_tracks_from_json'],
+        'download': ['_fetch'],
+        'progress': ['progress_hook'],
+        'encode': ['_encode'],
+        'library': ['_finish_download', '_save_manifest'],
+    }
+
+    def __init__(self, download_dir='downloaded', auto_fallback=True, event_bus=None, console=True,
+                 cookie_browser=None, download_delay=0, use_library=True, link_duplicates=True,
+                 bandwidth=None, retry_budget=25, remember_failures=True, resolvers=None,
+                 tag_files=True, output_template=DEFAULT_TEMPLATE, write_manifests=True,
+                 connections=1, segment_size=DEFAULT_SEGMENT_SIZE, page_workers=8, profile=None,
+                 min_free_space=DEFAULT_MIN_FREE, scratch_dir=None):
         """
         Initialize SpotifyDownloader
 
         Args:
             download_dir (str): Directory to save downloads
             auto_fallback (bool): Automatically try lower quality if highest fails (default: True)
+            event_bus (ProgressBus): Bus to publish progress events on (default: a new one)
+            console (bool): Render events to the terminal (default: True)
+            cookie_browser (str): Browser to load YouTube cookies from, e.g. 'chrome' (default: None)
+            download_delay (float): Seconds to wait between tracks of a playlist (default: 0)
+            use_library (bool): Keep a library index to skip songs already downloaded (default: True)
+            link_duplicates (bool): Hardlink songs we already have into new playlist folders
+                instead of downloading them again (default: True)
+            bandwidth (BandwidthManager): Shared download rate limits, adjustable at runtime
+                (default: None, unlimited)
+            retry_budget (int): Retries one playlist/job may spend in total, None for no
+                limit (default: 25)
+            remember_failures (bool): Skip tracks that failed permanently (removed, blocked)
+                in an earlier run (default: True)
+            resolvers (ResolverChain): Sources tried for each track and in what order
+                (default: YouTube, YouTube Music, normalized YouTube query, SoundCloud, in order)
+            tag_files (bool): Write Spotify metadata and cover art into the files (default: True)
+            output_template (str): Where files go and how they are named, relative to
+                download_dir, e.g. '{artist}/{album}/{nn} - {title}.{ext}'
+                (default: '{playlist}/{artist} - {title}.{ext}', see lib/naming.py)
+            write_manifests (bool): Write an M3U8 and a JSON manifest after every playlist,
+                see lib/manifest.py (default: True)
+            connections (int): Connections used to fetch each file; above 1 a file is pulled
+                in byte range segments in parallel, see lib/segmented.py (default: 1)
+            segment_size (int): Bytes per segment when connections > 1 (default: 4 MiB)
+            page_workers (int): Spotify pages fetched at once when an artist is expanded
+                into its releases (default: 8)
+            profile (str): Profile every phase of the run (Spotify, parsing, search, download,
+                progress, encode, library) and write the reports to this folder with
+                write_profile(), see lib/profiling.py (default: None, no profiling)
+            min_free_space (int): Bytes to keep free; tracks reserve their estimated size before
+                they start and wait while there isn't enough, failing after a while with a disk
+                space error, see lib/diskspace.py (default: 0, no reservations)
+            scratch_dir (str): Folder for raw downloads and encodes in progress, e.g. a tmpfs;
+                finished files are moved into download_dir (default: None, next to the file)
         """
         self.download_dir = download_dir
         self.auto_fallback = auto_fallback
+        self.cookie_browser = cookie_browser
+        self.download_delay = download_delay
+        self.bandwidth = bandwidth
+        self.retry_budget = retry_budget
+        self.connections = max(1, int(connections))
+        self.segment_size = segment_size
+        self.page_workers = max(1, int(page_workers))
+        self.resolvers = resolvers or ResolverChain()
+        self.events = event_bus or ProgressBus()
+        # Counters, gauges and latency histograms for monitoring, see lib/metrics.py
+        self.metrics = DownloaderMetrics(self.events)
+        if console:
+            self.events.subscribe(ConsoleProgress())
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
@@ -69,37 +150,90 @@ class SpotifyDownloader:
             'Accept-Language': 'en-US,en;q=0.5',
             'Connection': 'keep-alive'
         })
+        # Enough pooled connections for every page worker to keep its own alive
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(10, self.page_workers))
+        self.session.mount('https://', adapter)
 
         # Create download directory if not already created
         if not os.path.exists(self.download_dir):
             os.makedirs(self.download_dir)
             self.print_success(f"Created '{self.download_dir}' directory")
 
+        # Everything we have downloaded so far, and Spotify ids found while extracting
+        self.link_duplicates = link_duplicates
+        self.library = LibraryIndex(self.download_dir) if use_library else None
+        self.track_ids = {}
+        self.track_meta = {}
+        # Where each track was downloaded from ({'url', 'resolver', 'title', 'duration'})
+        self.track_sources = {}
+        # How each track was encoded ({'format', 'bitrate', 'requested', 'source_abr', 'source_codec'})
+        self.track_encodes = {}
+        self.write_manifests = write_manifests
+        self.scanner = LibraryScanner(self.download_dir)
+        failures_path = os.path.join(self.download_dir, '.cache', 'failures.json')
+        self.failures = NegativeCache(failures_path) if remember_failures else None
+        self.tag_files = tag_files
+        self.output_template = OutputTemplate(output_template) if isinstance(output_template, str) else output_template
+        self._claimed_paths = {}
+        # Targets being downloaded right now -> Event set once they're written
+        self._writing = {}
+        self._claim_lock = threading.Lock()
+        self.covers = CoverCache(os.path.join(self.download_dir, '.cache', 'covers'), self.session)
+        self.disk = DiskSpaceGuard(min_free_space)
+        self.scratch_dir = scratch_dir
+        if scratch_dir:
+            os.makedirs(scratch_dir, exist_ok=True)
+
+        # Only a profiled downloader gets its methods wrapped, so profiling off costs nothing
+        self.profiler = None
+        if profile:
+            self.profiler = Profiler(profile)
+            self.profiler.instrument(self, self.PROFILE_PHASES)
+            self.profiler.instrument(self.events, {'progress': ['publish']})
+            for resolver in self.resolvers.resolvers:
+                self.profiler.instrument(resolver, {'search': ['search']})
+
+    def write_profile(self):
+        """
+        Stop profiling and write the reports (does nothing without profile=...)
+
+        Returns:
+            str: Folder the reports were written to, or None
+        """
+        if self.profiler is None:
+            return None
+        run_dir = self.profiler.write()
+        for line in self.profiler.summary():
+            self.print_info(line)
+        return run_dir
+
     # ===== Console Output Methods =====
     # These functions are used throughout the code for many different things
-    # Its mainly for the overall look and design.
+    # They publish LOG events, the subscribed front ends decide how to show them.
+
+    def emit(self, kind, **kwargs):
+        """Publish a ProgressEvent on this downloader's event bus"""
+        self.events.publish(ProgressEvent(kind, **kwargs))
 
     def print_success(self, message):
         """Print success message"""
-        print(f"{Fore.GREEN}{Style.BRIGHT}✓ {message}")
+        self.emit(ProgressEvent.LOG, message=message, level='success')
 
     def print_error(self, message):
         """Print error message"""
-        print(f"{Fore.RED}{Style.BRIGHT}✗ {message}")
+        self.emit(ProgressEvent.LOG, message=message, level='error')
 
     def print_warning(self, message):
         """Print warning message"""
-        print(f"{Fore.YELLOW}{Style.BRIGHT}⚠ {message}")
+        self.emit(ProgressEvent.LOG, message=message, level='warning')
 
     def print_info(self, message):
         """Print info message"""
-        print(f"{Fore.CYAN}{Style.BRIGHT}• {message}")
+        self.emit(ProgressEvent.LOG, message=message, level='info')
 
     def print_progress_bar(self, percentage, width=40):
         """Just a single progress bar used for downloading"""
-        filled = int(width * percentage / 100)
-        bar = '█' * filled + '░' * (width - filled)
-        return f"{Fore.GREEN}{bar}{Fore.WHITE} {percentage:.1f}%"
+        return format_bar(percentage, width)
 
     # ===== URL Validation =====
     # Anytime a url is parsed, this function will be called
@@ -125,13 +259,13 @@ class SpotifyDownloader:
             self.print_error("URL must be a Spotify URL (must contain 'spotify.com')")
             return False
 
-        # Check if it matches the pattern for track/album/playlist
-        pattern = r'spotify\.com/(track|album|playlist)/([a-zA-Z0-9]+)'
+        # Check if it matches the pattern for track/album/playlist/artist
+        pattern = r'spotify\.com/(track|album|playlist|artist)/([a-zA-Z0-9]+)'
         match = re.search(pattern, url)
 
         if not match:
             self.print_error("Invalid Spotify URL format")
-            self.print_info("Expected format: https://open.spotify.com/[track|album|playlist]/ID")
+            self.print_info("Expected format: https://open.spotify.com/[track|album|playlist|artist]/ID")
             return False
 
         content_type = match.group(1)
@@ -152,7 +286,7 @@ class SpotifyDownloader:
             tuple: (content_type, spotify_id) or (None, None) if invalid
         """
         url = url.split('?')[0]
-        pattern = r'spotify\.com/(track|album|playlist)/([a-zA-Z0-9]+)'
+        pattern = r'spotify\.com/(track|album|playlist|artist)/([a-zA-Z0-9]+)'
         match = re.search(pattern, url)
         if match:
             return match.group(1), match.group(2)
@@ -163,7 +297,7 @@ class SpotifyDownloader:
         fetches track list from Spotify URL
 
         Args:
-            url (str): Spotify URL (track, album, or playlist)
+            url (str): Spotify URL (track, album, playlist or artist)
 
         Returns:
             list: List of track strings in "Artist - Title" format
@@ -180,6 +314,9 @@ class SpotifyDownloader:
             self.print_error("Invalid Spotify URL format")
             return tracks
 
+        if content_type == 'artist':
+            return self.get_artist_tracks(spotify_id)
+
         # Try multiple extraction methods
         approaches = [
             ("oEmbed API", self.try_oembed_api),
@@ -197,11 +334,7 @@ class SpotifyDownloader:
                 # Silently continue to next method
                 continue
 
-        # For playlists/albums with many tracks, skip the first one (usually metadata)
-        if len(tracks) > 10 and (content_type == 'playlist' or content_type == 'album'):
-            tracks = tracks[1:]
-
-        return tracks
+        return self._trim_tracks(tracks, content_type)
 
     def try_oembed_api(self, content_type, spotify_id, url):
         """Try Spotify's oEmbed API"""
@@ -228,36 +361,98 @@ class SpotifyDownloader:
             response = self.session.get(embed_url)
 
             if response.status_code == 200:
-                html = response.text
-
-                # Look for JSON data in script tags
-                json_patterns = [
-                    r'window\.__INITIAL_STATE__\s*=\s*({.*?});',
-                    r'window\.__PRELOADED_STATE__\s*=\s*({.*?});',
-                    r'window\.Spotify\s*=\s*({.*?});',
-                    r'__NEXT_DATA__"\s*type="application/json">({.*?})</script>',
-                ]
-
-                for pattern in json_patterns:
-                    matches = re.findall(pattern, html, re.DOTALL)
-                    for match in matches:
-                        try:
-                            data = json.loads(match)
-                            extracted = self.extract_tracks_from_json(data)
-                            if extracted:
-                                tracks.extend(extracted)
-                        except:
-                            continue
-
-                # Fallback to regex extraction
-                if not tracks:
-                    tracks = self.enhanced_regex_extract(html)
+                tracks = self.parse_embed_page(response.text)
 
         except Exception as e:
             self.print_error(f"Embed page error: {e}")
 
         return tracks
 
+    def parse_embed_page(self, html):
+        """Extract tracks from the HTML of an embed page"""
+        tracks = []
+
+        # Look for JSON data in script tags
+        json_patterns = [
+            r'window\.__INITIAL_STATE__\s*=\s*({.*?});',
+            r'window\.__PRELOADED_STATE__\s*=\s*({.*?});',
+            r'window\.Spotify\s*=\s*({.*?});',
+            r'__NEXT_DATA__"\s*type="application/json">({.*?})</script>',
+        ]
+
+        for pattern in json_patterns:
+            matches = re.findall(pattern, html, re.DOTALL)
+            for match in matches:
+                try:
+                    data = json.loads(match)
+                    extracted = self.extract_tracks_from_json(data)
+                    if extracted:
+                        tracks.extend(extracted)
+                except:
+                    continue
+
+        # Fallback to regex extraction
+        if not tracks:
+            tracks = self.enhanced_regex_extract(html)
+
+        return tracks
+
+    def fetch_tracks_if_changed(self, url, etag=None, last_modified=None):
+        """
+        Conditional GET of the track list, for watch mode
+
+        Asks for the embed page with If-None-Match/If-Modified-Since, so
+        when nothing changed Spotify can answer with an empty 304. If the
+        embed page can't be parsed, falls back to get_tracks_from_url.
+
+        Args:
+            url (str): Spotify URL (album or playlist)
+            etag (str): ETag of the last answer (default: None)
+            last_modified (str): Last-Modified of the last answer (default: None)
+
+        Returns:
+            tuple: (tracks, validators) - tracks is None if the page is unchanged,
+                validators is {'etag': str, 'last_modified': str} for the next check
+
+        Raises:
+            requests.RequestException: If Spotify can't be reached
+        """
+        content_type, spotify_id = self.extract_spotify_id(url)
+        validators = {'etag': etag, 'last_modified': last_modified}
+        if not content_type or not spotify_id:
+            self.print_error("Invalid Spotify URL format")
+            return [], validators
+        if content_type == 'artist':
+            # Spread over many pages, no single page to ask about
+            return self.get_artist_tracks(spotify_id), {'etag': None, 'last_modified': None}
+
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        embed_url = f"https://open.spotify.com/embed/{content_type}/{spotify_id}"
+        response = self.session.get(embed_url, headers=headers, timeout=30)
+        if response.status_code == 304:
+            return None, validators
+
+        tracks = []
+        if response.status_code == 200:
+            validators = {'etag': response.headers.get('ETag'),
+                          'last_modified': response.headers.get('Last-Modified')}
+            tracks = self._trim_tracks(self.parse_embed_page(response.text), content_type)
+        if not tracks:
+            # Embed page changed or failed: do it the slow way, without validators
+            tracks = self.get_tracks_from_url(url)
+            validators = {'etag': None, 'last_modified': None}
+        return tracks, validators
+
+    def _trim_tracks(self, tracks, content_type):
+        # For playlists/albums with many tracks, skip the first one (usually metadata)
+        if len(tracks) > 10 and (content_type == 'playlist' or content_type == 'album'):
+            return tracks[1:]
+        return tracks
+
     def try_direct_page(self, content_type, spotify_id, url):
         """Try the direct Spotify page"""
         tracks = []
@@ -323,36 +518,86 @@ class SpotifyDownloader:
         return unique_tracks
 
     def extract_tracks_from_json(self, data):
-        """Recursively extract tracks from JSON data"""
+        """Recursively extract tracks (and their metadata, for tagging) from JSON data"""
         tracks = []
 
-        def recursive_search(obj):
+        def add_track(artist_names, track_name, obj, context):
+            track = f"{artist_names[0]} - {track_name}"
+            if track in tracks:
+                return
+            tracks.append(track)
+            # Remember the Spotify id so the library can match on it
+            uri = obj.get('uri', '')
+            spotify_id = None
+            if isinstance(uri, str) and uri.startswith('spotify:track:'):
+                spotify_id = uri.split(':')[-1]
+                self.track_ids[track] = spotify_id
+
+            album = obj.get('album') if isinstance(obj.get('album'), dict) else {}
+            external_ids = obj.get('externalIds') or obj.get('external_ids') or {}
+            release = obj.get('releaseDate') or album.get('release_date') or context.get('release_date')
+            if isinstance(release, dict):
+                release = release.get('isoString')
+            context['position'] = context.get('position', 0) + 1
+            self.track_meta[track] = {
+                'title': track_name,
+                'artists': artist_names,
+                'album': album.get('name') or context.get('album'),
+                'track_number': (obj.get('trackNumber') or obj.get('track_number')
+                                 or (context['position'] if context.get('album') else None)),
+                'disc_number': obj.get('discNumber') or obj.get('disc_number'),
+                'isrc': obj.get('isrc') or (external_ids.get('isrc') if isinstance(external_ids, dict) else None),
+                'release_date': release if isinstance(release, str) else None,
+                'cover_url': pick_cover(obj) or context.get('cover_url'),
+                'spotify_id': spotify_id,
+                'duration_ms': obj.get('duration') or obj.get('duration_ms'),
+            }
+
+        def recursive_search(obj, context):
             if isinstance(obj, dict):
+                # Tracks of an album page share its name and cover, which they don't repeat
+                if obj.get('type') == 'album' and isinstance(obj.get('trackList') or obj.get('tracks'), (list, dict)):
+                    release = obj.get('releaseDate')
+                    context = {
+                        'album': obj.get('name') or obj.get('title'),
+                        'cover_url': pick_cover(obj),
+                        'release_date': release.get('isoString') if isinstance(release, dict) else release,
+                    }
+
                 # Look for track patterns
                 if 'name' in obj and 'artists' in obj:
                     track_name = obj.get('name', '').strip()
                     artists = obj.get('artists', [])
                     if isinstance(artists, list) and len(artists) > 0:
-                        artist_name = ''
-                        if isinstance(artists[0], dict):
-                            artist_name = artists[0].get('name', '').strip()
-                        elif isinstance(artists[0], str):
-                            artist_name = artists[0].strip()
-
-                        if track_name and artist_name:
-                            track = f"{artist_name} - {track_name}"
-                            if track not in tracks:
-                                tracks.append(track)
+                        artist_names = []
+                        for artist in artists:
+                            if isinstance(artist, dict):
+                                artist_names.append(artist.get('name', '').strip())
+                            elif isinstance(artist, str):
+                                artist_names.append(artist.strip())
+                        artist_names = [name for name in artist_names if name]
+
+                        if track_name and artist_names:
+                            add_track(artist_names, track_name, obj, context)
+
+                # Embed page track lists: {'uri', 'title', 'subtitle': 'Artist 1, Artist 2'}
+                elif ('title' in obj and isinstance(obj.get('subtitle'), str)
+                      and str(obj.get('uri', '')).startswith('spotify:track:')):
+                    track_name = str(obj.get('title', '')).strip()
+                    artist_names = [name.strip() for name in obj['subtitle'].replace('\xa0', ' ').split(',')
+                                    if name.strip()]
+                    if track_name and artist_names:
+                        add_track(artist_names, track_name, obj, context)
 
                 # Continue recursive search
                 for value in obj.values():
-                    recursive_search(value)
+                    recursive_search(value, context)
 
             elif isinstance(obj, list):
                 for item in obj:
-                    recursive_search(item)
+                    recursive_search(item, context)
 
-        recursive_search(data)
+        recursive_search(data, {})
         return tracks
 
     def sanitize_folder_name(self, name):
@@ -365,17 +610,8 @@ class SpotifyDownloader:
         Returns:
             str: Sanitized folder name safe for filesystem
         """
-        # Remove invalid characters for Windows/Mac/Linux
-        invalid_chars = r'[<>:"/\\|?*]'
-        sanitized = re.sub(invalid_chars, '', name)
-        # Remove leading/trailing spaces and dots
-        sanitized = sanitized.strip('. ')
-        # Replace multiple spaces with single space
-        sanitized = re.sub(r'\s+', ' ', sanitized)
-        # Limit length to 100 characters
-        if len(sanitized) > 100:
-            sanitized = sanitized[:100].strip()
-        return sanitized if sanitized else 'Unknown'
+        # Same rules as the output templates use for every path component
+        return sanitize_name(name) or 'Unknown'
 
     def get_playlist_name(self, url):
         """
@@ -392,8 +628,8 @@ class SpotifyDownloader:
         if not content_type or not spotify_id:
             return None
 
-        # Only get names for playlists and albums
-        if content_type not in ['playlist', 'album']:
+        # Only get names for playlists, albums and artists
+        if content_type not in ['playlist', 'album', 'artist']:
             return None
 
         name = None
@@ -440,35 +676,207 @@ class SpotifyDownloader:
 
         # Add prefix based on content type
         if name:
-            prefix = "Playlist" if content_type == "playlist" else "Album"
+            prefix = {'playlist': "Playlist", 'album': "Album", 'artist': "Artist"}[content_type]
             return f"{prefix} - {name}"
 
         return None
 
+    # ===== Artists =====
+
+    def get_artist_release_ids(self, spotify_id):
+        """
+        Album and single ids of an artist, in the order the artist pages list them
+
+        There is no track list for an artist, only pages linking to its
+        releases: the discography, the artist page and its embed.
+        """
+        pages = [
+            f"https://open.spotify.com/artist/{spotify_id}/discography/all",
+            f"https://open.spotify.com/artist/{spotify_id}",
+            f"https://open.spotify.com/embed/artist/{spotify_id}",
+        ]
+        release_ids = []
+        for _, html, _ in self.fetch_pages(pages, label="artist pages"):
+            for release_id in re.findall(r'(?:spotify:album:|/album/)([a-zA-Z0-9]{22})', html or ''):
+                if release_id not in release_ids:
+                    release_ids.append(release_id)
+        return release_ids
+
+    def get_artist_tracks(self, spotify_id):
+        """
+        Every track of an artist's albums and singles, each song once
+
+        The release embed pages are fetched in parallel. A song that is on
+        several releases (single, then album) is kept once, with the
+        metadata of the biggest release it is on.
+
+        Args:
+            spotify_id (str): Spotify artist id
+
+        Returns:
+            list: Track strings in "Artist - Title" format
+        """
+        release_ids = self.get_artist_release_ids(spotify_id)
+        if not release_ids:
+            self.print_error("No releases found for this artist")
+            return []
+        self.print_info(f"Found {len(release_ids)} releases")
+
+        urls = [f"https://open.spotify.com/embed/album/{release_id}" for release_id in release_ids]
+        releases = []
+        for _, html, _ in self.fetch_pages(urls, label="releases"):
+            # Parsed one at a time, extraction fills the shared id and metadata maps
+            if html:
+                tracks = self._trim_tracks(self.parse_embed_page(html), 'album')
+                releases.append((tracks, {track: (self.track_ids.get(track), self.track_meta.get(track))
+                                          for track in tracks}))
+
+        tracks, seen, duplicates = [], set(), 0
+        for release_tracks, info in sorted(releases, key=lambda release: -len(release[0])):
+            for track in release_tracks:
+                key = LibraryIndex.track_key(track)
+                if key in seen:
+                    duplicates += 1
+                    continue
+                seen.add(key)
+                tracks.append(track)
+                track_id, meta = info[track]
+                if track_id:
+                    self.track_ids[track] = track_id
+                if meta:
+                    self.track_meta[track] = meta
+
+        self.print_success(f"Found {len(tracks)} tracks ({duplicates} duplicates across releases skipped)")
+        return tracks
+
+    def fetch_pages(self, urls, label="pages"):
+        """
+        GET several pages at once over the shared session
+
+        Up to page_workers requests are in flight, each on its own pooled
+        connection. The fan-out and timings are reported once all are done.
+
+        Args:
+            urls (list): Page URLs
+            label (str): What the pages are, for the report
+
+        Returns:
+            list: (url, html or None if it failed, seconds) in the order of `urls`
+        """
+        if not urls:
+            return []
+
+        def fetch(url):
+            start = time.monotonic()
+            try:
+                response = self.session.get(url, timeout=15)
+                html = response.text if response.status_code == 200 else None
+            except requests.RequestException:
+                html = None
+            return url, html, time.monotonic() - start
+
+        workers = min(self.page_workers, len(urls))
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='page') as executor:
+            results = list(executor.map(fetch, urls))
+        elapsed = time.monotonic() - start
+
+        fetched = sum(1 for _, html, _ in results if html is not None)
+        busy = sum(seconds for _, _, seconds in results)
+        self.print_info(f"Fetched {fetched}/{len(urls)} {label} over {workers} connections in {elapsed:.1f}s "
+                        f"({busy:.1f}s of requests, slowest {max(seconds for _, _, seconds in results):.1f}s)")
+        return results
+
     # ===== Download Methods =====
 
-    def progress_hook(self, d):
-        """Progress bar for yt-dlp downloads"""
+    def progress_hook(self, d, job_id=None, track=None, fetched=None, token=None):
+        """
+        Publish yt-dlp download progress as ProgressEvents
+
+        yt-dlp calls this on the download thread after every block it reads,
+        which is also where bandwidth limits are enforced.
+
+        Args:
+            d (dict): yt-dlp progress dict
+            job_id (str): Job of the download
+            track (str): Track query of the download
+            fetched (dict): Per-download {filename: bytes already charged} used for shaping
+            token (CancelToken): Raises out of yt-dlp when cancelled, blocks while paused
+        """
+        if token is not None:
+            token.check()
+
         if d['status'] == 'downloading':
-            try:
-                percent_str = d.get('_percent_str', '0.0%').replace('%', '')
-                percent = float(percent_str) if percent_str.replace('.', '').isdigit() else 0
-                speed = d.get('_speed_str', 'N/A')
-                eta = d.get('_eta_str', 'N/A')
-
-                progress_bar = self.print_progress_bar(percent, 30)
-                sys.stdout.write(
-                    f"\r{Fore.CYAN}Downloading {progress_bar} {Fore.MAGENTA}| {Fore.GREEN}{speed} {Fore.MAGENTA}| {Fore.YELLOW}{eta}     "
-                )
-                sys.stdout.flush()
-            except:
-                sys.stdout.write(f"\r{Fore.CYAN}Downloading...     ")
-                sys.stdout.flush()
+            if self.bandwidth is not None and fetched is not None:
+                downloaded = d.get('downloaded_bytes') or 0
+                key = d.get('tmpfilename') or d.get('filename')
+                self.bandwidth.throttle(job_id, downloaded - fetched.get(key, 0))
+                fetched[key] = downloaded
+
+            self.emit(
+                ProgressEvent.DOWNLOAD_PROGRESS,
+                job_id=job_id,
+                track=track,
+                downloaded_bytes=d.get('downloaded_bytes'),
+                total_bytes=d.get('total_bytes') or d.get('total_bytes_estimate'),
+                speed=d.get('speed'),
+                eta=d.get('eta'),
+            )
         elif d['status'] == 'finished':
             filename = os.path.basename(d['filename'])
-            print(f"\n{Fore.GREEN}{Style.BRIGHT}✓ Completed: {Fore.WHITE}{filename}")
+            self.emit(
+                ProgressEvent.DOWNLOAD_FINISHED,
+                job_id=job_id,
+                track=track,
+                downloaded_bytes=d.get('downloaded_bytes') or d.get('total_bytes'),
+                total_bytes=d.get('total_bytes'),
+                message=filename,
+            )
+
+    def output_path(self, query, audio_format='mp3', playlist=None, index=None, template=None):
+        """
+        Final path of a track, known before anything is downloaded
 
-    def download_track(self, query, audio_format='mp3', quality='auto', subfolder=None):
+        The path only depends on the track's metadata, so checking whether we
+        already have it is a single stat. If two different tracks would get the
+        same path (e.g. 'Song?' and 'Song'), the second one gets its Spotify id
+        appended, which is stable between runs too.
+
+        Args:
+            query (str): Track string in "Artist - Title" format
+            audio_format (str): Output audio format (default: 'mp3')
+            playlist (str): Playlist/album folder name (default: None, single track)
+            index (int): Position in the playlist (default: None)
+            template (OutputTemplate): Override the downloader's template (default: None)
+
+        Returns:
+            str: Path inside download_dir
+        """
+        template = template or self.output_template
+        fields = template.fields(query, output_extension(audio_format), self.track_meta.get(query),
+                                 playlist, index)
+        key = LibraryIndex.track_key(query)
+
+        with self._claim_lock:
+            path = os.path.join(self.download_dir, *template.render(fields).split('/'))
+            owner = self._path_owner(path)
+            if owner is not None and owner != key:
+                path = os.path.join(self.download_dir,
+                                    *template.render(fields, suffix=f" [{fields['id'][:8]}]").split('/'))
+            # Case-insensitive filesystems: 'Song.mp3' and 'song.mp3' are the same file
+            self._claimed_paths[os.path.normcase(path).lower()] = key
+        return path
+
+    def _path_owner(self, path):
+        """Track key a path belongs to (claimed this run, or indexed in the library)"""
+        owner = self._claimed_paths.get(os.path.normcase(path).lower())
+        if owner is None and self.library and os.path.exists(path):
+            owner = self.library.owner(path)
+        return owner
+
+    def download_track(self, query, audio_format='mp3', quality='auto', subfolder=None,
+                       job_id=None, index=None, total=None, token=None, budget=None,
+                       template=None, source=None):
         """
         Download a single track from YouTube with automatic quality fallback
 
@@ -477,151 +885,888 @@ class SpotifyDownloader:
             audio_format (str): Output audio format (default: 'mp3')
             quality (str): Audio quality in kbps or 'auto' for best available (default: 'auto')
             subfolder (str): Optional subfolder name within download_dir (default: None)
+            job_id (str): Job this track belongs to, used to tag progress events (default: None)
+            index (int): 1-based position of the track in its job (default: None)
+            total (int): Number of tracks in the job (default: None)
+            token (CancelToken): Cancels or pauses the search, download and encode (default: None)
+            budget (RetryBudget): Retries shared with the rest of the job (default: None, only
+                the per error class limits apply)
+            template (OutputTemplate): Override the output template for this track (default: None)
+            source (dict): Download this source ({'url', 'resolver'}, e.g. from a manifest)
+                instead of searching for the track (default: None)
 
         Returns:
             bool: True if successful, False otherwise
         """
-        print(f"{Fore.CYAN}Searching for: {Fore.WHITE}'{query}'")
+        return self.download_track_file(query, audio_format, quality, subfolder, job_id=job_id, index=index,
+                                        total=total, token=token, budget=budget, template=template,
+                                        source=source) is not None
+
+    def download_track_file(self, query, audio_format='mp3', quality='auto', subfolder=None,
+                            job_id=None, index=None, total=None, token=None, budget=None,
+                            template=None, source=None):
+        """
+        Same as download_track, but returns where the file ended up
+
+        Returns:
+            str: Path of the audio file, or None if the download failed or was cancelled
+        """
+        self.emit(ProgressEvent.TRACK_STARTED, job_id=job_id, track=query, index=index, total=total)
 
-        # Determine download directory
-        if subfolder:
-            download_path = os.path.join(self.download_dir, subfolder)
-            # Create subfolder if it doesn't exist
-            if not os.path.exists(download_path):
-                os.makedirs(download_path)
+        path, cancelled, error = None, False, None
+        try:
+            path = self._download_track(query, audio_format, quality, subfolder, job_id, token, budget,
+                                        index, template, source)
+        except DownloadCancelled:
+            self.print_warning(f"Cancelled: {query}")
+            cancelled = True
+        except Exception as e:
+            error = classify(e)
+            self._report_failure(query, error)
+
+        kind = ProgressEvent.TRACK_DONE if path else ProgressEvent.TRACK_FAILED
+        data = {'path': path, 'cancelled': cancelled}
+        if error is not None:
+            data['error'] = error.kind
+        self.emit(kind, job_id=job_id, track=query, index=index, total=total, data=data)
+        return path
+
+    def _report_failure(self, query, error):
+        """Print a failed track and remember it if retrying can never help"""
+        spotify_id = self.track_ids.get(query)
+        # Don't refresh the expiry of a failure we only just read back from the cache
+        if error.permanent and self.failures is not None and not self.failures.get(query, spotify_id):
+            self.failures.add(query, spotify_id, error)
+
+        message = str(error).replace('ERROR: ', '')[:80]
+        if error.kind == 'blocked':
+            self.print_error("Skipped: Age-restricted or region-blocked video")
+        elif error.kind == 'unavailable':
+            self.print_error(f"Not available: {message}")
         else:
-            download_path = self.download_dir
+            self.print_error(f"Download failed ({error.kind}): {message}...")
+
+    def _with_retries(self, action, token=None, budget=None):
+        """
+        Run `action()` and retry it according to the policy of whatever it raises
+
+        Args:
+            action (callable): Work to do, e.g. a search or a download
+            token (CancelToken): Backoff sleeps end early when cancelled
+            budget (RetryBudget): Job-wide retry budget
+
+        Returns:
+            The result of action()
+
+        Raises:
+            TrackError: Once the error class or the budget allows no more retries
+            DownloadCancelled: If cancelled
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return action()
+            except DownloadCancelled:
+                raise
+            except Exception as e:
+                error = classify(e)
+                policy = RETRY_POLICIES.get(error.kind)
+                if policy is None or attempt >= policy.attempts:
+                    raise error
+                if budget is not None and not budget.take():
+                    self.print_warning("Retry budget for this job is used up")
+                    raise error
+
+                delay = policy.delay(attempt)
+                self.metrics.retries.inc(kind=error.kind)
+                self.print_warning(f"{error.kind.capitalize()} error, retrying in {delay:.0f}s "
+                                   f"({attempt}/{policy.attempts - 1})")
+                if token is not None:
+                    if token.wait(delay):
+                        raise DownloadCancelled()
+                else:
+                    time.sleep(delay)
+
+    def _download_track(self, query, audio_format, quality, subfolder, job_id, token=None, budget=None,
+                        index=None, template=None, source=None):
+        """
+        Search, download and convert one track
+
+        With a known `source` the search is skipped and only that URL is tried.
+
+        Returns:
+            str: Path of the audio file
+
+        Raises:
+            TrackError: Classified failure, after the retries its class allows
+            DownloadCancelled: If the token was cancelled
+        """
+        # The final path comes from Spotify metadata, not from whatever video we end up with
+        target = self.output_path(query, audio_format, subfolder, index, template)
+
+        # Jobs running at once can resolve to the same file (the same track in two jobs) and
+        # would share its temp files; the second one waits and then finds the finished file
+        writing = self._start_writing(target, query, token)
+        try:
+            return self._download_to(target, query, audio_format, quality, job_id, token, budget, source)
+        finally:
+            self._done_writing(target, writing)
+
+    def _start_writing(self, target, query, token=None):
+        """
+        Claim `target` for this thread, waiting while another download writes it
+
+        Returns:
+            threading.Event: Pass to _done_writing() once the file is written (or failed)
+
+        Raises:
+            DownloadCancelled: If the token was cancelled while waiting
+        """
+        key = os.path.normcase(target).lower()
+        waited = False
+        while True:
+            with self._claim_lock:
+                writer = self._writing.get(key)
+                if writer is None:
+                    writing = self._writing[key] = threading.Event()
+                    return writing
+            if not waited:
+                self.print_info(f"Waiting for another download of {query}...")
+                waited = True
+            while not writer.wait(1.0):
+                if token is not None:
+                    token.check()
+
+    def _done_writing(self, target, writing):
+        with self._claim_lock:
+            self._writing.pop(os.path.normcase(target).lower(), None)
+        writing.set()
+
+    def _download_to(self, target, query, audio_format, quality, job_id, token=None, budget=None, source=None):
+        """Download `query` to `target` unless it's already there, see _download_track"""
+        download_path = os.path.dirname(target)
+        os.makedirs(download_path, exist_ok=True)
+        spotify_id = self.track_ids.get(query)
+
+        if os.path.exists(target):
+            self.print_info(f"Already downloaded: {os.path.basename(target)}")
+            self.metrics.cache_hits.inc(cache='target')
+            if self.library and self.library.owner(target) is None:
+                self.library.add(target, query, spotify_id)
+            return target
+
+        # Already downloaded somewhere else in the library?
+        if self.library:
+            existing = self.library.lookup(query, spotify_id, output_extension(audio_format))
+            if existing:
+                self.metrics.cache_hits.inc(cache='library')
+                if os.path.dirname(os.path.abspath(existing)) == os.path.abspath(download_path):
+                    self.print_info(f"Already downloaded: {os.path.basename(existing)}")
+                    return existing
+                if self.link_duplicates:
+                    linked = self.library.link_into(existing, download_path, name=os.path.basename(target))
+                    self.print_success(f"Linked existing file: {os.path.basename(existing)}")
+                    return linked
+
+        # Failed for good in an earlier run?
+        if self.failures is not None:
+            failure = self.failures.get(query, spotify_id)
+            if failure:
+                self.metrics.cache_hits.inc(cache='failures')
+                raise UnavailableError(f"Skipped, failed before ({failure['kind']}): {failure['message']}")
+
+        quality_levels = self._quality_levels(quality)
+        work_base = self._work_base(target)
+        fetched = {}
+
+        # Hold the space this track will take until it's written (waits while the disk is full)
+        with self._reserve_space(query, audio_format, quality_levels, target, work_base, token):
+
+            def check_cancelled(info, *args, **kwargs):
+                # yt-dlp calls the match filter during extraction, a good spot to stop early
+                if token is not None:
+                    token.check()
+                return None
+
+            if token is not None:
+                token.check()
+
+            # yt-dlp only fetches the raw stream, ffmpeg runs in transcode() so it can be killed
+            ydl_opts = {
+                "format": "bestaudio/best",
+                # Raw stream next to the target (or in the scratch dir); '%' is special in yt-dlp templates
+                "outtmpl": work_base.replace('%', '%%') + '.source.%(ext)s',
+                "noplaylist": True,
+                "progress_hooks": [lambda d: self.progress_hook(d, job_id, query, fetched, token)],
+                "match_filter": check_cancelled,
+                "quiet": True,
+                "no_warnings": True,
+                "noprogress": True,
+                "retries": 3,  # Limit yt-dlp internal retries
+            }
+            if self.cookie_browser:
+                ydl_opts["cookiesfrombrowser"] = (self.cookie_browser,)
+            if self.connections > 1:
+                # Fragmented (DASH/HLS) formats: let yt-dlp fetch that many fragments at once
+                ydl_opts["concurrent_fragment_downloads"] = self.connections
+
+            # Race mode searches from several threads, each needs its own YoutubeDL
+            search_opts = dict(ydl_opts, progress_hooks=[], match_filter=None)
+
+            result = None
+            error = None
+            found = None
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                if source:
+                    candidates = iter([(source.get('resolver') or 'manifest', source)])
+                else:
+                    candidates = self.resolvers.candidates(
+                        query, ydl, make_ydl=lambda: yt_dlp.YoutubeDL(search_opts),
+                        retry=lambda action: self._with_retries(action, token, budget)
+                    )
+                try:
+                    # Download the first candidate; if that fails for good, move on to the next source
+                    for resolver, candidate in candidates:
+                        if token is not None:
+                            token.check()
+                        self.emit(ProgressEvent.TRACK_RESOLVED, job_id=job_id, track=query,
+                                  message=candidate['title'], data={'url': candidate['url'], 'resolver': resolver})
+
+                        # A retry continues the partial download instead of starting over (yt-dlp
+                        # resumes its .part file, segmented_download() fetches the missing segments)
+                        try:
+                            result = self._with_retries(
+                                lambda: self._fetch(ydl, candidate['url'], ydl_opts["progress_hooks"]), token, budget
+                            )
+                        except DownloadCancelled:
+                            raise
+                        except Exception as e:
+                            error = classify(e)
+                            # Another source would hit the same full or read-only disk
+                            if error.kind == LocalError.kind:
+                                raise error
+                            self.resolvers.record_download(resolver, False)
+                            self.metrics.fallbacks.inc(kind='source')
+                            self.print_warning(f"{resolver} result failed ({error.kind}), trying next source...")
+                            continue
+                        self.resolvers.record_download(resolver, True)
+                        found = dict(candidate, resolver=resolver)
+                        break
+                finally:
+                    if hasattr(candidates, 'close'):
+                        candidates.close()
+
+            if result is None:
+                raise error or UnavailableError(f"No results found for: {query}")
+
+            # Encoded in the scratch dir too, then moved to the library in one go
+            encoded = target if work_base == os.path.splitext(target)[0] else \
+                f"{work_base}.{output_extension(audio_format)}"
+            path = self._convert_download(result, audio_format, quality_levels, job_id, query, token, encoded)
+            if path != target:
+                path = move_file(path, target)
+            return self._finish_download(path, query, spotify_id, found)
+
+    def _work_base(self, target):
+        """Path without extension the raw download and encode of `target` are written to"""
+        if not self.scratch_dir:
+            return os.path.splitext(target)[0]
+        # Unique per target, tracks with the same name in different folders may run at once
+        name = hashlib.sha1(os.path.abspath(target).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.scratch_dir, name)
+
+    def _reserve_space(self, query, audio_format, quality_levels, target, work_base, token=None):
+        """
+        Reserve the disk space a track needs, see lib/diskspace.py
+
+        The encoded file goes to the library; while it's being encoded the raw
+        stream and the encode sit side by side in the work folder.
+
+        Returns:
+            Reservation: Context manager releasing the space
+        """
+        duration = self._duration(query)
+        output = estimate_size(duration, audio_format, quality_levels[0])
+        raw = estimate_size(duration, 'source', SOURCE_KBPS)
+        needs = [(target, output), (work_base, raw)]
+        if work_base != os.path.splitext(target)[0]:
+            needs.append((work_base, output))
+        return self.disk.reserve(needs, token, self._on_low_space)
+
+    def _duration(self, query):
+        """Track length in seconds from the Spotify metadata, or None"""
+        duration_ms = (self.track_meta.get(query) or {}).get('duration_ms')
+        return duration_ms / 1000 if duration_ms else None
+
+    def _on_low_space(self, path, free, needed):
+        self.print_warning(f"Low disk space ({free / 1024 ** 2:.0f} MiB free at {os.path.dirname(path)}, "
+                           f"{needed / 1024 ** 2:.0f} MiB needed), waiting up to {self.disk.wait_timeout:.0f}s for space...")
+
+    def _fetch(self, ydl, url, progress_hooks):
+        """
+        Download the raw stream of `url`, over several connections when configured
+
+        Plain HTTP formats are fetched with segmented_download(); anything
+        else (fragmented formats, servers without range support) is left to
+        yt-dlp.
 
-        # Determine quality levels to try
+        Returns:
+            dict: yt-dlp info dict with 'requested_downloads' filled in
+        """
+        if self.connections <= 1:
+            return ydl.extract_info(url, download=True)
+
+        info = ydl.extract_info(url, download=False)
+        if not info or info.get('protocol') not in ('http', 'https') or not info.get('url'):
+            return ydl.extract_info(url, download=True)
+
+        headers = dict(info.get('http_headers') or {})
+        cookiejar = getattr(ydl, 'cookiejar', None)
+        if cookiejar is not None and hasattr(cookiejar, 'get_cookie_header'):
+            cookie = cookiejar.get_cookie_header(info['url'])
+            if cookie:
+                headers['Cookie'] = cookie
+
+        filepath = ydl.prepare_filename(info)
+        try:
+            # The size is probed: extractors' filesize is sometimes only an estimate
+            segmented_download(info['url'], filepath, connections=self.connections,
+                               segment_size=self.segment_size, headers=headers, progress_hooks=progress_hooks)
+        except RangesNotSupported:
+            return ydl.extract_info(url, download=True)
+        info['requested_downloads'] = [{'filepath': filepath}]
+        return info
+
+    def _quality_levels(self, quality):
+        """Bitrates to try, best first, for a requested quality"""
         if quality == 'auto' and self.auto_fallback:
-            quality_levels = self.QUALITY_FALLBACK
-        elif quality != 'auto' and self.auto_fallback:
+            return self.QUALITY_FALLBACK
+        if quality != 'auto' and self.auto_fallback:
             # Start with specified quality, then fallback to lower
             try:
                 start_index = self.QUALITY_FALLBACK.index(quality)
-                quality_levels = self.QUALITY_FALLBACK[start_index:]
+                return self.QUALITY_FALLBACK[start_index:]
             except ValueError:
-                quality_levels = [quality]
-        else:
-            quality_levels = [quality if quality != 'auto' else '192']
+                return [quality]
+        return [quality if quality != 'auto' else '192']
 
-        last_error = None
-        retry_count = 0
-        max_retries = 3
+    def _convert_download(self, info, audio_format, quality_levels, job_id, query, token=None, dest=None):
+        """
+        Transcode the raw stream yt-dlp downloaded into the requested format
 
-        # Try each quality level
-        for attempt_quality in quality_levels:
-            try:
-                ydl_opts = {
-                    "format": "bestaudio/best",
-                    "outtmpl": f"{download_path}/%(title)s.%(ext)s",
-                    "noplaylist": True,
-                    "progress_hooks": [self.progress_hook],
-                    "quiet": True,
-                    "no_warnings": True,
-                    "extractaudio": True,
-                    "audioformat": audio_format,
-                    "audioquality": f"{attempt_quality}K",
-                    "postprocessors": [{
-                        'key': 'FFmpegExtractAudio',
-                        'preferredcodec': audio_format,
-                        'preferredquality': attempt_quality,
-                    }],
-                    "retries": 3,  # Limit yt-dlp internal retries
-                }
-
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    search_query = f"ytsearch1:{query}"
-                    info = ydl.extract_info(search_query, download=False)
-
-                    if 'entries' in info and len(info['entries']) > 0:
-                        video = info['entries'][0]
-                        video_title = video['title']
-                        video_url = video.get('webpage_url') or video.get('url') or video.get('id')
-                        print(f"{Fore.GREEN}✓ Found: {Fore.WHITE}{video_title}")
-
-                        # Download the specific video we already found instead of searching again
-                        if video_url:
-                            ydl.extract_info(video_url, download=True)
-                        else:
-                            # Fallback to searching again if URL not available
-                            ydl.download([search_query])
-
-                        if len(quality_levels) > 1:
-                            self.print_success(f"Downloaded at {attempt_quality} kbps")
-                        return True
-                    else:
-                        self.print_error(f"No results found for: {query}")
-                        return False
+        The ladder starts no higher than the downloaded stream justifies
+        (see pick_bitrates), and if ffmpeg fails the next (lower) bitrate is
+        tried, reusing the same download. The result is written to `dest`
+        (default: the raw file's name with the format's extension).
 
-            except Exception as e:
-                last_error = str(e)
-
-                # Check for age-restricted content error
-                if "Sign in to confirm your age" in last_error or "age" in last_error.lower():
-                    retry_count += 1
-                    if retry_count >= max_retries:
-                        self.print_error(f"Video is age-restricted (skipping after {max_retries} attempts)")
-                        return False
-                    continue
+        Returns:
+            str: Path of the converted file
 
-                # For other errors, try lower quality if available
-                if len(quality_levels) > 1 and attempt_quality != quality_levels[-1]:
-                    self.print_warning(f"{attempt_quality} kbps failed, trying lower quality...")
-                    continue
-                else:
-                    break
+        Raises:
+            EncoderError: If every bitrate failed
+        """
+        raw_path, stream = None, None
+        for download in (info or {}).get('requested_downloads') or []:
+            if download.get('filepath') and os.path.exists(download['filepath']):
+                raw_path, stream = download['filepath'], download
+                break
+        if raw_path is None:
+            raise FileNotFoundError("yt-dlp did not report a downloaded file")
+
+        # Bitrate and codec of the stream we actually got, from the info yt-dlp already extracted
+        abr = stream.get('abr') or info.get('abr')
+        codec = stream.get('acodec') or info.get('acodec')
+        dest = dest or f"{os.path.splitext(raw_path)[0]}.{output_extension(audio_format)}"
+        self._encode(raw_path, dest, audio_format, quality_levels, job_id, query, token, abr, codec)
+
+        if os.path.abspath(dest) != os.path.abspath(raw_path):
+            os.remove(raw_path)
+        return dest
+
+    def _encode(self, source, dest, audio_format, quality_levels, job_id, query, token=None,
+                source_abr=None, source_codec=None):
+        """
+        Transcode `source` into `dest`, tagging it and walking down `quality_levels` on errors
 
-        # All attempts failed
-        error_msg = last_error[:80] if last_error else 'Unknown error'
-        if "Sign in to confirm your age" in error_msg:
-            self.print_error(f"Skipped: Age-restricted video")
-        else:
-            self.print_error(f"Download failed: {error_msg}...")
-        return False
+        The ladder step that was used ends up in track_encodes[query].
+
+        Args:
+            source_abr (float): Bitrate of `source` in kbps, if known
+            source_codec (str): Codec of `source` (yt-dlp acodec or one of our formats), if known
 
-    def download_playlist(self, url, audio_format='mp3', quality='auto'):
+        Raises:
+            EncoderError: If every bitrate failed
+        """
+        requested = quality_levels[0]
+        source_abr = float(source_abr) if source_abr else None
+        quality_levels = pick_bitrates(quality_levels, source_abr, source_codec, audio_format)
+        if quality_levels[0] != requested:
+            self.print_info(f"Source is {source_abr:.0f} kbps {source_codec}, "
+                            f"encoding at {quality_levels[0]} kbps instead of {requested}")
+        self.emit(ProgressEvent.TRANSCODE_STARTED, job_id=job_id, track=query,
+                  data={'bitrate': quality_levels[0], 'source_abr': source_abr, 'source_codec': source_codec})
+
+        # Tags and cover go in with the same ffmpeg run, the file is only written once
+        tag_args, cover = [], None
+        meta = self.track_meta.get(query) if self.tag_files else None
+        if meta:
+            tag_args = metadata_args(meta, audio_format)
+            if audio_format in COVER_FORMATS:
+                cover = self.covers.get(meta.get('cover_url'))
+
+        for bitrate in quality_levels:
+            try:
+                transcode(source, dest, audio_format, bitrate, token, extra_args=tag_args, cover=cover)
+                break
+            except TranscodeError as e:
+                if bitrate == quality_levels[-1]:
+                    raise EncoderError(str(e), e)
+                self.print_warning(f"{bitrate} kbps failed, trying lower quality...")
+                self.metrics.fallbacks.inc(kind='quality')
+
+        if len(quality_levels) > 1 and bitrate != quality_levels[0]:
+            self.print_success(f"Downloaded at {bitrate} kbps")
+        self.track_encodes[query] = {
+            'format': audio_format,
+            'bitrate': None if is_lossless(audio_format) else bitrate,
+            'requested': None if is_lossless(audio_format) else requested,
+            'source_abr': source_abr,
+            'source_codec': source_codec,
+        }
+        return dest
+
+    def _finish_download(self, path, query, spotify_id=None, source=None):
+        """Add a finished download to the library index"""
+        if source:
+            self.track_sources[query] = source
+        if path and self.library:
+            self.library.add(path, query, spotify_id, source=source)
+        return path
+
+    def download_playlist(self, url, audio_format='mp3', quality='auto', job_id=None,
+                          resolved=None, link_mode='auto', token=None, template=None,
+                          tracks=None, playlist_name=None, known=None):
         """
         Download all tracks from a Spotify playlist/album into a subfolder
 
         Args:
-            url (str): Spotify URL (track, album, or playlist)
+            url (str): Spotify URL (track, album, playlist or artist)
             audio_format (str): Output audio format (default: 'mp3')
             quality (str): Audio quality in kbps or 'auto' for best available (default: 'auto')
+            job_id (str): Id used to tag this job's progress events (default: random)
+            resolved (dict): Run-level map of track key -> downloaded file path (or None if it
+                failed), shared between playlists so each song is only downloaded once per run
+            link_mode (str): How duplicates are put into this folder: 'auto', 'hardlink',
+                'reflink' or 'copy' (default: 'auto')
+            token (CancelToken): Cancels or pauses the playlist, including the track in
+                progress; a cancelled playlist picks up where it stopped next time (default: None)
+            template (str): Output template for this playlist, e.g. '{playlist}/{nn} - {title}.{ext}'
+                (default: the downloader's output_template)
+            tracks (list): Track list already fetched (e.g. by watch mode), Spotify isn't asked
+                again (default: None)
+            playlist_name (str): Folder name to go with `tracks` (default: None)
+            known (dict): Track query -> file already in this playlist; those tracks are kept
+                as they are and only the others are downloaded (default: None)
 
         Returns:
-            dict: Download statistics {'total': int, 'successful': int, 'failed': int}
+            dict: Download statistics {'total': int, 'successful': int, 'failed': int, 'saved': int}
         """
+        job_id = job_id or uuid.uuid4().hex
+        resolved = {} if resolved is None else resolved
+        if isinstance(template, str):
+            template = OutputTemplate(template)
+
         # Validate URL first
         if not self.validate_url(url):
-            return {'total': 0, 'successful': 0, 'failed': 0}
+            return {'total': 0, 'successful': 0, 'failed': 0, 'saved': 0}
+
+        # A checkpoint means an earlier run was cancelled, resume it without asking Spotify again
+        checkpoint = self._load_checkpoint(url, audio_format) if tracks is None else None
+        if tracks is not None:
+            # The caller already has the track list, only the tracks it doesn't know are downloaded
+            known = known or {}
+            done = {i: known[track] for i, track in enumerate(tracks, 1)
+                    if known.get(track) and os.path.exists(known[track])}
+        elif checkpoint:
+            playlist_name = checkpoint['playlist_name']
+            tracks = checkpoint['tracks']
+            self.track_ids.update(checkpoint.get('track_ids') or {})
+            self.track_meta.update(checkpoint.get('track_meta') or {})
+            done = {int(i): path for i, path in checkpoint['done'].items() if path and os.path.exists(path)}
+            self.print_info(f"Resuming: {len(done)}/{len(tracks)} tracks already done")
+        else:
+            # Get playlist/album name for subfolder
+            playlist_name = self.get_playlist_name(url)
+            tracks = self.get_tracks_from_url(url)
+            done = {}
 
-        # Get playlist/album name for subfolder
-        playlist_name = self.get_playlist_name(url)
         if playlist_name:
             self.print_info(f"Playlist/Album: {playlist_name}")
 
-        tracks = self.get_tracks_from_url(url)
-
         if not tracks:
             self.print_error("No tracks found")
-            return {'total': 0, 'successful': 0, 'failed': 0}
+            return {'total': 0, 'successful': 0, 'failed': 0, 'saved': 0}
 
         # Download statistics
         # Its a little complex but trust me
         # its easy to use if you see my code in main.py
-        stats = {'total': len(tracks), 'successful': 0, 'failed': 0}
+        # 'saved' counts downloads skipped because the song was already fetched this run
+        stats = {'total': len(tracks), 'successful': 0, 'failed': 0, 'saved': 0}
+        self.emit(ProgressEvent.JOB_STARTED, job_id=job_id, total=len(tracks),
+                  message=playlist_name, data={'url': url, 'tracks': list(tracks)})
+
+        downloads = 0
+        budget = RetryBudget(self.retry_budget)
+
+        # A pause only holds this thread; checkpoint the queue so a run that is closed
+        # (or dies) while paused resumes like a cancelled one
+        stop_listening = token.on_pause(
+            lambda: self._save_checkpoint(url, audio_format, playlist_name, tracks, dict(done))
+        ) if token is not None else None
+
+        for i, track in enumerate(tracks, 1):
+            key = LibraryIndex.track_key(track)
+
+            if token is not None and token.is_cancelled:
+                break
+
+            if i in done:
+                # Finished before the last run was cancelled
+                path = done[i]
+                resolved.setdefault(key, path)
+                self.emit(ProgressEvent.TRACK_DONE, job_id=job_id, track=track, index=i,
+                          total=len(tracks), data={'path': path, 'resumed': True})
+            elif key in resolved:
+                # Already handled earlier in this run, don't search or download it again
+                target = self.output_path(track, audio_format, playlist_name, i, template)
+                path = self._materialize_duplicate(track, resolved[key], target, link_mode,
+                                                   job_id=job_id, index=i, total=len(tracks))
+                stats['saved'] += 1
+            else:
+                if downloads and self.download_delay:
+                    if token is not None:
+                        if token.wait(self.download_delay):
+                            break
+                    else:
+                        time.sleep(self.download_delay)
+                downloads += 1
+
+                # Pass playlist_name as subfolder (will be None for individual tracks)
+                path = self.download_track_file(track, audio_format, quality, subfolder=playlist_name,
+                                                job_id=job_id, index=i, total=len(tracks), token=token,
+                                                budget=budget, template=template)
+                if path is None and token is not None and token.is_cancelled:
+                    break
+                resolved[key] = path
+
+            if path:
+                stats['successful'] += 1
+                done[i] = path
+            else:
+                stats['failed'] += 1
+
+        if stop_listening is not None:
+            stop_listening()
+        cancelled = token is not None and token.is_cancelled
+        if cancelled:
+            self._save_checkpoint(url, audio_format, playlist_name, tracks, done)
+            self.print_warning(f"Cancelled, {len(done)}/{len(tracks)} tracks done. Run again to resume")
+        else:
+            self._remove_checkpoint(url)
+        self._save_manifest(url, playlist_name, audio_format, quality, template, tracks, done,
+                            attempted=stats['successful'] + stats['failed'])
+
+        self.emit(ProgressEvent.JOB_FINISHED, job_id=job_id, total=len(tracks),
+                  data=dict(stats, cancelled=cancelled))
+        return stats
+
+    # ===== Manifests =====
+
+    def _save_manifest(self, url, playlist_name, audio_format, quality, template, tracks, done, attempted=None):
+        """
+        Write the M3U8 and JSON manifest of a playlist run
+
+        Args:
+            playlist_name (str): Playlist/album folder name, None for a single track
+            tracks (list): Track queries in playlist order
+            done (dict): 1-based index -> path of the tracks that finished
+            attempted (int): Tracks that were tried, the rest are 'pending' (default: all)
 
+        Returns:
+            str: Path of the JSON manifest, or None if manifests are off, the run was a
+                single track or it couldn't be written
+        """
+        # A single song doesn't need a playlist file next to the music
+        if not self.write_manifests or (playlist_name is None and len(tracks) == 1):
+            return None
+        attempted = len(tracks) if attempted is None else attempted
+        entries = []
         for i, track in enumerate(tracks, 1):
-            print(f"\n{Fore.MAGENTA}[{i}/{len(tracks)}]")
-            # Pass playlist_name as subfolder (will be None for individual tracks)
-            if self.download_track(track, audio_format, quality, subfolder=playlist_name):
+            path = done.get(i)
+            info = self.library.info(path) if path and self.library else None
+            content_hash = info['content_hash'] if info else None
+            if path and content_hash is None and os.path.exists(path):
+                content_hash = LibraryIndex.hash_file(path)
+            status = 'done' if path else ('failed' if i <= attempted else 'pending')
+            entries.append({
+                'index': i,
+                'query': track,
+                'spotify_id': self.track_ids.get(track),
+                'meta': self.track_meta.get(track),
+                'source': self.track_sources.get(track) or (info or {}).get('source'),
+                'path': os.path.relpath(os.path.abspath(path), os.path.abspath(self.download_dir))
+                        .replace(os.sep, '/') if path else None,
+                'hash': content_hash,
+                'encode': self.track_encodes.get(track),
+                'status': status,
+            })
+        template = template or self.output_template
+        manifest = build_manifest(url, playlist_name or tracks[0], playlist_name, audio_format, quality,
+                                  template.template, entries, self.download_dir)
+        try:
+            m3u8_path, json_path = write_manifest(manifest, self.download_dir)
+        except OSError as e:
+            self.print_warning(f"Could not write playlist manifest: {e}")
+            return None
+        self.print_info(f"Playlist saved: {os.path.basename(m3u8_path)}")
+        return json_path
+
+    def download_from_manifest(self, manifest_path, audio_format=None, quality=None, job_id=None,
+                               token=None, template=None):
+        """
+        Redo a playlist from its JSON manifest, without Spotify and without searching
+
+        Tracks whose file is still there in the requested format are kept.
+        If the format changed, existing files are re-encoded instead of
+        downloaded again. Anything missing is downloaded straight from the
+        source recorded in the manifest; tracks that never had a source
+        (they failed in the original run) are reported as failed.
+
+        Args:
+            manifest_path (str): JSON manifest written by an earlier run
+            audio_format (str): Output format (default: the manifest's)
+            quality (str): Audio quality in kbps or 'auto' (default: the manifest's)
+            job_id (str): Id used to tag this job's progress events (default: random)
+            token (CancelToken): Cancels or pauses the run (default: None)
+            template (str): Output template (default: the one recorded in the manifest)
+
+        Returns:
+            dict: Download statistics {'total': int, 'successful': int, 'failed': int,
+                  'saved': int, 'reencoded': int}
+        """
+        job_id = job_id or uuid.uuid4().hex
+        manifest = read_manifest(manifest_path)
+        audio_format = audio_format or manifest.get('format') or 'mp3'
+        quality = quality or manifest.get('quality') or 'auto'
+        template = template or manifest.get('template') or self.output_template
+        if isinstance(template, str):
+            template = OutputTemplate(template)
+        name = manifest.get('name')
+        subfolder = manifest.get('playlist')
+
+        entries = sorted(manifest['tracks'], key=lambda entry: entry['index'])
+        tracks = [entry['query'] for entry in entries]
+        for entry in entries:
+            if entry.get('spotify_id'):
+                self.track_ids[entry['query']] = entry['spotify_id']
+            if entry.get('meta'):
+                self.track_meta[entry['query']] = entry['meta']
+            if entry.get('source'):
+                self.track_sources[entry['query']] = entry['source']
+            if entry.get('encode'):
+                self.track_encodes[entry['query']] = entry['encode']
+
+        self.print_info(f"Manifest: {name} ({len(entries)} tracks, {audio_format})")
+
+        stats = {'total': len(entries), 'successful': 0, 'failed': 0, 'saved': 0, 'reencoded': 0}
+        self.emit(ProgressEvent.JOB_STARTED, job_id=job_id, total=len(entries),
+                  message=name, data={'manifest': manifest_path, 'tracks': tracks})
+        budget = RetryBudget(self.retry_budget)
+        done = {}
+        attempted = 0
+
+        for entry in entries:
+            if token is not None and token.is_cancelled:
+                break
+            i, track = entry['index'], entry['query']
+            attempted += 1
+            old_path = os.path.join(manifest['root'], *entry['path'].split('/')) if entry.get('path') else None
+            target = self.output_path(track, audio_format, subfolder, i, template)
+
+            if os.path.exists(target):
+                path = target
+                stats['saved'] += 1
+                self.emit(ProgressEvent.TRACK_DONE, job_id=job_id, track=track, index=i,
+                          total=len(entries), data={'path': path, 'resumed': True})
+            elif old_path and os.path.exists(old_path) and \
+                    old_path.lower().endswith(f".{output_extension(audio_format)}"):
+                # Same format, only the layout changed
+                path = materialize(old_path, os.path.dirname(target), name=os.path.basename(target))
+                self._finish_download(path, track, self.track_ids.get(track), self.track_sources.get(track))
+                stats['saved'] += 1
+                self.emit(ProgressEvent.TRACK_DONE, job_id=job_id, track=track, index=i,
+                          total=len(entries), data={'path': path, 'deduplicated': True})
+            elif old_path and os.path.exists(old_path):
+                path = self._reencode(old_path, target, track, audio_format, quality, job_id, i,
+                                      len(entries), token)
+                if path:
+                    stats['reencoded'] += 1
+            elif entry.get('source'):
+                path = self.download_track_file(track, audio_format, quality, subfolder, job_id=job_id,
+                                                index=i, total=len(entries), token=token, budget=budget,
+                                                template=template, source=entry['source'])
+            else:
+                self.print_warning(f"No source recorded, skipping: {track}")
+                self.emit(ProgressEvent.TRACK_FAILED, job_id=job_id, track=track, index=i,
+                          total=len(entries), data={'path': None, 'cancelled': False, 'error': 'unavailable'})
+                path = None
+
+            if path is None and token is not None and token.is_cancelled:
+                attempted -= 1
+                break
+            if path:
                 stats['successful'] += 1
+                done[i] = path
             else:
                 stats['failed'] += 1
 
+        cancelled = token is not None and token.is_cancelled
+        self._save_manifest(manifest.get('url'), name, audio_format, quality, template, tracks, done, attempted)
+        self.emit(ProgressEvent.JOB_FINISHED, job_id=job_id, total=len(entries),
+                  data=dict(stats, cancelled=cancelled))
         return stats
 
+    def _reencode(self, source, target, track, audio_format, quality, job_id, index, total, token=None):
+        """Convert a file we already have into another format, returns the new path or None"""
+        self.emit(ProgressEvent.TRACK_STARTED, job_id=job_id, track=track, index=index, total=total,
+                  data={'reencode': True})
+        path, cancelled, error = None, False, None
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            quality_levels = self._quality_levels(quality)
+            size = estimate_size(self._duration(track), audio_format, quality_levels[0])
+            # The file we have is the source now, no point encoding above its bitrate
+            previous = self.track_encodes.get(track) or {}
+            with self.disk.reserve([(target, size)], token, self._on_low_space):
+                self._encode(source, target, audio_format, quality_levels, job_id, track, token,
+                             previous.get('bitrate'),
+                             previous.get('format') or os.path.splitext(source)[1].lstrip('.').lower())
+            path = self._finish_download(target, track, self.track_ids.get(track), self.track_sources.get(track))
+            self.print_success(f"Re-encoded: {os.path.basename(target)}")
+        except DownloadCancelled:
+            self.print_warning(f"Cancelled: {track}")
+            cancelled = True
+        except Exception as e:
+            error = classify(e)
+            self._report_failure(track, error)
+
+        kind = ProgressEvent.TRACK_DONE if path else ProgressEvent.TRACK_FAILED
+        data = {'path': path, 'cancelled': cancelled}
+        if error is not None:
+            data['error'] = error.kind
+        self.emit(kind, job_id=job_id, track=track, index=index, total=total, data=data)
+        return path
+
+    # ===== Resume checkpoints =====
+
+    def _checkpoint_path(self, url):
+        name = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.download_dir, '.cache', 'checkpoints', f"{name}.json")
+
+    def _load_checkpoint(self, url, audio_format):
+        """Return the checkpoint of a cancelled run of `url`, or None"""
+        try:
+            with open(self._checkpoint_path(url), 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if checkpoint.get('url') != url or checkpoint.get('format') != audio_format:
+            return None
+        return checkpoint
+
+    def _save_checkpoint(self, url, audio_format, playlist_name, tracks, done):
+        """Remember the track list and finished tracks of a cancelled playlist"""
+        path = self._checkpoint_path(url)
+        checkpoint = {
+            'url': url,
+            'format': audio_format,
+            'playlist_name': playlist_name,
+            'tracks': list(tracks),
+            'track_ids': {track: self.track_ids[track] for track in tracks if track in self.track_ids},
+            'track_meta': {track: self.track_meta[track] for track in tracks if track in self.track_meta},
+            'done': {str(i): p for i, p in done.items()},
+        }
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(checkpoint, f)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            self.print_warning(f"Could not save resume checkpoint: {e}")
+
+    def _remove_checkpoint(self, url):
+        try:
+            os.remove(self._checkpoint_path(url))
+        except OSError:
+            pass
+
+    def _materialize_duplicate(self, track, source, target, link_mode, job_id=None,
+                               index=None, total=None):
+        """Put a song that was already downloaded this run at its path in another folder"""
+        self.emit(ProgressEvent.TRACK_STARTED, job_id=job_id, track=track, index=index, total=total,
+                  data={'deduplicated': True})
+
+        path = None
+        if source and os.path.exists(source):
+            try:
+                path = materialize(source, os.path.dirname(target), link_mode, name=os.path.basename(target))
+                if self.library and os.path.abspath(path) != os.path.abspath(source):
+                    self.library.add(path, track, self.track_ids.get(track),
+                                     source=self.track_sources.get(track))
+                self.print_success(f"Already downloaded this run: {os.path.basename(source)}")
+            except OSError as e:
+                self.print_error(f"Could not link {os.path.basename(source)}: {e}")
+        else:
+            self.print_warning("Already failed earlier this run, skipping")
+
+        kind = ProgressEvent.TRACK_DONE if path else ProgressEvent.TRACK_FAILED
+        self.emit(kind, job_id=job_id, track=track, index=index, total=total,
+                  data={'path': path, 'deduplicated': True})
+        return path
+
+    def download_playlists(self, urls, audio_format='mp3', quality='auto', link_mode='auto', token=None,
+                           template=None):
+        """
+        Download several playlists/albums/tracks in one run
+
+        Songs that show up in more than one of them are searched and
+        downloaded once, then linked (or copied) into every other folder.
+
+        Args:
+            urls (list): Spotify URLs
+            audio_format (str): Output audio format (default: 'mp3')
+            quality (str): Audio quality in kbps or 'auto' for best available (default: 'auto')
+            link_mode (str): 'auto', 'hardlink', 'reflink' or 'copy' (default: 'auto')
+            token (CancelToken): Cancels or pauses the whole run (default: None)
+            template (str): Output template for all of them (default: the downloader's)
+
+        Returns:
+            dict: Combined statistics {'total': int, 'successful': int, 'failed': int, 'saved': int}
+        """
+        resolved = {}
+        totals = {'total': 0, 'successful': 0, 'failed': 0, 'saved': 0}
+
+        for url in urls:
+            if token is not None and token.is_cancelled:
+                break
+            stats = self.download_playlist(url, audio_format, quality, resolved=resolved,
+                                           link_mode=link_mode, token=token, template=template)
+            for key in totals:
+                totals[key] += stats.get(key, 0)
+
+        return totals
+
     def get_downloaded_files(self):
         """
         Get list of downloaded songs (including files in subfolders)
@@ -629,20 +1774,30 @@ class SpotifyDownloader:
         Returns:
             list: List of file paths relative to download_dir
         """
-        files = []
+        # Returns all forms of audio files in the downloaded directory and subfolders
+        return [entry['path'] for entry in self.iter_downloaded_files()]
 
-        if os.path.exists(self.download_dir):
-            # Walk through all subdirectories
-            for root, dirs, filenames in os.walk(self.download_dir):
-                for filename in filenames:
-                    if filename.endswith(('.mp3', '.m4a', '.webm', '.opus', '.flac', '.wav', '.aac')):
-                        # Get path relative to download_dir
-                        full_path = os.path.join(root, filename)
-                        rel_path = os.path.relpath(full_path, self.download_dir)
-                        files.append(rel_path)
+    def iter_downloaded_files(self):
+        """
+        Lazily yield downloaded songs, skipping folders that haven't changed since the last scan
 
-        # Returns all forms of audio files in the downloaded directory and subfolders
-        return files
+        Yields:
+            dict: {'path': str, 'size': int, 'format': str, 'mtime': float}
+        """
+        return self.scanner.iter_files()
+
+    def get_downloaded_files_page(self, offset=0, limit=100):
+        """
+        Get one page of downloaded songs
+
+        Args:
+            offset (int): Number of files to skip (default: 0)
+            limit (int): Maximum number of files to return (default: 100)
+
+        Returns:
+            dict: {'items': list, 'offset': int, 'limit': int, 'next_offset': int or None}
+        """
+        return self.scanner.get_page(offset, limit)
 
     @staticmethod
     def check_ffmpeg():
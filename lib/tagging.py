@@ -0,0 +1,138 @@
+"""
+Metadata and cover art tagging
+
+Tags come from the Spotify page data the track list was extracted from
+(see SpotifyDownloader.extract_tracks_from_json), so no extra requests are
+made per track. They are written by the same ffmpeg run that converts the
+download, so every file is written exactly once.
+
+Cover images are cached on disk by URL. Every track of an album shares the
+same cover URL, so a 20 track album downloads its art once, even when
+several workers tag its tracks at the same time.
+"""
+
+import hashlib
+import os
+import threading
+
+
+# Containers ffmpeg can embed a cover picture into
+COVER_FORMATS = ('mp3', 'flac', 'm4a', 'alac')
+
+# Containers that can't carry tags at all
+UNTAGGABLE_FORMATS = ('aac', 'wav')
+
+
+def pick_cover(obj):
+    """
+    Find the largest cover image URL in a Spotify JSON object
+
+    Handles the embed page shape ({'coverArt': {'sources': [...]}}), the web
+    API shape ({'album': {'images': [...]}}) and plain {'images': [...]}.
+
+    Returns:
+        str: Image URL, or None
+    """
+    candidates = []
+    for holder in (obj.get('coverArt'), obj.get('album'), obj, obj.get('visualIdentity')):
+        if not isinstance(holder, dict):
+            continue
+        for key in ('sources', 'images', 'image'):
+            images = holder.get(key)
+            if isinstance(images, list):
+                candidates.extend(image for image in images if isinstance(image, dict) and image.get('url'))
+        if candidates:
+            break
+    if not candidates:
+        return None
+    return max(candidates, key=lambda image: image.get('width') or image.get('maxWidth') or 0)['url']
+
+
+def metadata_args(meta, audio_format):
+    """
+    ffmpeg output arguments that write the tags in `meta`
+
+    Args:
+        meta (dict): Track metadata, see SpotifyDownloader.track_meta
+        audio_format (str): Target format
+
+    Returns:
+        list: Arguments for transcode(extra_args=...)
+    """
+    if not meta or audio_format in UNTAGGABLE_FORMATS:
+        return []
+
+    tags = {
+        'title': meta.get('title'),
+        'artist': '; '.join(meta.get('artists') or []) or None,
+        'album_artist': (meta.get('artists') or [None])[0] if meta.get('album') else None,
+        'album': meta.get('album'),
+        'track': meta.get('track_number'),
+        'disc': meta.get('disc_number'),
+        'date': (meta.get('release_date') or '')[:10] or None,
+    }
+    # ID3 has a dedicated frame for the ISRC, the other containers use a plain tag
+    tags['TSRC' if audio_format == 'mp3' else 'ISRC'] = meta.get('isrc')
+
+    args = ['-map_metadata', '-1']
+    for key, value in tags.items():
+        if value:
+            args += ['-metadata', f"{key}={value}"]
+    if audio_format == 'mp3':
+        args += ['-id3v2_version', '3']
+    elif audio_format in ('m4a', 'alac'):
+        # Lets the mp4 muxer write tags like ISRC that have no atom of their own
+        args += ['-movflags', '+use_metadata_tags']
+    return args
+
+
+class CoverCache:
+    """Downloads cover images once per URL and keeps them on disk"""
+
+    def __init__(self, cache_dir, session):
+        """
+        Args:
+            cache_dir (str): Where the images are stored
+            session (requests.Session): HTTP session to download with
+        """
+        self.cache_dir = cache_dir
+        self.session = session
+        self._lock = threading.Lock()
+        self._url_locks = {}
+        self.hits = 0
+        self.downloads = 0
+
+    def path_for(self, url):
+        name = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{name}.jpg")
+
+    def get(self, url):
+        """
+        Local path of the image at `url`, downloading it if we don't have it yet
+
+        Returns:
+            str: Path to the image, or None if it couldn't be downloaded
+        """
+        if not url:
+            return None
+        path = self.path_for(url)
+
+        # One lock per URL: tracks of the same album wait for the first download
+        with self._lock:
+            url_lock = self._url_locks.setdefault(url, threading.Lock())
+        with url_lock:
+            if os.path.exists(path):
+                self.hits += 1
+                return path
+            try:
+                response = self.session.get(url, timeout=15)
+                if response.status_code != 200 or not response.content:
+                    return None
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(path + '.tmp', 'wb') as f:
+                    f.write(response.content)
+                os.replace(path + '.tmp', path)
+            except Exception:
+                return None
+            self.downloads += 1
+            return path
@@ -0,0 +1,221 @@
+"""
+ffmpeg transcode stage
+
+yt-dlp only downloads the raw audio stream; converting it is done here
+with our own ffmpeg subprocess instead of yt-dlp's FFmpegExtractAudio
+postprocessor. Owning the process means a cancel can kill it straight
+away and a pause can suspend it, instead of waiting for the encode to end.
+"""
+
+import os
+import signal
+import subprocess
+
+from .cancel import DownloadCancelled
+
+
+# audio_format -> (file extension, ffmpeg codec, extra output args, lossless)
+CODECS = {
+    'mp3': ('mp3', 'libmp3lame', [], False),
+    'aac': ('aac', 'aac', ['-f', 'adts'], False),
+    'm4a': ('m4a', 'aac', [], False),
+    'opus': ('opus', 'libopus', [], False),
+    'vorbis': ('ogg', 'libvorbis', [], False),
+    'flac': ('flac', 'flac', [], True),
+    'alac': ('m4a', 'alac', [], True),
+    'wav': ('wav', 'pcm_s16le', [], True),
+}
+
+
+# Rough quality per kbps compared to MP3, used to compare bitrates across codecs
+# (e.g. 128 kbps Opus sounds about as good as 205 kbps MP3)
+CODEC_EFFICIENCY = {'mp3': 1.0, 'aac': 1.3, 'vorbis': 1.3, 'opus': 1.6}
+
+# audio_format -> codec family in CODEC_EFFICIENCY
+_FORMAT_FAMILY = {'mp3': 'mp3', 'aac': 'aac', 'm4a': 'aac', 'opus': 'opus', 'vorbis': 'vorbis'}
+
+
+class TranscodeError(Exception):
+    """ffmpeg exited with an error"""
+
+
+def output_extension(audio_format):
+    """File extension ffmpeg writes for an audio format (e.g. 'vorbis' -> 'ogg')"""
+    return CODECS.get(audio_format, (audio_format,))[0]
+
+
+def is_lossless(audio_format):
+    """True for formats where a bitrate makes no sense (flac, alac, wav)"""
+    return CODECS.get(audio_format, (None, None, None, False))[3]
+
+
+def codec_family(codec):
+    """
+    Codec family of a yt-dlp acodec string ('mp4a.40.2' -> 'aac', 'opus' -> 'opus')
+    or of one of our audio formats ('m4a' -> 'aac')
+
+    Returns:
+        str: Key of CODEC_EFFICIENCY, or None if unknown
+    """
+    codec = (codec or '').lower()
+    if codec in _FORMAT_FAMILY:
+        return _FORMAT_FAMILY[codec]
+    for prefix, family in (('mp4a', 'aac'), ('aac', 'aac'), ('opus', 'opus'), ('vorbis', 'vorbis'),
+                           ('mp3', 'mp3')):
+        if codec.startswith(prefix):
+            return family
+    return None
+
+
+def equivalent_bitrate(abr, source_codec, audio_format):
+    """
+    Bitrate in `audio_format` that carries about as much as the source stream
+
+    Encoding above it only makes the file bigger, the detail isn't there.
+
+    Args:
+        abr (float): Source audio bitrate in kbps
+        source_codec (str): Source acodec as reported by yt-dlp
+        audio_format (str): Target format
+
+    Returns:
+        float: kbps, or None if either side is unknown or the target is lossless
+    """
+    source = codec_family(source_codec)
+    target = _FORMAT_FAMILY.get(audio_format)
+    if not abr or source is None or target is None:
+        return None
+    return float(abr) * CODEC_EFFICIENCY[source] / CODEC_EFFICIENCY[target]
+
+
+def pick_bitrates(levels, abr, source_codec, audio_format):
+    """
+    Cut a bitrate ladder down to what the source can justify
+
+    The ladder then starts at the lowest step that still covers the source,
+    i.e. min(requested, source equivalent) rounded up to a ladder step.
+    The lower steps stay as fallbacks if ffmpeg fails.
+
+    Args:
+        levels (list): Bitrates to try in kbps, best first (e.g. ['320', '256', ...])
+        abr (float): Source audio bitrate in kbps
+        source_codec (str): Source acodec as reported by yt-dlp
+        audio_format (str): Target format
+
+    Returns:
+        list: The remaining ladder, best first
+    """
+    equivalent = equivalent_bitrate(abr, source_codec, audio_format)
+    if equivalent is None:
+        return list(levels)
+    start = 0
+    for position, level in enumerate(levels):
+        try:
+            if int(level) >= equivalent:
+                start = position
+        except ValueError:
+            return list(levels)
+    return list(levels[start:])
+
+
+def build_command(source, dest, audio_format, bitrate=None, extra_args=None, cover=None):
+    """
+    Build the ffmpeg command line for a conversion
+
+    Args:
+        source (str): Downloaded audio file
+        dest (str): Output file
+        audio_format (str): Target format (key of CODECS)
+        bitrate (str): Target bitrate in kbps, ignored for lossless formats
+        extra_args (list): Extra arguments placed before the output file
+        cover (str): Image to embed as cover art, the container has to support it
+
+    Returns:
+        list: Command for subprocess
+    """
+    if audio_format not in CODECS:
+        raise ValueError(f"Unsupported audio format '{audio_format}'")
+    _, codec, codec_args, lossless = CODECS[audio_format]
+
+    command = ['ffmpeg', '-y', '-nostdin', '-loglevel', 'error', '-i', source]
+    if cover:
+        command += ['-i', cover, '-map', '0:a:0', '-map', '1:v:0', '-c:v', 'copy',
+                    '-disposition:v:0', 'attached_pic']
+    else:
+        command += ['-vn']
+    command += ['-acodec', codec]
+    if bitrate and not lossless and str(bitrate) != '0':
+        command += ['-b:a', f"{bitrate}k"]
+    command += codec_args + list(extra_args or []) + [dest]
+    return command
+
+
+def transcode(source, dest, audio_format, bitrate=None, token=None, extra_args=None, cover=None,
+              poll_interval=0.2):
+    """
+    Convert `source` into `dest` with ffmpeg, honouring cancel and pause
+
+    The output is written to a temporary name next to `dest` and only
+    renamed into place when ffmpeg succeeds, so a cancelled or failed
+    encode never leaves a half written file behind.
+
+    Args:
+        source (str): Downloaded audio file
+        dest (str): Output file
+        audio_format (str): Target format (key of CODECS)
+        bitrate (str): Target bitrate in kbps (default: ffmpeg's default)
+        token (CancelToken): Cancel/pause token (default: None)
+        extra_args (list): Extra ffmpeg output arguments (metadata tags...)
+        cover (str): Image to embed as cover art (default: None)
+        poll_interval (float): Seconds between token checks
+
+    Returns:
+        str: `dest`
+
+    Raises:
+        DownloadCancelled: If the token was cancelled during the encode
+        TranscodeError: If ffmpeg failed
+    """
+    base, ext = os.path.splitext(dest)
+    temp_dest = f"{base}.part{ext}"
+    command = build_command(source, temp_dest, audio_format, bitrate, extra_args, cover)
+
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    suspended = False
+    stderr = b''
+    try:
+        while True:
+            try:
+                _, stderr = process.communicate(timeout=poll_interval)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+
+            if token is None:
+                continue
+            if token.is_cancelled:
+                raise DownloadCancelled()
+            # Suspend ffmpeg while paused where the OS lets us (POSIX only)
+            if token.is_paused and not suspended and hasattr(signal, 'SIGSTOP'):
+                process.send_signal(signal.SIGSTOP)
+                suspended = True
+            elif not token.is_paused and suspended:
+                process.send_signal(signal.SIGCONT)
+                suspended = False
+    except BaseException:
+        if suspended:
+            process.send_signal(signal.SIGCONT)
+        process.kill()
+        process.wait()
+        if os.path.exists(temp_dest):
+            os.remove(temp_dest)
+        raise
+
+    if process.returncode != 0:
+        if os.path.exists(temp_dest):
+            os.remove(temp_dest)
+        message = stderr.decode('utf-8', 'replace').strip().splitlines()
+        raise TranscodeError(message[-1] if message else f"ffmpeg exited with code {process.returncode}")
+
+    os.replace(temp_dest, dest)
+    return dest
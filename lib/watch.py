@@ -0,0 +1,220 @@
+"""
+Watch mode
+
+Keeps followed playlists mirrored by checking them on a schedule instead
+of re-running the whole download.
+
+Each check is one conditional GET of the playlist's embed page
+(SpotifyDownloader.fetch_tracks_if_changed). When Spotify answers 304 the
+check is over. When it sends the page, the track list is hashed and
+compared to the snapshot of the last sync, so a page that changed for
+other reasons (new build, new cover) costs nothing more. Only when the
+track list itself changed is the playlist synced, and then only the
+tracks that aren't in the folder yet are downloaded; the rest are taken
+from the playlist's manifest.
+
+A sync only counts once every track is either downloaded or gone for good
+(removed, blocked: see lib/errors.py). Tracks that failed for any other
+reason leave the old snapshot in place, so the next check syncs again.
+
+State lives in downloaded/.cache/watch.json:
+
+    {url: {'etag', 'last_modified', 'snapshot', 'tracks', 'unavailable',
+           'playlist_name', 'checked', 'changed'}}
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+
+import requests
+
+from .errors import UnavailableError, BlockedError
+from .manifest import manifest_paths, read_manifest
+from .progress import ProgressEvent
+
+
+DEFAULT_INTERVAL = 3600
+
+
+def parse_interval(text):
+    """
+    Parse an interval like '90', '30s', '15m', '6h' or '1d' into seconds
+
+    Raises:
+        ValueError: If the text isn't an interval
+    """
+    match = re.fullmatch(r'\s*([\d.]+)\s*([smhd]?)\s*', str(text), re.IGNORECASE)
+    if not match or not float(match.group(1)):
+        raise ValueError(f"Invalid interval '{text}', expected something like 90, 15m or 6h")
+    return float(match.group(1)) * {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}[match.group(2).lower()]
+
+
+def snapshot_hash(tracks):
+    """Hash of a track list, order included"""
+    return hashlib.sha1('\n'.join(tracks).encode('utf-8')).hexdigest()
+
+
+class PlaylistWatcher:
+    """Checks a list of playlists on a schedule and downloads what was added"""
+
+    def __init__(self, downloader, urls, interval=DEFAULT_INTERVAL, audio_format='mp3', quality='auto',
+                 template=None, state_path=None):
+        """
+        Args:
+            downloader (SpotifyDownloader): Downloader doing the checks and downloads
+            urls (list): Spotify playlist/album URLs to keep mirrored
+            interval (float): Seconds between two checks of every playlist (default: 1 hour)
+            audio_format (str): Output audio format (default: 'mp3')
+            quality (str): Audio quality in kbps or 'auto' (default: 'auto')
+            template (OutputTemplate): Output template (default: the downloader's)
+            state_path (str): Where validators and snapshots are kept
+                (default: downloaded/.cache/watch.json)
+        """
+        self.downloader = downloader
+        self.urls = list(urls)
+        self.interval = interval
+        self.audio_format = audio_format
+        self.quality = quality
+        self.template = template
+        self.state_path = state_path or os.path.join(downloader.download_dir, '.cache', 'watch.json')
+        self.state = self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return state if isinstance(state, dict) else {}
+
+    def _save_state(self):
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            with open(self.state_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(self.state, f)
+            os.replace(self.state_path + '.tmp', self.state_path)
+        except OSError as e:
+            self.downloader.print_warning(f"Could not save watch state: {e}")
+
+    def _known_paths(self, playlist_name):
+        """Track query -> file of the tracks the playlist's manifest has as done"""
+        _, json_path = manifest_paths(self.downloader.download_dir, playlist_name)
+        try:
+            manifest = read_manifest(json_path)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get('format') != self.audio_format:
+            return {}
+        return {entry['query']: os.path.join(manifest['root'], entry['path'])
+                for entry in manifest['tracks'] if entry.get('status') == 'done' and entry.get('path')}
+
+    def check(self, url, token=None):
+        """
+        Check one playlist and sync it if its track list changed
+
+        Args:
+            url (str): Spotify playlist/album URL
+            token (CancelToken): Cancels the sync (default: None)
+
+        Returns:
+            dict: Download statistics of the sync, or None if nothing changed
+        """
+        entry = self.state.setdefault(url, {})
+        try:
+            tracks, validators = self.downloader.fetch_tracks_if_changed(
+                url, entry.get('etag'), entry.get('last_modified'))
+        except requests.RequestException as e:
+            self.downloader.print_warning(f"Could not check {url}: {e}")
+            return None
+        entry['checked'] = time.time()
+
+        if not tracks:
+            if tracks is not None:
+                self.downloader.print_warning(f"No tracks found for {url}")
+            self._save_state()
+            return None
+
+        snapshot = snapshot_hash(tracks)
+        if snapshot == entry.get('snapshot'):
+            # Page changed, track list didn't
+            entry.update(validators)
+            self._save_state()
+            return None
+
+        previous = set(entry.get('tracks') or [])
+        added = [track for track in tracks if track not in previous]
+        removed = len(previous - set(tracks))
+        playlist_name = entry.get('playlist_name') or self.downloader.get_playlist_name(url)
+        entry['playlist_name'] = playlist_name
+        self.downloader.print_info(f"{playlist_name or url}: {len(added)} added, {removed} removed")
+
+        # Why tracks failed: only failures that retrying can't fix let the snapshot through
+        failures = {}
+
+        def on_event(event):
+            if event.kind == ProgressEvent.TRACK_FAILED and event.track in wanted:
+                kind = (event.data or {}).get('error')
+                if kind or event.track not in failures:
+                    failures[event.track] = kind
+
+        wanted = set(tracks)
+        unsubscribe = self.downloader.events.subscribe(on_event)
+        try:
+            stats = self.downloader.download_playlist(
+                url, self.audio_format, self.quality, token=token, template=self.template,
+                tracks=tracks, playlist_name=playlist_name, known=self._known_paths(playlist_name)
+            )
+        finally:
+            unsubscribe()
+
+        # Take the new snapshot once every track made it or can never make it. Until
+        # then the old validators don't match, so the next check gets the list and retries
+        unavailable = sorted(track for track, kind in failures.items()
+                             if kind in (UnavailableError.kind, BlockedError.kind))
+        cancelled = token is not None and token.is_cancelled
+        gone = set(unavailable)
+        if not cancelled and stats['successful'] + sum(track in gone for track in tracks) >= len(tracks):
+            entry.update(validators)
+            entry['snapshot'] = snapshot
+            entry['tracks'] = list(tracks)
+            entry['unavailable'] = unavailable
+            entry['changed'] = time.time()
+            if unavailable:
+                self.downloader.print_warning(f"{playlist_name or url}: {len(unavailable)} track(s) unavailable, "
+                                              f"not retried until the playlist changes")
+        self._save_state()
+        return stats
+
+    def run(self, token=None, once=False):
+        """
+        Check every playlist, then wait `interval` seconds and start over
+
+        Args:
+            token (CancelToken): Stops watching, including a sync in progress (default: None)
+            once (bool): Only do one round of checks (default: False)
+
+        Returns:
+            dict: Combined statistics of all syncs {'total', 'successful', 'failed', 'saved'}
+        """
+        totals = {'total': 0, 'successful': 0, 'failed': 0, 'saved': 0}
+        while True:
+            started = time.monotonic()
+            for url in self.urls:
+                if token is not None and token.is_cancelled:
+                    return totals
+                stats = self.check(url, token)
+                for key in totals:
+                    totals[key] += (stats or {}).get(key, 0)
+            if once:
+                return totals
+
+            delay = max(0.0, self.interval - (time.monotonic() - started))
+            self.downloader.print_info(f"Next check in {delay / 60:.0f} min")
+            if token is not None:
+                if token.wait(delay):
+                    return totals
+            else:
+                time.sleep(delay)
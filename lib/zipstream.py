@@ -0,0 +1,394 @@
+"""
+Streaming ZIP export
+
+Builds a ZIP of downloaded files on the fly, straight from disk, without
+writing the archive anywhere: entries are stored (audio doesn't compress)
+and memory use stays flat whatever the size of the playlist.
+
+Every entry uses a data descriptor, so the CRC only has to be known after
+the file's bytes went out. That makes the byte layout depend on nothing
+but the names, sizes and dates of the files, so:
+
+    - the total size is known up front (Content-Length) once the file list
+      is complete, and any byte range can be produced on its own, which is
+      what lets an interrupted download resume;
+    - a ZipExport that is still receiving files can be streamed already,
+      each file goes out as soon as it is finished.
+
+Archives over 4 GiB or 65535 files get ZIP64 records.
+
+library_archive() builds the archive of a folder (or file) of the library
+from what is on disk, so a playlist can be fetched at any time; ZipExport
+covers downloads that are still running.
+"""
+
+import binascii
+import hashlib
+import os
+import re
+import struct
+import threading
+import time
+
+from .naming import is_temporary_file
+
+
+CHUNK_SIZE = 64 * 1024
+
+_ZIP32_LIMIT = 0xFFFFFFFF
+_COUNT_LIMIT = 0xFFFF
+
+# General purpose flags: sizes/CRC in a data descriptor, UTF-8 file names
+_FLAGS = 0x0008 | 0x0800
+
+# CRCs of files already streamed, keyed by (path, size, mtime) so a resumed
+# download doesn't have to read the file again
+_crc_cache = {}
+_crc_lock = threading.Lock()
+
+
+def parse_range(header, size):
+    """
+    Parse a single HTTP Range header
+
+    Args:
+        header (str): e.g. 'bytes=100-', 'bytes=0-499' or 'bytes=-500'
+        size (int): Total size of the resource
+
+    Returns:
+        tuple: (start, end) inclusive, or None if the header is missing or not a single byte range
+
+    Raises:
+        ValueError: If the range can't be satisfied (answer 416)
+    """
+    match = re.fullmatch(r'\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*', header or '')
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    if match.group(1):
+        start = int(match.group(1))
+        end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+    else:
+        start = max(0, size - int(match.group(2)))
+        end = size - 1
+    if start > end or start >= size:
+        raise ValueError(f"Range {header} not satisfiable for {size} bytes")
+    return start, end
+
+
+def _dos_time(mtime):
+    t = time.localtime(mtime)
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), \
+           ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+def _file_crc(path, size, mtime):
+    key = (path, size, mtime)
+    with _crc_lock:
+        if key in _crc_cache:
+            return _crc_cache[key]
+    crc = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            crc = binascii.crc32(chunk, crc)
+    with _crc_lock:
+        _crc_cache[key] = crc
+    return crc
+
+
+class _Entry:
+    __slots__ = ('path', 'name', 'size', 'mtime', 'offset')
+
+    def __init__(self, path, name, size, mtime, offset):
+        self.path = path
+        self.name = name
+        self.size = size
+        self.mtime = mtime
+        self.offset = offset
+
+    @property
+    def crc(self):
+        return _file_crc(self.path, self.size, self.mtime)
+
+    @property
+    def zip64(self):
+        return self.offset >= _ZIP32_LIMIT
+
+
+class ZipStream:
+    """Byte layout of a stored ZIP over files on disk"""
+
+    def __init__(self):
+        self.entries = []
+        self._end = 0
+
+    def add(self, path, arcname):
+        """
+        Append a file
+
+        Args:
+            path (str): File on disk
+            arcname (str): Name inside the archive ('/' separated)
+        """
+        stat = os.stat(path)
+        if stat.st_size >= _ZIP32_LIMIT:
+            raise ValueError(f"{path} is too large to stream")
+        name = arcname.replace(os.sep, '/').lstrip('/').encode('utf-8')
+        entry = _Entry(path, name, stat.st_size, int(stat.st_mtime), self._end)
+        self.entries.append(entry)
+        self._end += 30 + len(name) + entry.size + 16
+
+    # ===== Records =====
+
+    def _local_header(self, entry):
+        dos_time, dos_date = _dos_time(entry.mtime)
+        return struct.pack('<IHHHHHIIIHH', 0x04034b50, 20, _FLAGS, 0, dos_time, dos_date,
+                           0, 0, 0, len(entry.name), 0) + entry.name
+
+    def _descriptor(self, entry):
+        return struct.pack('<IIII', 0x08074b50, entry.crc, entry.size, entry.size)
+
+    def _central_entry(self, entry):
+        dos_time, dos_date = _dos_time(entry.mtime)
+        extra = struct.pack('<HHQ', 0x0001, 8, entry.offset) if entry.zip64 else b''
+        version = 45 if entry.zip64 else 20
+        return struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, version, version, _FLAGS, 0,
+                           dos_time, dos_date, entry.crc, entry.size, entry.size,
+                           len(entry.name), len(extra), 0, 0, 0, 0,
+                           min(entry.offset, _ZIP32_LIMIT)) + entry.name + extra
+
+    def _central_length(self):
+        return sum(46 + len(entry.name) + (12 if entry.zip64 else 0) for entry in self.entries)
+
+    def _needs_zip64(self):
+        return len(self.entries) >= _COUNT_LIMIT or self._end >= _ZIP32_LIMIT or \
+            self._central_length() >= _ZIP32_LIMIT
+
+    def _end_length(self):
+        return 22 + (56 + 20 if self._needs_zip64() else 0)
+
+    def _end_records(self):
+        count, start, length = len(self.entries), self._end, self._central_length()
+        records = b''
+        if self._needs_zip64():
+            records += struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, 45, 45, 0, 0, count, count, length, start)
+            records += struct.pack('<IIQI', 0x07064b50, 0, start + length, 1)
+            count, length, start = min(count, _COUNT_LIMIT), min(length, _ZIP32_LIMIT), \
+                min(start, _ZIP32_LIMIT)
+        return records + struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, count, count, length, start, 0)
+
+    # ===== Streaming =====
+
+    @property
+    def size(self):
+        """Total archive size in bytes"""
+        return self._end + self._central_length() + self._end_length()
+
+    def etag(self):
+        """Changes whenever the archive bytes would"""
+        digest = hashlib.sha1()
+        for entry in self.entries:
+            digest.update(b'%s\0%d\0%d\0' % (entry.name, entry.size, entry.mtime))
+        return digest.hexdigest()
+
+    def _entry_parts(self, entry):
+        yield len(entry.name) + 30, lambda: self._local_header(entry)
+        yield entry.size, entry
+        yield 16, lambda: self._descriptor(entry)
+
+    def _parts(self, entries):
+        for entry in entries:
+            yield from self._entry_parts(entry)
+
+    def _tail_parts(self):
+        yield self._central_length(), lambda: b''.join(self._central_entry(entry) for entry in self.entries)
+        yield self._end_length(), self._end_records
+
+    def _emit(self, part, skip, count):
+        """Bytes [skip, skip + count) of one part"""
+        if not isinstance(part, _Entry):
+            yield part()[skip:skip + count]
+            return
+        with open(part.path, 'rb') as f:
+            f.seek(skip)
+            # Reading the whole file anyway: keep its CRC for the descriptor
+            crc = 0 if skip == 0 and count == part.size else None
+            remaining = count
+            while remaining:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise IOError(f"{part.path} changed while it was being streamed")
+                if crc is not None:
+                    crc = binascii.crc32(chunk, crc)
+                remaining -= len(chunk)
+                yield chunk
+        if crc is not None:
+            with _crc_lock:
+                _crc_cache[(part.path, part.size, part.mtime)] = crc
+
+    def iter_bytes(self, start=0, end=None):
+        """
+        Yield the archive, or the inclusive byte range [start, end] of it
+
+        Memory use is one chunk, whatever the archive size.
+        """
+        end = self.size - 1 if end is None else end
+        position = 0
+        for length, part in list(self._parts(self.entries)) + list(self._tail_parts()):
+            if position + length > start and position <= end:
+                skip = max(0, start - position)
+                count = min(length, end + 1 - position) - skip
+                yield from self._emit(part, skip, count)
+            position += length
+            if position > end:
+                return
+
+
+def resolve_library_path(root, relative):
+    """
+    Path of `relative` inside the library
+
+    Args:
+        root (str): Library root (download_dir)
+        relative (str): '/' separated path of a folder or file in it
+
+    Returns:
+        str: Real path, or None if it doesn't exist, is the root itself or is outside
+             of it ('..', absolute paths, symlinks pointing elsewhere)
+    """
+    root = os.path.realpath(root)
+    path = os.path.realpath(os.path.join(root, *relative.split('/')))
+    try:
+        inside = os.path.commonpath([root, path]) == root
+    except ValueError:  # Another drive on Windows
+        return None
+    if not inside or path == root or not os.path.exists(path):
+        return None
+    relative_parts = os.path.relpath(path, root).split(os.sep)
+    if any(part.startswith('.') for part in relative_parts):
+        return None  # .cache and friends
+    return path
+
+
+def library_archive(root, path):
+    """
+    ZipStream of a folder (or single file) of the library, read from disk
+
+    Hidden files and files still being written are left out. Entries are
+    sorted, so the layout (and the ETag) only changes when the files do.
+
+    Args:
+        root (str): Library root, archive names are relative to it
+        path (str): Folder or file inside root (see resolve_library_path)
+    """
+    root = os.path.realpath(root)
+    stream = ZipStream()
+    if os.path.isfile(path):
+        if not is_temporary_file(os.path.basename(path)):
+            stream.add(path, os.path.relpath(path, root))
+        return stream
+    for folder, subfolders, files in os.walk(path):
+        subfolders[:] = sorted(name for name in subfolders if not name.startswith('.'))
+        for name in sorted(files):
+            if name.startswith('.') or is_temporary_file(name):
+                continue
+            file_path = os.path.join(folder, name)
+            stream.add(file_path, os.path.relpath(file_path, root))
+    return stream
+
+
+class ZipExport:
+    """
+    Files of one download, offered as a ZIP while they are still coming in
+
+    The downloader thread add()s files as they finish and calls finish()
+    at the end; stream() serves whatever state the export is in.
+    """
+
+    def __init__(self, name, root):
+        """
+        Args:
+            name (str): Archive name, without '.zip'
+            root (str): Folder archive names are made relative to (download_dir)
+        """
+        self.name = name
+        self.root = root
+        self.files = []
+        self._paths = set()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self.finished = False
+
+    def add(self, path):
+        """Add a finished file (duplicates are ignored)"""
+        with self._changed:
+            key = os.path.abspath(path)
+            if key in self._paths or not os.path.isfile(path):
+                return
+            self._paths.add(key)
+            self.files.append((path, os.path.relpath(key, os.path.abspath(self.root))))
+            self._changed.notify_all()
+
+    def finish(self):
+        """No more files will be added"""
+        with self._changed:
+            self.finished = True
+            self._changed.notify_all()
+
+    def common_path(self):
+        """
+        Folder (or the single file) inside root that holds every added file
+
+        Returns:
+            str: Path for library_archive(), or None if the files are spread over the root
+        """
+        with self._lock:
+            paths = [os.path.realpath(path) for path, _ in self.files]
+        if not paths:
+            return None
+        common = paths[0] if len(paths) == 1 else os.path.commonpath(paths)
+        root = os.path.realpath(self.root)
+        if common == root or os.path.commonpath([root, common]) != root:
+            return None
+        return common
+
+    def archive(self):
+        """ZipStream of the files added so far"""
+        stream = ZipStream()
+        with self._lock:
+            files = list(self.files)
+        for path, arcname in files:
+            stream.add(path, arcname)
+        return stream
+
+    def iter_live(self, timeout=None):
+        """
+        Yield the archive while files are still being added
+
+        Each file is sent as soon as it is added; the central directory goes
+        out once finish() was called. The size isn't known in advance, so
+        this can't serve ranges; once the export is finished, use archive().
+
+        Args:
+            timeout (float): Give up waiting for new files after this many seconds
+                (default: wait as long as it takes)
+        """
+        stream = ZipStream()
+        sent = 0
+        while True:
+            with self._changed:
+                if len(self.files) == sent and not self.finished:
+                    if not self._changed.wait(timeout) and len(self.files) == sent:
+                        raise TimeoutError(f"No new files for {self.name} in {timeout} s")
+                new_files = self.files[sent:]
+                finished = self.finished and len(self.files) == sent + len(new_files)
+            for path, arcname in new_files:
+                stream.add(path, arcname)
+                for length, part in stream._entry_parts(stream.entries[-1]):
+                    yield from stream._emit(part, 0, length)
+            sent += len(new_files)
+            if finished:
+                break
+        for length, part in stream._tail_parts():
+            yield from stream._emit(part, 0, length)
@@ -5,10 +5,9 @@ Python Version: 3.13.7
 Collaborators: Daniel-191, ShellDrak3, JayM2F
 """
 
-from interface.ui import create_ui
+from interface.ui import launch
 
 
 if __name__ == "__main__":
-    # Launch the Gradio web interface
-    webpage_UI = create_ui()
-    webpage_UI.launch()
+    # Launch the Gradio web interface (plus the ZIP download route)
+    launch()